@@ -0,0 +1,130 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from inference import Prediction, infer, to_feature_matrix
+from telemetry import SIZE_BUCKETS, metrics
+
+BATCH_ROWS = metrics.histogram("prediction_batch_rows", "Lignes par appel de modèle", ("source",),
+                               buckets=SIZE_BUCKETS)
+
+
+class _ModelQueue:
+    """Requêtes en attente pour un modèle (un seul lot en calcul à la fois)"""
+
+    def __init__(self, model):
+        self.model = model
+        self.pending: List[Tuple[Any, asyncio.Future]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.running = False
+
+
+class MicroBatcher:
+    """Regroupe les prédictions unitaires concurrentes d'un même modèle.
+
+    Une requête attend au plus window_ms (ou que max_batch_size lignes soient
+    réunies) ; le lot est prédit par un seul appel vectorisé (infer) dans un
+    thread, puis chaque coroutine reçoit sa ligne. Pendant qu'un lot est
+    calculé, les nouvelles requêtes s'accumulent pour le lot suivant.
+
+    runner(nom, fn, *args) exécute le lot et retourne (résultat, temps) ; par
+    défaut le pool de threads de la boucle (voir InferenceExecutor.run).
+
+    Toutes les méthodes s'exécutent dans la boucle d'événements : aucun verrou.
+    """
+
+    def __init__(self, window_ms: float = 2.0, max_batch_size: int = 64,
+                 runner: Optional[Callable[..., Awaitable[Tuple[Any, Dict[str, float]]]]] = None):
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self.runner = runner or self._run_in_default_executor
+        self._queues: Dict[Tuple[str, int], _ModelQueue] = {}
+        self._stats = {"requests": 0, "batches": 0, "rows": 0, "max_batch_rows": 0,
+                       "flush_full": 0, "flush_window": 0, "errors": 0}
+
+    @staticmethod
+    async def _run_in_default_executor(name: str, fn, *args):
+        def timed():
+            started = time.perf_counter()
+            return fn(*args), (time.perf_counter() - started) * 1000.0
+        result, compute_ms = await asyncio.get_running_loop().run_in_executor(None, timed)
+        return result, {"compute_ms": compute_ms}
+
+    async def predict(self, name: str, model, features) -> Tuple[Prediction, Dict[str, float]]:
+        """Prédit une ligne ; retourne (Prediction d'une ligne, temps).
+
+        Dans les temps, queue_wait_ms couvre la fenêtre de regroupement et
+        l'attente du lot ; compute_ms est le calcul du lot entier.
+        """
+        row = to_feature_matrix(features)[0]
+        loop = asyncio.get_running_loop()
+        # Clé (nom, id) : un modèle rechargé entre deux requêtes n'est pas mélangé à l'ancien
+        key = (name, id(model))
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = _ModelQueue(model)
+        future = loop.create_future()
+        submitted = time.perf_counter()
+        queue.pending.append((row, future))
+        self._stats["requests"] += 1
+
+        if not queue.running:
+            if len(queue.pending) >= self.max_batch_size:
+                self._flush(key, "flush_full")
+            elif queue.timer is None:
+                queue.timer = loop.call_later(self.window, self._flush, key, "flush_window")
+        prediction, compute_ms = await future
+        total_ms = (time.perf_counter() - submitted) * 1000.0
+        return prediction, {"queue_wait_ms": max(0.0, total_ms - compute_ms), "compute_ms": compute_ms}
+
+    def _flush(self, key, reason: str):
+        queue = self._queues.get(key)
+        if queue is None:
+            return
+        if queue.timer is not None:
+            queue.timer.cancel()
+            queue.timer = None
+        if queue.running or not queue.pending:
+            return
+        batch = queue.pending[:self.max_batch_size]
+        queue.pending = queue.pending[self.max_batch_size:]
+        queue.running = True
+        self._stats[reason] += 1
+        asyncio.get_running_loop().create_task(self._run_batch(key, queue, batch))
+
+    async def _run_batch(self, key, queue: _ModelQueue, batch):
+        try:
+            X = np.vstack([row for row, _ in batch])
+            prediction, timings = await self.runner(key[0], infer, queue.model, X)
+            for i, (_, future) in enumerate(batch):
+                if not future.done():  # client parti entre-temps
+                    future.set_result((prediction.row(i), timings["compute_ms"]))
+            self._stats["batches"] += 1
+            self._stats["rows"] += len(batch)
+            BATCH_ROWS.observe(len(batch), "microbatch")
+            self._stats["max_batch_rows"] = max(self._stats["max_batch_rows"], len(batch))
+        except Exception as e:
+            self._stats["errors"] += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            queue.running = False
+            if queue.pending:
+                # Ces requêtes ont déjà attendu la durée du lot précédent : on part tout de suite
+                self._flush(key, "flush_full" if len(queue.pending) >= self.max_batch_size else "flush_window")
+            elif self._queues.get(key) is queue:
+                # Plus de référence au modèle : il reste évinçable par le registre
+                del self._queues[key]
+
+    def stats(self) -> Dict[str, Any]:
+        batches = self._stats["batches"]
+        return {
+            **self._stats,
+            "mean_batch_rows": self._stats["rows"] / batches if batches else 0.0,
+            "window_ms": self.window * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "queued_models": len(self._queues),
+        }
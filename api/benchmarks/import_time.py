@@ -0,0 +1,104 @@
+"""Benchmark du temps de démarrage à froid (import des modules de l'API).
+
+Chaque mesure lance un interpréteur neuf avec `python -X importtime`, depuis le
+dossier api/ : aucun module n'est déjà en cache dans le processus.
+
+    python benchmarks/import_time.py                 # main et index, 5 essais chacun
+    python benchmarks/import_time.py main -n 10 --top 15
+    python benchmarks/import_time.py --json          # résultat brut (suivi dans le temps)
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODULES = ["main", "index"]
+
+# Modules lourds qui ne doivent pas être importés au démarrage de l'API
+HEAVY_MODULES = ["pandas", "sklearn", "xgboost", "scipy", "joblib"]
+
+
+def measure_once(module: str) -> Dict[str, Any]:
+    """Importe le module dans un processus neuf ; retourne temps total et détail par module"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=API_DIR, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} a échoué:\n{proc.stderr[-2000:]}")
+
+    # Lignes "import time: self [us] | cumulative | imported package" ;
+    # l'indentation du nom (2 espaces par niveau) donne la profondeur d'import ;
+    # les enfants sont listés avant leur parent
+    cumulative, children, direct = {}, [], []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, raw_name = line.split("|")
+        name = raw_name.strip()
+        cumulative[name] = int(cumulative_us)
+        depth = (len(raw_name) - len(raw_name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append(name)
+        elif depth == 0:
+            if name == module:
+                direct = children
+            children = []
+    return {
+        "wall_seconds": wall,
+        "import_seconds": cumulative.get(module, 0) / 1e6,
+        "modules": cumulative,
+        "direct": direct,
+    }
+
+
+def benchmark(module: str, repeat: int = 5, top: int = 10) -> Dict[str, Any]:
+    runs = [measure_once(module) for _ in range(repeat)]
+    last = runs[-1]
+    # Imports directs du module, du plus coûteux au moins coûteux
+    top_level = sorted(((name, last["modules"][name]) for name in last["direct"]),
+                       key=lambda item: -item[1])[:top]
+    return {
+        "module": module,
+        "repeat": repeat,
+        "import_seconds_median": statistics.median(r["import_seconds"] for r in runs),
+        "import_seconds_min": min(r["import_seconds"] for r in runs),
+        "wall_seconds_median": statistics.median(r["wall_seconds"] for r in runs),
+        "heavy_modules_loaded": [name for name in HEAVY_MODULES if name in last["modules"]],
+        "top_imports": [{"module": name, "seconds": us / 1e6} for name, us in top_level],
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Temps d'import à froid des modules de l'API")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("-n", "--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="Affiche le résultat brut en JSON")
+    args = parser.parse_args(argv)
+
+    results = [benchmark(module, args.repeat, args.top) for module in args.modules]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return results
+
+    for result in results:
+        print(f"⏱️ import {result['module']}: {result['import_seconds_median'] * 1000:.0f} ms "
+              f"(médiane de {result['repeat']}, min {result['import_seconds_min'] * 1000:.0f} ms, "
+              f"processus {result['wall_seconds_median'] * 1000:.0f} ms)")
+        heavy = result["heavy_modules_loaded"]
+        print(f"   Modules lourds chargés: {', '.join(heavy) if heavy else 'aucun'}")
+        for item in result["top_imports"]:
+            print(f"   {item['seconds'] * 1000:8.1f} ms  {item['module']}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
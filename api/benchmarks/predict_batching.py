@@ -0,0 +1,111 @@
+"""Benchmark du micro-batching de /api/predict.
+
+Simule C clients concurrents envoyant chacun des requêtes d'une ligne au même
+modèle, sans micro-batching (un appel infer par requête, dans un thread comme
+le fait le serveur) puis avec MicroBatcher. Affiche le débit
+et les latences p50/p99.
+
+    python benchmarks/predict_batching.py                       # XGBoost entraîné sur le dataset
+    python benchmarks/predict_batching.py --model models/XGBoost_top1.pkl -c 64 -r 2000
+"""
+import argparse
+import asyncio
+import os
+import pickle
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+from batcher import MicroBatcher  # noqa: E402
+from inference import infer  # noqa: E402
+
+
+def load_model(path: str = None):
+    if path:
+        with open(path, 'rb') as f:
+            model = pickle.load(f)
+        return model['model'] if isinstance(model, dict) and 'model' in model else model
+    from xgboost import XGBClassifier
+    from training import load_dataset
+
+    dataset = load_dataset(os.path.join(API_DIR, "data", "kepler_preprocessed.csv"))
+    X_train, _, y_train, _ = dataset.split()
+    return XGBClassifier(n_estimators=100, max_depth=6, random_state=42).fit(X_train, y_train)
+
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, Any]:
+    lat = np.sort(np.asarray(latencies)) * 1000.0
+    return {
+        "requests": len(lat),
+        "throughput_rps": len(lat) / elapsed,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p99_ms": float(np.percentile(lat, 99)),
+    }
+
+
+async def run_clients(handler, rows: np.ndarray, concurrency: int, total: int) -> Dict[str, Any]:
+    latencies = []
+    counter = iter(range(total))
+
+    async def client():
+        for i in counter:
+            start = time.perf_counter()
+            await handler(rows[i % len(rows)])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+async def benchmark(model, rows: np.ndarray, concurrency: int, total: int,
+                    window_ms: float, max_batch_size: int) -> Dict[str, Dict[str, Any]]:
+    loop = asyncio.get_running_loop()
+
+    def single(row):
+        return infer(model, row.reshape(1, -1))
+
+    async def unbatched(row):
+        return await loop.run_in_executor(None, single, row)
+
+    batcher = MicroBatcher(window_ms=window_ms, max_batch_size=max_batch_size)
+
+    async def batched(row):
+        return await batcher.predict("bench", model, row)
+
+    await unbatched(rows[0])  # échauffement
+    results = {"unbatched": await run_clients(unbatched, rows, concurrency, total)}
+    results["batched"] = await run_clients(batched, rows, concurrency, total)
+    results["batched"]["mean_batch_rows"] = batcher.stats()["mean_batch_rows"]
+    return results
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Débit de /api/predict avec et sans micro-batching")
+    parser.add_argument("--model", help="Fichier .pkl (défaut : XGBoost entraîné sur le dataset)")
+    parser.add_argument("-c", "--concurrency", type=int, default=64)
+    parser.add_argument("-r", "--requests", type=int, default=2000)
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    args = parser.parse_args(argv)
+
+    model = load_model(args.model)
+    rows = np.random.default_rng(0).random((256, 20))
+    results = asyncio.run(benchmark(model, rows, args.concurrency, args.requests,
+                                    args.window_ms, args.max_batch_size))
+    for mode, r in results.items():
+        extra = f", {r['mean_batch_rows']:.1f} lignes/lot" if "mean_batch_rows" in r else ""
+        print(f"⏱️ {mode:10s} {r['throughput_rps']:8.0f} req/s  p50 {r['p50_ms']:6.2f} ms  "
+              f"p99 {r['p99_ms']:6.2f} ms{extra}")
+    speedup = results["batched"]["throughput_rps"] / results["unbatched"]["throughput_rps"]
+    print(f"📈 Gain de débit: x{speedup:.1f}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
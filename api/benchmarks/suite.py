@@ -0,0 +1,411 @@
+"""Suite de benchmarks reproductible avec baseline et détection de régressions.
+
+Mesure, sur des modèles de chaque famille entraînés avec une graine fixe sur
+data/kepler_preprocessed.csv (dans un dossier de travail temporaire) :
+
+  load       chargement à froid (premier get d'un registre neuf dans ce processus)
+             et à chaud (médiane des chargements suivants), pickle et format arrays
+  inference  infer() sur des lots de 1, 100 et 10 000 lignes
+  api        latence de POST /api/predict via le client ASGI en processus
+  training   durée de POST /api/create-model (jusqu'à la fin du job) et de /api/retrain
+
+Chaque mesure est un temps en millisecondes (plus petit = meilleur). Le résultat
+est écrit en JSON ; comparé à la baseline, le code de sortie vaut 1 si une mesure
+dépasse sa référence de plus de --threshold (et de plus de --min-delta-ms).
+
+Une régression n'est retenue que si elle se reproduit : les sections concernées
+sont remesurées (--confirm fois, dans un processus neuf) et chaque mesure garde
+son meilleur temps. Les p99 de l'API sont affichés mais ne font pas échouer la
+suite (trop bruités sur une seule série de requêtes). Une baseline enregistrée sur un autre
+environnement (CPU, versions des bibliothèques) n'est comparée qu'à titre
+indicatif, sauf avec --ignore-environment.
+
+    python benchmarks/suite.py                            # compare à benchmarks/baseline.json
+    python benchmarks/suite.py --update-baseline          # enregistre la référence de cette machine
+    python benchmarks/suite.py --sections load inference --output results.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import pickle
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+DATA_PATH = os.path.join(API_DIR, "data", "kepler_preprocessed.csv")
+DEFAULT_BASELINE = os.path.join(API_DIR, "benchmarks", "baseline.json")
+SECTIONS = ("load", "inference", "api", "training")
+BATCH_SIZES = (1, 100, 10000)
+# Régression : plus de 25 % au-dessus de la baseline et plus de 0,25 ms d'écart absolu
+# (en dessous, les mesures inférieures à la milliseconde ne font que du bruit)
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_MIN_DELTA_MS = 0.25
+# Mesures affichées mais jamais bloquantes
+UNGATED_MARKERS = (".p99.",)
+# Champs de l'environnement qui doivent coïncider pour comparer des temps absolus
+COMPARED_ENVIRONMENT = ("python", "numpy", "sklearn", "xgboost", "cpu_count")
+RANDOM_STATE = 42
+
+
+def fixture_models(X_train: np.ndarray, y_train: np.ndarray) -> Dict[str, Any]:
+    """Un modèle par famille servie, hyperparamètres et graines fixes, un seul thread"""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.exceptions import ConvergenceWarning
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.svm import SVC
+    from xgboost import XGBClassifier
+
+    models = {
+        "RandomForest": RandomForestClassifier(n_estimators=100, random_state=RANDOM_STATE, n_jobs=1),
+        "XGBoost": XGBClassifier(n_estimators=100, max_depth=6, random_state=RANDOM_STATE, n_jobs=1),
+        "SVM": SVC(probability=True, random_state=RANDOM_STATE),
+        "KNN": KNeighborsClassifier(n_neighbors=5, n_jobs=1),
+        "LogisticRegression": LogisticRegression(max_iter=1000),
+    }
+    with warnings.catch_warnings():
+        # LogisticRegression sur features non normalisées : convergence partielle attendue
+        warnings.simplefilter("ignore", ConvergenceWarning)
+        for model in models.values():
+            model.fit(X_train, y_train)
+    return models
+
+
+def file_digest(models_dir: str, name: str) -> str:
+    from model_store import content_hash
+
+    with open(os.path.join(models_dir, f"{name}.pkl"), 'rb') as f:
+        return content_hash(f.read())
+
+
+def median_ms(fn: Callable[[], Any], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000.0
+
+
+# ---------- sections ----------
+
+def bench_load(models_dir: str, names: List[str], repeat: int) -> Dict[str, float]:
+    from model_format import export_path
+    from model_store import ensure_metadata
+    from registry import ModelRegistry
+
+    # Sidecars .meta.json écrits (et fichiers hachés) avant toute mesure, comme au
+    # démarrage de l'API : le premier chargement à froid ne mesure que la désérialisation
+    ensure_metadata(models_dir)
+    results = {}
+    for fmt in ("pickle", "arrays"):
+        for name in names:
+            registry = ModelRegistry(models_dir)
+            registry.refresh([name])
+            digest = file_digest(models_dir, name)
+            if fmt == "pickle" and os.path.exists(export_path(models_dir, digest)):
+                # Le registre préfère l'export arrays : on le met de côté pour mesurer le pickle
+                os.rename(export_path(models_dir, digest), export_path(models_dir, digest) + ".off")
+
+            start = time.perf_counter()
+            registry.get(name)
+            results[f"load.cold.{fmt}.{name}"] = (time.perf_counter() - start) * 1000.0
+
+            def warm():
+                fresh = ModelRegistry(models_dir)
+                fresh.refresh([name])
+                fresh.get(name)
+            results[f"load.warm.{fmt}.{name}"] = median_ms(warm, repeat)
+
+            if os.path.exists(export_path(models_dir, digest) + ".off"):
+                os.rename(export_path(models_dir, digest) + ".off", export_path(models_dir, digest))
+    return results
+
+
+def bench_inference(models: Dict[str, Any], X: np.ndarray, repeat: int) -> Dict[str, float]:
+    from inference import infer
+
+    results = {}
+    for name, model in models.items():
+        for size in BATCH_SIZES:
+            batch = np.ascontiguousarray(np.resize(X, (size, X.shape[1])))
+            infer(model, batch)  # échauffement
+            results[f"inference.batch_{size}.{name}"] = median_ms(lambda: infer(model, batch), repeat)
+    return results
+
+
+def bench_api(client, names: List[str], X: np.ndarray, requests_per_model: int) -> Dict[str, float]:
+    results = {}
+    for name in names:
+        latencies = []
+        for i in range(requests_per_model + 1):
+            payload = {"model_name": name, "features": X[i % len(X)].tolist()}
+            # Les traces de /api/predict sont émises (leur coût fait partie de la latence) mais jetées
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                start = time.perf_counter()
+                response = client.post("/api/predict", json=payload)
+                elapsed = (time.perf_counter() - start) * 1000.0
+            if response.status_code != 200:
+                raise RuntimeError(f"/api/predict {name}: {response.status_code} {response.text[:200]}")
+            if i:  # la première requête charge le modèle
+                latencies.append(elapsed)
+        results[f"api.predict.p50.{name}"] = float(np.percentile(latencies, 50))
+        results[f"api.predict.p99.{name}"] = float(np.percentile(latencies, 99))
+    return results
+
+
+def bench_training(client) -> Dict[str, float]:
+    results = {}
+    start = time.perf_counter()
+    response = client.post("/api/create-model", json={
+        "name": "bench_custom", "type": "RandomForest",
+        "hyperparams": {"n_estimators": 50, "max_depth": 10}
+    })
+    if response.status_code != 202:
+        raise RuntimeError(f"/api/create-model: {response.status_code} {response.text[:200]}")
+    status_url = response.json()["status_url"]
+    while True:
+        job = client.get(status_url).json()["job"]
+        if job["status"] in ("succeeded", "failed", "cancelled"):
+            break
+        time.sleep(0.02)
+    if job["status"] != "succeeded":
+        raise RuntimeError(f"create-model: {job['status']} {job['error']}")
+    results["training.create_model"] = (time.perf_counter() - start) * 1000.0
+
+    start = time.perf_counter()
+    response = client.post("/api/retrain", json={
+        "original_model": "bench_custom", "model_name": "bench_retrained", "new_data": []
+    })
+    if response.status_code != 200:
+        raise RuntimeError(f"/api/retrain: {response.status_code} {response.text[:200]}")
+    results["training.retrain"] = (time.perf_counter() - start) * 1000.0
+    return results
+
+
+# ---------- exécution ----------
+
+def environment() -> Dict[str, Any]:
+    import sklearn
+    import xgboost
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "xgboost": xgboost.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run(sections: List[str], repeat: int, api_requests: int) -> Dict[str, Any]:
+    """Exécute les sections demandées dans un dossier de travail temporaire"""
+    from model_format import export_model, export_path
+    from model_store import dedupe_directory
+    from training import load_dataset
+
+    workdir = tempfile.mkdtemp(prefix="exoplanet-bench-")
+    cwd = os.getcwd()
+    try:
+        for directory in ("models", "metrics", "data"):
+            os.makedirs(os.path.join(workdir, directory))
+        shutil.copy(DATA_PATH, os.path.join(workdir, "data"))
+        os.chdir(workdir)
+        # L'API lit la configuration à l'import de main
+        os.environ.update(MODEL_WATCHER="off", TRAINING_WORKERS="1", PREDICTION_CACHE="0",
+                          PREDICT_BATCHING="0", TREE_ENGINE="native")
+
+        dataset = load_dataset("data/kepler_preprocessed.csv")
+        X_train, X_test, y_train, _ = dataset.split()
+        X_test = np.ascontiguousarray(X_test)
+        print(f"🏗️ Entraînement des modèles de référence ({len(X_train)} lignes)")
+        models = fixture_models(X_train, y_train)
+        for name, model in models.items():
+            with open(os.path.join("models", f"{name}.pkl"), 'wb') as f:
+                pickle.dump(model, f)
+        # Rangement par contenu et export arrays, comme en production
+        dedupe_directory("models")
+        for name, model in models.items():
+            digest = file_digest("models", name)
+            export_model(model, export_path("models", digest), {"content_hash": digest})
+
+        metrics: Dict[str, float] = {}
+        timings = {}
+        with contextlib.ExitStack() as stack:
+            client = None
+            for section in sections:
+                start = time.perf_counter()
+                print(f"⏱️ Section {section}...")
+                if section in ("api", "training") and client is None:
+                    # Un seul cycle de vie de l'application : ses pools ne redémarrent pas après l'arrêt
+                    from fastapi.testclient import TestClient
+                    import main
+                    client = stack.enter_context(TestClient(main.app))
+                if section == "load":
+                    metrics.update(bench_load("models", list(models), repeat))
+                elif section == "inference":
+                    metrics.update(bench_inference(models, X_test, repeat))
+                elif section == "api":
+                    metrics.update(bench_api(client, list(models), X_test, api_requests))
+                elif section == "training":
+                    metrics.update(bench_training(client))
+                timings[section] = round(time.perf_counter() - start, 3)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "created_at": datetime.now().isoformat(),
+        "environment": environment(),
+        "settings": {"sections": sections, "repeat": repeat, "api_requests": api_requests},
+        "section_seconds": timings,
+        "metrics": {key: round(value, 4) for key, value in sorted(metrics.items())},
+        # Débit d'inférence dérivé des temps par lot (information, non comparé)
+        "throughput_rows_per_s": {
+            key: round(int(key.split(".")[1][len("batch_"):]) / value * 1000.0, 1)
+            for key, value in sorted(metrics.items()) if key.startswith("inference.") and value > 0
+        },
+    }
+
+
+def environment_differences(results: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, List[Any]]:
+    """Champs de COMPARED_ENVIRONMENT qui diffèrent : {champ: [baseline, actuel]}"""
+    current = results.get("environment", {})
+    reference = baseline.get("environment", {})
+    return {key: [reference.get(key), current.get(key)]
+            for key in COMPARED_ENVIRONMENT if reference.get(key) != current.get(key)}
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float,
+            min_delta_ms: float, gate: bool = True) -> List[Dict[str, Any]]:
+    """Mesures présentes dans les deux fichiers, avec leur écart relatif et le verdict.
+
+    regression : mesure au-delà des seuils ; gated : la régression fait échouer la
+    suite (jamais pour les p99, ni pour tout si gate=False).
+    """
+    rows = []
+    for key, value in results["metrics"].items():
+        reference = baseline["metrics"].get(key)
+        if reference is None:
+            continue
+        ratio = value / reference if reference > 0 else float("inf")
+        rows.append({
+            "metric": key, "baseline_ms": reference, "current_ms": value, "ratio": round(ratio, 3),
+            "regression": value > reference * (1 + threshold) and value - reference > min_delta_ms,
+            "gated": gate and not any(marker in key for marker in UNGATED_MARKERS),
+        })
+    return rows
+
+
+def measure_again(sections: List[str], repeat: int, api_requests: int) -> Dict[str, float]:
+    """Remesure des sections dans un processus neuf (l'application ne redémarre
+    pas dans le même processus) ; retourne ses mesures"""
+    fd, path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    try:
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--no-compare", "--output", path,
+                        "--sections", *sections, "--repeat", str(repeat), "--api-requests", str(api_requests)],
+                       check=True, stdout=subprocess.DEVNULL)
+        with open(path, 'r') as f:
+            return json.load(f)["metrics"]
+    finally:
+        os.remove(path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks chargement, inférence, API et entraînement")
+    parser.add_argument("--sections", nargs="+", choices=SECTIONS, default=list(SECTIONS))
+    parser.add_argument("-n", "--repeat", type=int, default=7, help="Répétitions par mesure (médiane)")
+    parser.add_argument("--api-requests", type=int, default=200, help="Requêtes /api/predict par modèle")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Écart relatif toléré (0.25 = 25 %% plus lent)")
+    parser.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS,
+                        help="Écart absolu minimal d'une régression (ms)")
+    parser.add_argument("--ignore-environment", action="store_true",
+                        help="Échoue sur régression même si la baseline vient d'un autre environnement")
+    parser.add_argument("--output", help="Fichier JSON des résultats (défaut : sortie standard)")
+    parser.add_argument("--confirm", type=int, default=2,
+                        help="Remesures d'une régression avant de la retenir (0 = aucune)")
+    parser.add_argument("--no-compare", action="store_true", help="Mesure seulement, sans baseline")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Enregistre les résultats comme nouvelle baseline")
+    args = parser.parse_args(argv)
+
+    results = run(args.sections, args.repeat, args.api_requests)
+
+    status = 0
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"💾 Baseline écrite: {args.baseline} ({len(results['metrics'])} mesures)")
+    elif args.no_compare:
+        pass
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        differences = environment_differences(results, baseline)
+        if differences:
+            details = ", ".join(f"{key} {old} -> {new}" for key, (old, new) in differences.items())
+            print(f"⚠️ Baseline enregistrée sur un autre environnement ({details})")
+            if not args.ignore_environment:
+                print("⚠️ Comparaison indicative : relancer --update-baseline sur cette machine")
+        gate = not differences or args.ignore_environment
+        rows = compare(results, baseline, args.threshold, args.min_delta_ms, gate)
+        for attempt in range(args.confirm):
+            suspects = [row["metric"] for row in rows if row["regression"] and row["gated"]]
+            if not suspects:
+                break
+            sections = [section for section in SECTIONS if any(key.startswith(f"{section}.") for key in suspects)]
+            print(f"🔁 Confirmation {attempt + 1}/{args.confirm} de {len(suspects)} régression(s) "
+                  f"(sections: {', '.join(sections)})")
+            again = measure_again(sections, args.repeat, args.api_requests)
+            for key in suspects:
+                if key in again:
+                    results["metrics"][key] = min(results["metrics"][key], round(again[key], 4))
+            rows = compare(results, baseline, args.threshold, args.min_delta_ms, gate)
+        results["comparison"] = {"baseline": args.baseline, "threshold": args.threshold,
+                                 "min_delta_ms": args.min_delta_ms, "confirm": args.confirm,
+                                 "environment_differences": differences, "metrics": rows}
+        for row in rows:
+            marker = ("❌" if row["gated"] else "⚠️") if row["regression"] else "  "
+            print(f"{marker} {row['metric']:45s} {row['baseline_ms']:10.3f} -> {row['current_ms']:10.3f} ms"
+                  f"  x{row['ratio']:.2f}")
+        regressions = [row for row in rows if row["regression"] and row["gated"]]
+        ignored = [row for row in rows if row["regression"] and not row["gated"]]
+        if ignored:
+            print(f"⚠️ {len(ignored)} dépassement(s) non bloquant(s) (p99 ou autre environnement)")
+        if regressions:
+            print(f"❌ {len(regressions)} régression(s) au-delà de {args.threshold:.0%}")
+            status = 1
+        else:
+            print(f"✅ Aucune régression ({len(rows)} mesures comparées)")
+    else:
+        print(f"⚠️ Pas de baseline ({args.baseline}) : lancer avec --update-baseline")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Résultats: {args.output}")
+    else:
+        print(json.dumps(results["metrics"], indent=2))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
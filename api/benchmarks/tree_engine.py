@@ -0,0 +1,108 @@
+"""Benchmark du moteur de forêts compilé (tree_engine) contre predict_proba natif.
+
+Pour chaque modèle (RandomForest et XGBoost entraînés sur le dataset, ou les
+.pkl passés en argument) : vérifie que les probabilités concordent puis mesure
+la latence médiane par taille de lot du predict_proba natif, du parcours
+compilé seul et du modèle compilé servi (qui délègue les gros lots au natif).
+
+    python benchmarks/tree_engine.py
+    python benchmarks/tree_engine.py --model models/RandomForest_top1.pkl --batch-sizes 1 64 4096
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+from tree_engine import CompiledForest, compile_model  # noqa: E402
+
+# Écart maximal toléré entre probabilités natives et compilées
+TOLERANCE = 1e-5
+
+
+def load_models(paths: List[str]) -> Dict[str, Any]:
+    if paths:
+        models = {}
+        for path in paths:
+            with open(path, 'rb') as f:
+                model = pickle.load(f)
+            models[os.path.basename(path)] = model['model'] if isinstance(model, dict) and 'model' in model else model
+        return models
+    from sklearn.ensemble import RandomForestClassifier
+    from xgboost import XGBClassifier
+    from training import load_dataset
+
+    dataset = load_dataset(os.path.join(API_DIR, "data", "kepler_preprocessed.csv"))
+    X_train, _, y_train, _ = dataset.split()
+    return {
+        "RandomForest": RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=1).fit(X_train, y_train),
+        "XGBoost": XGBClassifier(n_estimators=100, max_depth=6, random_state=42, n_jobs=1).fit(X_train, y_train),
+    }
+
+
+def median_seconds(fn, X: np.ndarray, repeat: int) -> float:
+    fn(X)  # échauffement
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(X)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def benchmark(model, batch_sizes: List[int], repeat: int) -> Dict[str, Any]:
+    start = time.perf_counter()
+    compiled = compile_model(model)
+    compile_seconds = time.perf_counter() - start
+    if not isinstance(compiled, CompiledForest):
+        return {"supported": False}
+
+    rows = np.random.default_rng(0).random((max(batch_sizes), compiled.n_features_in_))
+    max_error = float(np.abs(compiled.compiled_proba(rows) - model.predict_proba(rows)).max())
+    timings = {}
+    for size in batch_sizes:
+        X = rows[:size]
+        native = median_seconds(model.predict_proba, X, repeat)
+        fast = median_seconds(compiled.compiled_proba, X, repeat)
+        served = median_seconds(compiled.predict_proba, X, repeat)
+        timings[size] = {"native_ms": native * 1000.0, "compiled_ms": fast * 1000.0,
+                         "served_ms": served * 1000.0, "speedup": native / served}
+    return {"supported": True, "trees": compiled.n_trees, "max_depth": compiled.max_depth,
+            "native_min_rows": compiled.native_min_rows,
+            "compile_seconds": compile_seconds, "max_abs_error": max_error,
+            "matches": max_error <= TOLERANCE, "timings": timings}
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Moteur de forêts compilé vs predict_proba natif")
+    parser.add_argument("--model", action="append", default=[], help="Fichier .pkl (répétable)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 256, 4096])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, model in load_models(args.model).items():
+        results[name] = r = benchmark(model, args.batch_sizes, args.repeat)
+        if not r["supported"]:
+            print(f"⚠️ {name}: modèle non supporté par le moteur compilé")
+            continue
+        status = "✅" if r["matches"] else "❌"
+        print(f"{status} {name}: {r['trees']} arbres, profondeur {r['max_depth']}, "
+              f"compilé en {r['compile_seconds']:.2f} s, écart max {r['max_abs_error']:.2e}, "
+              f"natif à partir de {r['native_min_rows']} lignes")
+        for size, t in r["timings"].items():
+            print(f"⏱️ {size:6d} lignes  natif {t['native_ms']:8.2f} ms  compilé {t['compiled_ms']:8.2f} ms  "
+                  f"servi {t['served_ms']:8.2f} ms  x{t['speedup']:.1f}")
+    if any(r["supported"] and not r["matches"] for r in results.values()):
+        sys.exit(1)
+    return results
+
+
+if __name__ == "__main__":
+    main()
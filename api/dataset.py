@@ -0,0 +1,147 @@
+import hashlib
+import os
+import threading
+from typing import Dict, Tuple
+
+import numpy as np
+
+# Les fichiers .npy dérivés du CSV sont rangés à côté de lui, dans data/.cache/
+CACHE_DIRNAME = ".cache"
+FINGERPRINT_LENGTH = 16
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+
+
+def file_fingerprint(path: str) -> str:
+    """Empreinte SHA-256 (tronquée) du contenu d'un fichier"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:FINGERPRINT_LENGTH]
+
+
+def _atomic_save(path: str, array: np.ndarray):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+class Dataset:
+    """Dataset d'entraînement parsé une fois, adossé à des .npy mappés en mémoire.
+
+    X (float64, C-contigu) et y (int64) sont ouverts en lecture seule avec
+    mmap_mode='r' : tous les processus qui lisent le même fichier partagent
+    les mêmes pages du cache système.
+    """
+
+    def __init__(self, csv_path: str, fingerprint: str, X: np.ndarray, y: np.ndarray,
+                 columns: Tuple[str, ...], cache_prefix: str):
+        self.csv_path = csv_path
+        self.fingerprint = fingerprint
+        self.X = X
+        self.y = y
+        self.columns = columns
+        self.feature_names = columns[:-1]
+        self.target_name = columns[-1]
+        self._cache_prefix = cache_prefix
+        self._split_indices = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.y)
+
+    def split_indices(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Indices (train, test) du split stratifié 80/20, calculés une seule fois par empreinte"""
+        if self._split_indices is not None:
+            return self._split_indices
+        with self._lock:
+            if self._split_indices is None:
+                train_path = f"{self._cache_prefix}.train_idx.npy"
+                test_path = f"{self._cache_prefix}.test_idx.npy"
+                try:
+                    train_idx, test_idx = np.load(train_path), np.load(test_path)
+                except (OSError, ValueError):
+                    from sklearn.model_selection import train_test_split
+                    # Même split que train_test_split(X, y, ...) : il ne dépend que de y
+                    train_idx, test_idx = train_test_split(
+                        np.arange(len(self.y)), test_size=TEST_SIZE,
+                        random_state=RANDOM_STATE, stratify=self.y
+                    )
+                    try:
+                        _atomic_save(train_path, train_idx)
+                        _atomic_save(test_path, test_idx)
+                    except OSError as e:
+                        print(f"⚠️ Impossible d'écrire le split en cache: {e}")
+                self._split_indices = (train_idx, test_idx)
+        return self._split_indices
+
+    def to_frame(self):
+        """Reconstruit le DataFrame d'origine (features + cible) sans relire le CSV"""
+        import pandas as pd
+
+        df = pd.DataFrame(self.X, columns=list(self.feature_names))
+        df[self.target_name] = self.y
+        return df
+
+    def split(self):
+        """Retourne X_train, X_test, y_train, y_test (même split que train_test_split(..., stratify=y))"""
+        train_idx, test_idx = self.split_indices()
+        return self.X[train_idx], self.X[test_idx], self.y[train_idx], self.y[test_idx]
+
+
+# Datasets déjà ouverts dans ce processus : chemin -> ((mtime_ns, taille), Dataset)
+_datasets: Dict[str, Tuple[Tuple[int, int], Dataset]] = {}
+_datasets_lock = threading.Lock()
+
+
+def _build_sidecars(csv_path: str, prefix: str):
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
+    X = np.ascontiguousarray(df.iloc[:, :-1].to_numpy(dtype=np.float64))
+    y = np.ascontiguousarray(df.iloc[:, -1].to_numpy(dtype=np.int64))
+    columns = np.array(list(df.columns))
+    _atomic_save(f"{prefix}.columns.npy", columns)
+    _atomic_save(f"{prefix}.y.npy", y)
+    # X en dernier : sa présence signale que le cache est complet
+    _atomic_save(f"{prefix}.X.npy", X)
+    print(f"💾 Cache dataset écrit: {os.path.basename(prefix)} ({X.shape[0]} lignes)")
+
+
+def get_dataset(csv_path: str) -> Dataset:
+    """Retourne le dataset du CSV, en réutilisant le cache .npy si l'empreinte correspond.
+
+    Le CSV n'est parsé qu'une fois par contenu, tous processus confondus.
+    """
+    csv_path = os.path.abspath(csv_path)
+    st = os.stat(csv_path)
+    file_key = (st.st_mtime_ns, st.st_size)
+
+    cached = _datasets.get(csv_path)
+    if cached is not None and cached[0] == file_key:
+        return cached[1]
+
+    with _datasets_lock:
+        cached = _datasets.get(csv_path)
+        if cached is not None and cached[0] == file_key:
+            return cached[1]
+
+        fingerprint = file_fingerprint(csv_path)
+        cache_dir = os.path.join(os.path.dirname(csv_path), CACHE_DIRNAME)
+        stem = os.path.splitext(os.path.basename(csv_path))[0]
+        prefix = os.path.join(cache_dir, f"{stem}.{fingerprint}")
+
+        if not os.path.exists(f"{prefix}.X.npy"):
+            os.makedirs(cache_dir, exist_ok=True)
+            _build_sidecars(csv_path, prefix)
+
+        X = np.load(f"{prefix}.X.npy", mmap_mode='r')
+        y = np.load(f"{prefix}.y.npy", mmap_mode='r')
+        columns = tuple(np.load(f"{prefix}.columns.npy").tolist())
+
+        dataset = Dataset(csv_path, fingerprint, X, y, columns, prefix)
+        _datasets[csv_path] = (file_key, dataset)
+        return dataset
+
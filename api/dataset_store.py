@@ -0,0 +1,224 @@
+import hashlib
+import json
+import math
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from dataset import get_dataset
+from inference import CLASS_MAPPING
+
+# Les versions sont rangées dans data/store/<empreinte du CSV de base>/
+STORE_DIRNAME = "store"
+MANIFEST_FILE = "manifest.json"
+HASHES_FILE = "row_hashes.u64"
+
+
+def hash_rows(X: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Empreinte 64 bits de chaque ligne (20 features + cible)"""
+    # + 0.0 normalise -0.0 en 0.0 pour que deux lignes égales aient la même empreinte
+    rows = np.ascontiguousarray(np.column_stack([X, y.astype(np.float64)]) + 0.0)
+    hashes = np.empty(len(rows), dtype=np.uint64)
+    for i, row in enumerate(rows):
+        hashes[i] = int.from_bytes(hashlib.blake2b(row.tobytes(), digest_size=8).digest(), 'little')
+    return hashes
+
+
+class DatasetStore:
+    """Dataset versionné en ajout seul pour /api/retrain.
+
+    La version 0 est le CSV de base (via le cache .npy) ; chaque ajout crée un
+    segment v<n>.X.npy / v<n>.y.npy et une nouvelle version = base + segments 1..n.
+    Un index persistant des empreintes de lignes permet de dédupliquer les
+    nouvelles lignes en O(nouvelles lignes), sans relire le dataset complet.
+    """
+
+    def __init__(self, csv_path: str):
+        self.csv_path = csv_path
+        self._lock = threading.Lock()
+        self._opened_for = None
+        self._dir = None
+        self._manifest = None
+        self._hashes = None
+
+    # ---------- ouverture ----------
+
+    def _ensure_open(self):
+        base = get_dataset(self.csv_path)
+        if self._opened_for == base.fingerprint:
+            return base
+        with self._lock:
+            if self._opened_for == base.fingerprint:
+                return base
+            store_dir = os.path.join(os.path.dirname(base.csv_path), STORE_DIRNAME, base.fingerprint)
+            os.makedirs(store_dir, exist_ok=True)
+            manifest_path = os.path.join(store_dir, MANIFEST_FILE)
+            hashes_path = os.path.join(store_dir, HASHES_FILE)
+
+            if os.path.exists(manifest_path):
+                with open(manifest_path, 'r') as f:
+                    manifest = json.load(f)
+                # Seules les empreintes des versions publiées comptent (un ajout interrompu est ignoré)
+                known = np.fromfile(hashes_path, dtype=np.uint64)[:manifest["hash_count"]]
+            else:
+                print("🗂️ Initialisation du store de dataset (version 0)")
+                known = hash_rows(base.X, base.y)
+                known.tofile(hashes_path)
+                manifest = {
+                    "base_fingerprint": base.fingerprint,
+                    "columns": list(base.columns),
+                    "hash_count": int(len(known)),
+                    "versions": [{
+                        "version": 0,
+                        "segment": None,
+                        "added_rows": int(len(base)),
+                        "total_rows": int(len(base)),
+                        "created_at": datetime.now().isoformat(),
+                    }],
+                }
+                self._write_manifest(store_dir, manifest)
+
+            self._dir = store_dir
+            self._manifest = manifest
+            self._hashes = set(known.tolist())
+            self._opened_for = base.fingerprint
+        return base
+
+    @staticmethod
+    def _write_manifest(store_dir: str, manifest: Dict[str, Any]):
+        path = os.path.join(store_dir, MANIFEST_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, path)
+
+    # ---------- lecture ----------
+
+    def latest_version(self) -> int:
+        self._ensure_open()
+        return self._manifest["versions"][-1]["version"]
+
+    def versions(self) -> List[Dict[str, Any]]:
+        self._ensure_open()
+        return list(self._manifest["versions"])
+
+    def load(self, version: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Retourne (X, y) de la version demandée (la dernière par défaut)"""
+        base = self._ensure_open()
+        versions = self._manifest["versions"]
+        if version is None:
+            version = versions[-1]["version"]
+        if not 0 <= version < len(versions):
+            raise ValueError(f"Version de dataset inconnue: {version}")
+        if version == 0:
+            return base.X, base.y
+
+        X_parts, y_parts = [base.X], [base.y]
+        for info in versions[1:version + 1]:
+            prefix = os.path.join(self._dir, info["segment"])
+            X_parts.append(np.load(f"{prefix}.X.npy", mmap_mode='r'))
+            y_parts.append(np.load(f"{prefix}.y.npy", mmap_mode='r'))
+        return np.concatenate(X_parts), np.concatenate(y_parts)
+
+    # ---------- ajout ----------
+
+    def _validate(self, rows: List[Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """Valide les lignes contre le schéma à 21 colonnes (cible entière parmi les
+        classes connues) et les convertit en tableaux"""
+        columns = self._manifest["columns"]
+        values = []
+        for i, row in enumerate(rows):
+            if isinstance(row, dict):
+                missing = [c for c in columns if c not in row]
+                extra = [c for c in row if c not in columns]
+                if missing or extra:
+                    raise ValueError(f"Ligne {i}: colonnes manquantes {missing} / inconnues {extra}")
+                row = [row[c] for c in columns]
+            elif not isinstance(row, (list, tuple)) or len(row) != len(columns):
+                raise ValueError(f"Ligne {i}: {len(columns)} valeurs attendues")
+            try:
+                values.append([math.nan if v is None or v == "" else float(v) for v in row])
+            except (TypeError, ValueError):
+                raise ValueError(f"Ligne {i}: valeur non numérique")
+        matrix = np.array(values, dtype=np.float64).reshape(-1, len(columns))
+        # Cible absente tolérée (ligne écartée ensuite) ; sinon une classe connue, entière
+        y = matrix[:, -1]
+        present = ~np.isnan(y)
+        not_integer = np.flatnonzero(present & ~(np.isfinite(y) & (y == np.round(y))))
+        if len(not_integer):
+            i = not_integer[0]
+            raise ValueError(f"Ligne {i}: cible non entière ({y[i]})")
+        unknown = np.flatnonzero(present & ~np.isin(y, list(CLASS_MAPPING)))
+        if len(unknown):
+            i = unknown[0]
+            raise ValueError(f"Ligne {i}: classe cible inconnue ({int(y[i])}), attendues: {sorted(CLASS_MAPPING)}")
+        return matrix[:, :-1], y
+
+    def append(self, rows: List[Any], remove_duplicates: bool = True,
+               remove_na: bool = True) -> Dict[str, Any]:
+        """Ajoute des lignes et publie une nouvelle version si au moins une ligne est retenue.
+
+        Coût proportionnel au nombre de nouvelles lignes. Lève ValueError si le
+        schéma n'est pas respecté ou si une cible n'est pas une classe connue.
+        """
+        self._ensure_open()
+        with self._lock:
+            X_new, y_new = self._validate(rows)
+            stats = {"received_rows": len(X_new), "na_removed": 0, "duplicates_removed": 0}
+
+            # Une ligne sans cible est toujours écartée ; remove_na écarte aussi les features manquantes
+            na_rows = np.isnan(y_new)
+            if remove_na:
+                na_rows |= np.isnan(X_new).any(axis=1)
+            keep = ~na_rows
+            stats["na_removed"] = int(na_rows.sum())
+
+            hashes = hash_rows(X_new, y_new)
+            if remove_duplicates:
+                seen = set()
+                for i in np.flatnonzero(keep):
+                    h = int(hashes[i])
+                    if h in self._hashes or h in seen:
+                        keep[i] = False
+                        stats["duplicates_removed"] += 1
+                    else:
+                        seen.add(h)
+
+            X_new, y_new, hashes = X_new[keep], y_new[keep].astype(np.int64), hashes[keep]
+            versions = self._manifest["versions"]
+            if len(X_new) == 0:
+                return {**stats, "version": versions[-1]["version"], "added_rows": 0,
+                        "total_rows": versions[-1]["total_rows"], "created": False}
+
+            version = versions[-1]["version"] + 1
+            segment = f"v{version}"
+            prefix = os.path.join(self._dir, segment)
+            np.save(f"{prefix}.X.npy", np.ascontiguousarray(X_new))
+            np.save(f"{prefix}.y.npy", y_new)
+            with open(os.path.join(self._dir, HASHES_FILE), 'r+b') as f:
+                # Écarte la queue d'un éventuel ajout interrompu avant d'écrire
+                f.truncate(self._manifest["hash_count"] * hashes.itemsize)
+                f.seek(0, os.SEEK_END)
+                hashes.tofile(f)
+
+            info = {
+                "version": version,
+                "segment": segment,
+                "added_rows": int(len(X_new)),
+                "total_rows": versions[-1]["total_rows"] + int(len(X_new)),
+                "created_at": datetime.now().isoformat(),
+            }
+            # Le manifeste est écrit en dernier : c'est lui qui publie la version
+            manifest = dict(self._manifest)
+            manifest["versions"] = versions + [info]
+            manifest["hash_count"] = self._manifest["hash_count"] + int(len(hashes))
+            self._write_manifest(self._dir, manifest)
+            self._manifest = manifest
+            self._hashes.update(hashes.tolist())
+
+            print(f"🗂️ Dataset version {version}: +{info['added_rows']} lignes ({info['total_rows']} au total)")
+            return {**stats, "version": version, "added_rows": info["added_rows"],
+                    "total_rows": info["total_rows"], "created": True}
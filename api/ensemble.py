@@ -0,0 +1,94 @@
+import math
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from inference import SOURCE_PROBA, Prediction, align_classes, class_label, to_builtin
+
+
+def vote_scores(prediction: Prediction):
+    """Probabilités (N, K) alignées sur les classes canoniques et liste des classes.
+
+    Un modèle sans probabilités (decision_function, predict) vote avec un
+    vecteur one-hot sur sa classe prédite.
+    """
+    proba, classes = align_classes(prediction.proba, prediction.classes)
+    if prediction.source != SOURCE_PROBA:
+        index = {c: k for k, c in enumerate(classes)}
+        proba = np.zeros((len(prediction), len(classes)))
+        proba[np.arange(len(prediction)), [index[to_builtin(label)] for label in prediction.labels]] = 1.0
+    return proba, classes
+
+
+def _columns(classes: List, proba: np.ndarray) -> Dict[str, Any]:
+    labels = [classes[k] for k in proba.argmax(axis=1)]
+    return {
+        "predictions": labels,
+        "prediction_labels": [class_label(label) for label in labels],
+        # probabilities[k][i] = score de la classe k pour la ligne i
+        "probabilities": proba.T.tolist(),
+    }
+
+
+def aggregate(predictions: Dict[str, Prediction], weights: Dict[str, float]) -> Dict[str, Any]:
+    """Votes souple (moyenne des probabilités), majoritaire et pondéré des modèles.
+
+    Lève ValueError si les modèles ne prédisent pas les mêmes classes.
+    """
+    scores, classes = {}, None
+    for name, prediction in predictions.items():
+        scores[name], model_classes = vote_scores(prediction)
+        if classes is None:
+            classes = model_classes
+        elif model_classes != classes:
+            raise ValueError(f"Classes incompatibles: {name} prédit {model_classes}, attendu {classes}")
+
+    stacked = np.stack([scores[name] for name in predictions])  # (modèles, N, K)
+    soft = stacked.mean(axis=0)
+
+    # Vote majoritaire ; égalité départagée par le vote souple (< 1 voix)
+    votes = np.zeros_like(soft)
+    rows = np.arange(soft.shape[0])
+    for model_scores in stacked:
+        votes[rows, model_scores.argmax(axis=1)] += 1
+    hard = votes + soft * 0.5
+
+    w = np.array([weights[name] for name in predictions], dtype=np.float64)
+    if not np.isfinite(w).all() or (w < 0).any() or w.sum() <= 0:
+        # Poids inutilisables (tous nuls, négatifs, NaN) : vote pondéré = vote souple
+        w = np.ones_like(w)
+    weighted = np.tensordot(w, stacked, axes=1) / w.sum()
+
+    hard_result = _columns(classes, hard)
+    return {
+        "classes": classes,
+        "class_labels": [class_label(c) for c in classes],
+        "soft_vote": _columns(classes, soft),
+        "hard_vote": {
+            "predictions": hard_result["predictions"],
+            "prediction_labels": hard_result["prediction_labels"],
+            "votes": votes.T.astype(int).tolist(),
+            # Part des modèles d'accord avec la classe retenue
+            "agreement": (votes.max(axis=1) / len(predictions)).tolist(),
+        },
+        "weighted_vote": _columns(classes, weighted),
+    }
+
+
+def resolve_weights(names: List[str], scores: Dict[str, float]) -> Dict[str, Optional[float]]:
+    """f1_weighted stocké de chaque modèle (noms comparés sans la casse : RandomForest_Top1
+    dans les métriques, RandomForest_top1.pkl sur disque), None si inconnu"""
+    by_lower = {name.lower(): score for name, score in scores.items()}
+    return {name: by_lower.get(name.lower()) for name in names}
+
+
+def vote_weights(weights: Dict[str, Optional[float]]) -> Dict[str, float]:
+    """Poids du vote pondéré : un modèle sans métriques prend le poids moyen des autres
+    (1 si aucun n'en a) ; poids uniformes si leur somme n'est pas positive"""
+    known = [w for w in weights.values() if w is not None and math.isfinite(w) and w >= 0]
+    default = sum(known) / len(known) if known else 1.0
+    used = {name: w if w is not None and math.isfinite(w) and w >= 0 else default
+            for name, w in weights.items()}
+    if sum(used.values()) <= 0:
+        return {name: 1.0 for name in used}
+    return used
@@ -0,0 +1,141 @@
+import asyncio
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Tuple
+
+from telemetry import metrics
+
+# Poids de la dernière mesure dans la moyenne mobile du temps de calcul
+EWMA_ALPHA = 0.2
+
+INFERENCE_CALLS = metrics.counter("inference_calls_total", "Appels d'inférence par modèle et issue",
+                                  ("model", "outcome"))
+INFERENCE_QUEUE_WAIT = metrics.histogram("inference_queue_wait_seconds",
+                                         "Attente avant calcul (file du modèle + pool)", ("model",))
+INFERENCE_COMPUTE = metrics.histogram("inference_compute_seconds", "Durée du calcul d'inférence", ("model",))
+
+
+class InferenceOverloaded(Exception):
+    """File d'attente d'un modèle pleine : la requête doit être rejouée plus tard (429)"""
+
+    def __init__(self, model_name: str, retry_after: int):
+        super().__init__(f"Modèle {model_name} surchargé, réessayer dans {retry_after}s")
+        self.model_name = model_name
+        self.retry_after = retry_after
+
+
+class _ModelLane:
+    """Limites et compteurs d'un modèle (manipulés uniquement depuis la boucle d'événements)"""
+
+    def __init__(self, max_concurrency: int):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.avg_compute = None
+        self.total_queue_wait = 0.0
+        self.total_compute = 0.0
+
+
+class InferenceExecutor:
+    """Exécute les appels bloquants (predict, chargement de modèle) hors de la boucle d'événements.
+
+    Un pool de threads borné est partagé par tous les modèles ; chaque modèle a
+    au plus max_concurrency appels en cours et max_queue appels en attente.
+    Au-delà, InferenceOverloaded est levée avec un Retry-After estimé d'après
+    le temps de calcul moyen du modèle.
+    """
+
+    def __init__(self, max_workers: int = 4, max_concurrency: int = 2, max_queue: int = 32):
+        self.max_workers = max(1, max_workers)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        self._lanes: Dict[str, _ModelLane] = {}
+
+    def _lane(self, model_name: str) -> _ModelLane:
+        lane = self._lanes.get(model_name)
+        if lane is None:
+            lane = self._lanes[model_name] = _ModelLane(self.max_concurrency)
+        return lane
+
+    def _retry_after(self, lane: _ModelLane) -> int:
+        """Secondes avant qu'une place se libère, d'après le temps de calcul moyen"""
+        per_call = lane.avg_compute if lane.avg_compute is not None else 0.1
+        backlog = (lane.waiting + lane.running) / self.max_concurrency
+        return max(1, math.ceil(per_call * backlog))
+
+    async def run(self, model_name: str, fn: Callable, *args) -> Tuple[Any, Dict[str, float]]:
+        """Exécute fn(*args) dans le pool sous les limites du modèle.
+
+        Retourne (résultat, {"queue_wait_ms", "compute_ms"}) : l'attente (file du
+        modèle + pool) est mesurée séparément du calcul.
+        """
+        lane = self._lane(model_name)
+        if lane.waiting >= self.max_queue and lane.semaphore.locked():
+            lane.rejected += 1
+            INFERENCE_CALLS.inc(model_name, "rejected")
+            raise InferenceOverloaded(model_name, self._retry_after(lane))
+
+        enqueued = time.perf_counter()
+        lane.waiting += 1
+        try:
+            await lane.semaphore.acquire()
+        finally:
+            lane.waiting -= 1
+
+        def timed():
+            started = time.perf_counter()
+            return fn(*args), started, time.perf_counter()
+
+        lane.running += 1
+        try:
+            result, started, finished = await asyncio.get_running_loop().run_in_executor(self._pool, timed)
+        except Exception:
+            lane.failed += 1
+            INFERENCE_CALLS.inc(model_name, "failed")
+            raise
+        finally:
+            lane.running -= 1
+            lane.semaphore.release()
+
+        queue_wait, compute = started - enqueued, finished - started
+        lane.completed += 1
+        INFERENCE_CALLS.inc(model_name, "completed")
+        INFERENCE_QUEUE_WAIT.observe(queue_wait, model_name)
+        INFERENCE_COMPUTE.observe(compute, model_name)
+        lane.total_queue_wait += queue_wait
+        lane.total_compute += compute
+        lane.avg_compute = compute if lane.avg_compute is None else \
+            (1 - EWMA_ALPHA) * lane.avg_compute + EWMA_ALPHA * compute
+        return result, {"queue_wait_ms": queue_wait * 1000.0, "compute_ms": compute * 1000.0}
+
+    async def run_blocking(self, fn: Callable, *args):
+        """Appel bloquant sans limite par modèle (ex. désérialisation d'un .pkl)"""
+        return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+
+    def stats(self) -> Dict[str, Any]:
+        models = {}
+        for name, lane in list(self._lanes.items()):
+            done = lane.completed or 1
+            models[name] = {
+                "running": lane.running,
+                "waiting": lane.waiting,
+                "completed": lane.completed,
+                "rejected": lane.rejected,
+                "failed": lane.failed,
+                "avg_queue_wait_ms": lane.total_queue_wait / done * 1000.0,
+                "avg_compute_ms": lane.total_compute / done * 1000.0,
+            }
+        return {
+            "max_workers": self.max_workers,
+            "max_concurrency_per_model": self.max_concurrency,
+            "max_queue_per_model": self.max_queue,
+            "models": models,
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -1,12 +1,10 @@
 from flask import Flask, request, jsonify
-import pandas as pd
-import joblib
 import os
 import json
 
 app = Flask(__name__)
 
-# Load models
+# Models are loaded on first use: a cold start only pays for the model it serves
 models = {}
 model_paths = {
     'KNN': 'models/KNN_top1.pkl',
@@ -16,18 +14,20 @@ model_paths = {
     'LogisticRegression': 'models/LogisticRegression_top1.pkl'
 }
 
-def load_models():
-    """Load all available models"""
-    for name, path in model_paths.items():
-        try:
-            if os.path.exists(path):
-                models[name] = joblib.load(path)
-                print(f"Loaded {name} model successfully")
-        except Exception as e:
-            print(f"Error loading {name} model: {e}")
+def get_model(name):
+    """Load a model the first time it is requested (joblib and the estimator library included)"""
+    if name not in models:
+        path = model_paths.get(name)
+        if path is None or not os.path.exists(path):
+            return None
+        import joblib
+        models[name] = joblib.load(path)
+        print(f"Loaded {name} model successfully")
+    return models[name]
 
-# Load models on startup
-load_models()
+def available_models():
+    """Models that can be served, whether or not they are loaded yet"""
+    return [name for name, path in model_paths.items() if os.path.exists(path)]
 
 @app.route('/api/predict', methods=['POST'])
 def predict():
@@ -37,18 +37,19 @@ def predict():
         model_name = data.get('model', 'KNN')
         features = data.get('features', [])
         
-        if model_name not in models:
+        model = get_model(model_name)
+        if model is None:
             return jsonify({'error': f'Model {model_name} not found'}), 400
         
-        # Convert features to DataFrame
-        df = pd.DataFrame([features])
+        # One row of features (a plain 2D list: no pandas needed)
+        X = [features]
         
         # Make prediction
-        prediction = models[model_name].predict(df)
-        probability = models[model_name].predict_proba(df)
+        prediction = model.predict(X)
+        probability = model.predict_proba(X)
         
         return jsonify({
-            'prediction': prediction[0],
+            'prediction': prediction[0].item() if hasattr(prediction[0], 'item') else prediction[0],
             'probability': probability[0].tolist(),
             'model_used': model_name
         })
@@ -60,7 +61,7 @@ def predict():
 def list_models():
     """List available models"""
     return jsonify({
-        'models': list(models.keys()),
+        'models': available_models(),
         'status': 'success'
     })
 
@@ -70,7 +71,7 @@ def health():
     return jsonify({
         'status': 'healthy',
         'models_loaded': len(models),
-        'available_models': list(models.keys())
+        'available_models': available_models()
     })
 
 if __name__ == '__main__':
@@ -0,0 +1,162 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+N_FEATURES = 20
+CLASS_MAPPING = {0: "Faux Positif", 1: "Candidat", 2: "Exoplanete"}
+
+# Ordre des colonnes de data/kepler_preprocessed.csv (hors cible)
+FEATURE_NAMES = [
+    "koi_score", "planet_density_proxy", "koi_model_snr", "koi_fpflag_ss", "koi_prad",
+    "koi_duration_err1", "habitability_index", "duration_period_ratio", "koi_fpflag_co",
+    "koi_prad_err1", "koi_time0bk_err1", "koi_period", "koi_steff_err2", "koi_steff_err1",
+    "koi_period_err1", "koi_depth", "koi_fpflag_nt", "koi_impact", "koi_slogg_err2", "koi_insol",
+]
+TARGET_NAME = "koi_disposition_encoded"
+
+
+def to_feature_matrix(rows) -> np.ndarray:
+    """Convertit une liste de lignes en matrice N×20 contiguë (float64).
+
+    Lève ValueError si la forme n'est pas N×20.
+    """
+    X = np.ascontiguousarray(rows, dtype=np.float64)
+    if X.ndim == 1 and X.size == N_FEATURES:
+        X = X.reshape(1, -1)
+    if X.ndim != 2 or X.shape[1] != N_FEATURES:
+        raise ValueError(f"{N_FEATURES} caractéristiques requises par ligne (forme reçue: {X.shape})")
+    return X
+
+
+# Sources possibles des scores d'une prédiction
+SOURCE_PROBA = "predict_proba"
+SOURCE_DECISION = "decision_function"
+SOURCE_PREDICT = "predict"
+
+
+@dataclass
+class Prediction:
+    """Résultat d'un passage unique d'un modèle sur une matrice N×20"""
+    labels: np.ndarray    # (N,) classes prédites, valeurs de classes_
+    proba: np.ndarray     # (N, K) alignée sur classes ; zéros si le modèle n'a pas de probabilités
+    classes: List         # K classes, dans l'ordre de model.classes_
+    margin: np.ndarray    # (N,) écart entre les deux meilleurs scores (confiance de la décision)
+    source: str           # predict_proba, decision_function ou predict
+
+    def __len__(self):
+        return len(self.labels)
+
+    def row(self, i: int) -> "Prediction":
+        return Prediction(self.labels[i:i + 1], self.proba[i:i + 1], self.classes,
+                          self.margin[i:i + 1], self.source)
+
+    @staticmethod
+    def concat(rows: List["Prediction"]) -> "Prediction":
+        """Réassemble des résultats d'un même modèle (ex. lignes en cache et lignes calculées)"""
+        return Prediction(np.concatenate([r.labels for r in rows]), np.vstack([r.proba for r in rows]),
+                          rows[0].classes, np.concatenate([r.margin for r in rows]), rows[0].source)
+
+
+def _model_classes(model, n_columns: int = None) -> List:
+    classes = getattr(model, 'classes_', None)
+    if classes is not None:
+        return list(classes)
+    return list(range(n_columns)) if n_columns is not None else list(CLASS_MAPPING.keys())
+
+
+def _top2_margin(scores: np.ndarray) -> np.ndarray:
+    if scores.shape[1] < 2:
+        return np.ones(scores.shape[0])
+    top2 = np.partition(scores, -2, axis=1)[:, -2:]
+    return top2[:, 1] - top2[:, 0]
+
+
+def _infer_proba(model, X: np.ndarray) -> Prediction:
+    # Forêts, XGBoost, KNN, régression logistique, SVC(probability=True) :
+    # le label est l'argmax des probabilités, sans second appel à predict
+    proba = np.asarray(model.predict_proba(X), dtype=np.float64)
+    if proba.ndim == 1:
+        proba = np.column_stack([1.0 - proba, proba])
+    classes = _model_classes(model, proba.shape[1])
+    labels = np.asarray(classes)[proba.argmax(axis=1)]
+    return Prediction(labels, proba, classes, _top2_margin(proba), SOURCE_PROBA)
+
+
+def _infer_decision(model, X: np.ndarray) -> Prediction:
+    # SVC sans probabilités, classifieurs linéaires à marge : scores de décision
+    scores = np.asarray(model.decision_function(X), dtype=np.float64)
+    if scores.ndim == 1:
+        classes = _model_classes(model, 2)
+        labels = np.asarray(classes)[(scores > 0).astype(int)]
+        margin = np.abs(scores)
+    else:
+        classes = _model_classes(model, scores.shape[1])
+        labels = np.asarray(classes)[scores.argmax(axis=1)]
+        margin = _top2_margin(scores)
+    proba = np.zeros((len(labels), len(classes)), dtype=np.float64)
+    return Prediction(labels, proba, classes, margin, SOURCE_DECISION)
+
+
+def _infer_predict(model, X: np.ndarray) -> Prediction:
+    labels = np.asarray(model.predict(X))
+    classes = _model_classes(model)
+    proba = np.zeros((len(labels), len(classes)), dtype=np.float64)
+    return Prediction(labels, proba, classes, np.zeros(len(labels)), SOURCE_PREDICT)
+
+
+def select_adapter(model) -> Callable[[Any, np.ndarray], Prediction]:
+    """Méthode d'inférence d'un estimateur : un seul appel au modèle par prédiction.
+
+    hasattr suit les capacités réelles de l'instance (ex. SVC n'expose
+    predict_proba que si probability=True).
+    """
+    if hasattr(model, 'predict_proba'):
+        return _infer_proba
+    if hasattr(model, 'decision_function'):
+        return _infer_decision
+    return _infer_predict
+
+
+def infer(model, X: np.ndarray) -> Prediction:
+    """Prédit toute la matrice en un seul passage vectorisé (labels, probabilités, marge)"""
+    return select_adapter(model)(model, X)
+
+
+def to_builtin(value):
+    """Valeur JSON d'un label NumPy (np.int64 -> int, np.str_ -> str)"""
+    return value.item() if hasattr(value, 'item') else value
+
+
+def class_label(value) -> str:
+    value = to_builtin(value)
+    return CLASS_MAPPING.get(value, str(value))
+
+
+def align_classes(proba: np.ndarray, classes: List) -> Tuple[np.ndarray, List]:
+    """Colonnes de sortie : les 3 classes connues dans l'ordre 0, 1, 2 si le modèle n'en
+    connaît qu'un sous-ensemble (colonnes absentes à 0), sinon l'ordre de classes_."""
+    classes = [to_builtin(c) for c in classes]
+    known = list(CLASS_MAPPING.keys())
+    if classes == known or not all(c in CLASS_MAPPING for c in classes):
+        return proba, classes
+    aligned = np.zeros((proba.shape[0], len(known)), dtype=proba.dtype)
+    for k, c in enumerate(classes):
+        aligned[:, known.index(c)] = proba[:, k]
+    return aligned, known
+
+
+def columnar_result(prediction: Prediction) -> Dict:
+    """Formate un résultat de lot par colonnes (une liste par champ)"""
+    labels = [to_builtin(label) for label in prediction.labels]
+    proba, classes = align_classes(prediction.proba, prediction.classes)
+    return {
+        "predictions": labels,
+        "prediction_labels": [class_label(label) for label in labels],
+        "classes": classes,
+        "class_labels": [class_label(c) for c in classes],
+        # probabilities[k][i] = probabilité de la classe k pour la ligne i
+        "probabilities": proba.T.tolist(),
+        "margins": prediction.margin.tolist(),
+        "probability_source": prediction.source,
+    }
@@ -0,0 +1,349 @@
+import os
+import pickle
+import threading
+import time
+import uuid
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, CancelledError
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from telemetry import DURATION_BUCKETS, metrics
+
+# Phases d'un entraînement et progression associée (0 → 1)
+PHASES = ["load", "split", "fit", "evaluate", "persist"]
+PHASE_PROGRESS = {"load": 0.05, "split": 0.15, "fit": 0.25, "evaluate": 0.85, "persist": 0.95}
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+FINISHED_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED, STATUS_CANCELLED)
+
+# Nombre de jobs terminés conservés pour consultation
+MAX_FINISHED_JOBS = 200
+
+TRAINING_JOBS = metrics.counter("training_jobs_total", "Jobs d'entraînement terminés", ("kind", "status"))
+TRAINING_PHASE_SECONDS = metrics.histogram("training_phase_duration_seconds",
+                                           "Durée des phases des jobs d'entraînement", ("kind", "phase"),
+                                           buckets=DURATION_BUCKETS)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class _PhaseTracker:
+    """Publie la phase courante d'un job et vérifie l'annulation entre les phases"""
+
+    def __init__(self, job_id: str, progress, cancel_flags):
+        self.job_id = job_id
+        self.progress = progress
+        self.cancel_flags = cancel_flags
+        self.phase_times = {}
+        self._phase = None
+        self._started = None
+
+    def enter(self, phase: str):
+        self._close()
+        if self.cancel_flags.get(self.job_id):
+            raise JobCancelled()
+        self.progress[self.job_id] = {"phase": phase, "progress": PHASE_PROGRESS[phase],
+                                      "phase_times": dict(self.phase_times)}
+        self._phase, self._started = phase, time.perf_counter()
+
+    def _close(self):
+        if self._phase is not None:
+            self.phase_times[self._phase] = time.perf_counter() - self._started
+            self._phase = None
+
+    def finish(self):
+        self._close()
+        self.progress[self.job_id] = {"phase": "persist", "progress": 1.0,
+                                      "phase_times": dict(self.phase_times)}
+
+
+def _persist_model(model, models_dir: str, name: str, feature_names: List[str],
+                   dataset_fingerprint: str) -> Tuple[str, str]:
+    """Écrit le modèle par contenu (models/.objects), publie l'alias models/<name>.pkl
+    et son sidecar de métadonnées.
+
+    Le remplacement de l'alias est atomique : le registre ne voit jamais un fichier partiel.
+    L'export arrays (chargé sans pickle par le registre) suit le contenu ; tant
+    qu'il n'existe pas, le registre lit le pickle.
+    """
+    from model_format import export_model, export_path
+    from model_store import content_hash, describe_model, save_model_bytes
+
+    data = pickle.dumps(model)
+    digest = content_hash(data)
+    metadata = describe_model(model, feature_names=list(feature_names),
+                              dataset_fingerprint=dataset_fingerprint)
+    model_path = save_model_bytes(models_dir, name, data, metadata)
+    try:
+        export_model(model, export_path(models_dir, digest), {"content_hash": digest, "size_bytes": len(data)})
+    except Exception as e:
+        print(f"⚠️ Export arrays impossible pour {name}: {e}")
+    return model_path, digest
+
+
+def run_training_job(job_id: str, name: str, model_type: str, hyperparams: Dict[str, Any],
+                     models_dir: str, data_path: str, progress, cancel_flags) -> Dict[str, Any]:
+    """Exécuté dans un processus du pool : entraîne, évalue et écrit models/<name>.pkl.
+
+    L'annulation est coopérative : elle est vérifiée entre chaque phase.
+    """
+    from training import build_custom_model, load_dataset, split_dataset, evaluate_model
+
+    tracker = _PhaseTracker(job_id, progress, cancel_flags)
+
+    tracker.enter("load")
+    dataset = load_dataset(data_path)
+
+    tracker.enter("split")
+    X_train, X_test, y_train, y_test = split_dataset(dataset)
+
+    tracker.enter("fit")
+    model = build_custom_model(model_type, hyperparams)
+    model.fit(X_train, y_train)
+
+    tracker.enter("evaluate")
+    metrics = evaluate_model(model, X_test, y_test)
+
+    tracker.enter("persist")
+    model_path, digest = _persist_model(model, models_dir, name, dataset.feature_names,
+                                        dataset.fingerprint)
+    tracker.finish()
+
+    return {
+        "model_path": model_path,
+        "content_hash": digest,
+        "metrics": metrics,
+        "training_samples": len(X_train),
+        "testing_samples": len(X_test),
+        "phase_times": tracker.phase_times,
+        "dataset_fingerprint": dataset.fingerprint,
+    }
+
+
+def run_retrain_job(job_id: str, name: str, estimator, dataset_version: int,
+                    models_dir: str, data_path: str, progress, cancel_flags) -> Dict[str, Any]:
+    """Exécuté dans un processus du pool : ré-entraîne une copie non entraînée du modèle
+    d'origine sur une version du dataset. Le modèle servi n'est jamais modifié."""
+    from dataset_store import DatasetStore
+    from training import load_dataset, split_dataset, evaluate_model
+
+    tracker = _PhaseTracker(job_id, progress, cancel_flags)
+
+    tracker.enter("load")
+    base = load_dataset(data_path)
+    if dataset_version != 0:
+        X, y = DatasetStore(data_path).load(dataset_version)
+
+    tracker.enter("split")
+    if dataset_version == 0:
+        X_train, X_test, y_train, y_test = split_dataset(base)
+    else:
+        from sklearn.model_selection import train_test_split
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=0.2, random_state=42, stratify=y
+        )
+
+    tracker.enter("fit")
+    estimator.fit(X_train, y_train)
+
+    tracker.enter("evaluate")
+    metrics = evaluate_model(estimator, X_test, y_test)
+
+    tracker.enter("persist")
+    # Empreinte "<CSV de base>@v<version>" : identifie exactement les données d'entraînement
+    fingerprint = base.fingerprint if dataset_version == 0 else f"{base.fingerprint}@v{dataset_version}"
+    model_path, digest = _persist_model(estimator, models_dir, name, base.feature_names, fingerprint)
+    tracker.finish()
+
+    return {
+        "model_path": model_path,
+        "content_hash": digest,
+        "metrics": metrics,
+        "training_samples": len(X_train),
+        "testing_samples": len(X_test),
+        "dataset_size": len(X_train) + len(X_test),
+        "phase_times": tracker.phase_times,
+        "dataset_fingerprint": fingerprint,
+    }
+
+
+class TrainingJobManager:
+    """File de jobs d'entraînement exécutés dans un pool de processus borné.
+
+    Le callback on_success(job, result) passé à la soumission est appelé dans
+    le processus parent quand le job réussit ; sa valeur de retour devient le
+    résultat publié du job.
+    """
+
+    def __init__(self, max_workers: int = 2, models_dir: str = "models",
+                 data_path: str = "data/kepler_preprocessed.csv"):
+        self.max_workers = max_workers
+        self.models_dir = models_dir
+        self.data_path = data_path
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._futures = {}
+        self._callbacks = {}
+        # Futures résolues une fois le job finalisé (callback compris)
+        self._finalized: Dict[str, Future] = {}
+        self._executor = None
+        self._manager = None
+        self._progress = None
+        self._cancel_flags = None
+
+    def _ensure_started(self):
+        if self._executor is None:
+            # spawn : pas de fork d'un serveur multi-thread (OpenMP, xgboost)
+            ctx = multiprocessing.get_context("spawn")
+            self._manager = ctx.Manager()
+            self._progress = self._manager.dict()
+            self._cancel_flags = self._manager.dict()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=ctx)
+
+    def submit(self, name: str, model_type: str, hyperparams: Dict[str, Any],
+               on_success: Optional[Callable[[Dict, Dict], Dict]] = None) -> Dict[str, Any]:
+        """Soumet l'entraînement d'un nouveau modèle"""
+        job = {"kind": "train", "model_name": name, "model_type": model_type,
+               "hyperparameters": hyperparams}
+        return self._submit(job, run_training_job, (name, model_type, hyperparams), on_success)
+
+    def submit_retrain(self, name: str, original_model: str, estimator, dataset_version: int,
+                       on_success: Optional[Callable[[Dict, Dict], Dict]] = None) -> Dict[str, Any]:
+        """Soumet le ré-entraînement d'une copie (non entraînée) d'un modèle existant"""
+        job = {"kind": "retrain", "model_name": name, "original_model": original_model,
+               "model_type": type(estimator).__name__, "dataset_version": dataset_version}
+        return self._submit(job, run_retrain_job, (name, estimator, dataset_version), on_success)
+
+    def _submit(self, fields: Dict[str, Any], fn, args, on_success) -> Dict[str, Any]:
+        with self._lock:
+            self._ensure_started()
+            job_id = uuid.uuid4().hex
+            job = {
+                "job_id": job_id,
+                **fields,
+                "status": STATUS_QUEUED,
+                "phase": None,
+                "progress": 0.0,
+                "submitted_at": datetime.now().isoformat(),
+                "started_at": None,
+                "finished_at": None,
+                "cancel_requested": False,
+                "result": None,
+                "error": None,
+            }
+            self._jobs[job_id] = job
+            future = self._executor.submit(
+                fn, job_id, *args,
+                # Chemins absolus : les workers ne dépendent pas du répertoire courant
+                os.path.abspath(self.models_dir), os.path.abspath(self.data_path),
+                self._progress, self._cancel_flags
+            )
+            self._futures[job_id] = future
+            self._callbacks[job_id] = on_success
+            self._finalized[job_id] = Future()
+            self._prune()
+        future.add_done_callback(lambda f, job_id=job_id: self._on_done(job_id, f))
+        return self.get(job_id)
+
+    def _on_done(self, job_id: str, future):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        update = {"finished_at": datetime.now().isoformat()}
+        try:
+            live = self._progress.get(job_id)
+        except Exception:
+            live = None
+        if live:
+            update.update(phase=live["phase"], progress=live["progress"],
+                          phase_times=live.get("phase_times", {}))
+        try:
+            result = future.result()
+            on_success = self._callbacks.get(job_id)
+            if on_success is not None:
+                result = on_success(job, result)
+            update.update(status=STATUS_SUCCEEDED, progress=1.0, result=result)
+            print(f"✅ Job {job_id} terminé ({job['model_name']})")
+        except (CancelledError, JobCancelled):
+            update.update(status=STATUS_CANCELLED)
+            print(f"🛑 Job {job_id} annulé")
+        except Exception as e:
+            update.update(status=STATUS_FAILED, error=str(e))
+            print(f"❌ Job {job_id} échoué: {e}")
+        TRAINING_JOBS.inc(job["kind"], update["status"])
+        for phase, seconds in update.get("phase_times", {}).items():
+            TRAINING_PHASE_SECONDS.observe(seconds, job["kind"], phase)
+        with self._lock:
+            job.update(update)
+            self._futures.pop(job_id, None)
+            self._callbacks.pop(job_id, None)
+            self._forget_shared(job_id)
+            finalized = self._finalized.pop(job_id, None)
+        if finalized is not None:
+            finalized.set_result(self.get(job_id))
+
+    def wait(self, job_id: str) -> Future:
+        """Future résolue avec l'état final du job (à attendre via asyncio.wrap_future)"""
+        finalized = self._finalized.get(job_id)
+        if finalized is None:
+            finalized = Future()
+            finalized.set_result(self.get(job_id))
+        return finalized
+
+    def _forget_shared(self, job_id: str):
+        try:
+            self._progress.pop(job_id, None)
+            self._cancel_flags.pop(job_id, None)
+        except Exception:
+            pass
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in FINISHED_STATUSES]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        job = dict(job)
+        if job["status"] not in FINISHED_STATUSES and self._progress is not None:
+            try:
+                live = self._progress.get(job_id)
+            except Exception:
+                live = None
+            if live:
+                job.update(status=STATUS_RUNNING, phase=live["phase"],
+                           progress=live["progress"], phase_times=live.get("phase_times", {}))
+                if job["started_at"] is None:
+                    self._jobs[job_id]["started_at"] = job["started_at"] = datetime.now().isoformat()
+        return job
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [self.get(job_id) for job_id in list(self._jobs)]
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Annule un job en attente, ou demande l'arrêt d'un job en cours à la prochaine phase"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job["status"] not in FINISHED_STATUSES:
+                job["cancel_requested"] = True
+                future = self._futures.get(job_id)
+                if future is None or not future.cancel():
+                    self._cancel_flags[job_id] = True
+        return self.get(job_id)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._manager.shutdown()
+            self._executor = None
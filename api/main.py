@@ -2,26 +2,148 @@
 
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, Response
 from pydantic import BaseModel
-import pandas as pd
 import numpy as np
-import pickle
 import os
 import json
-import glob
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.svm import SVC
-from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
-from xgboost import XGBClassifier
+import asyncio
+import time
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 import uvicorn
 
+from registry import ModelRegistry, SOURCE_BASE, SOURCE_CUSTOM, SOURCE_PKL, is_model_name, unwrap_model
+from training import SUPPORTED_MODEL_TYPES, TRAINING_DATA_PATH, clone_estimator, validate_hyperparams
+from jobs import TrainingJobManager
+from search import SearchManager
+from dataset_store import DatasetStore
+from model_store import META_SUFFIX, dedupe_directory, collect_garbage, ensure_metadata, remove_metadata
+from metrics_store import MetricsStore, KIND_CUSTOM, KIND_RETRAINED, LEGACY_FILES, model_family
+from batcher import BATCH_ROWS, MicroBatcher
+from tree_engine import compile_model
+from prefork import memory_report, serve
+from watcher import DirectoryWatcher
+from prediction_cache import PredictionCache, row_keys
+from ensemble import aggregate, resolve_weights, vote_weights
+from executor import InferenceExecutor, InferenceOverloaded
+from telemetry import CONTENT_TYPE, MetricsMiddleware, metrics
+from inference import (
+    CLASS_MAPPING, FEATURE_NAMES, N_FEATURES, Prediction,
+    to_feature_matrix, infer, align_classes, class_label, to_builtin, columnar_result
+)
+
 # Variables globales
-models_cache = {}
-custom_models_cache = {}
+# Budget mémoire des modèles chargés depuis models/ (Mo, 0 = illimité)
+MODEL_MEMORY_BUDGET_MB = int(os.environ.get("MODEL_MEMORY_BUDGET_MB", "1024"))
+
+# Moteur des forêts (RandomForest, XGBoost) chargées depuis models/ : "native" (predict_proba
+# de la bibliothèque) ou "compiled" (arbres aplatis en tableaux NumPy, voir tree_engine.py)
+TREE_ENGINE = os.environ.get("TREE_ENGINE", "native").lower()
+
+# Registre unique : modèles de base, modèles personnalisés et fichiers .pkl (chargés à la demande)
+registry = ModelRegistry("models", memory_budget=MODEL_MEMORY_BUDGET_MB * 1024 * 1024,
+                         transform=compile_model if TREE_ENGINE == "compiled" else None)
+
+# Métriques des modèles (SQLite, mode WAL)
+metrics_store = MetricsStore("metrics/metrics.db")
+
+# Dataset versionné en ajout seul utilisé par /api/retrain
+dataset_store = DatasetStore(TRAINING_DATA_PATH)
+
+# Nombre maximal d'entraînements simultanés (un processus chacun)
+TRAINING_WORKERS = int(os.environ.get("TRAINING_WORKERS", "2"))
+
+# Processus évaluant en parallèle les candidats des recherches d'hyperparamètres
+SEARCH_WORKERS = int(os.environ.get("SEARCH_WORKERS", str(os.cpu_count() or 1)))
+
+# Démarrage : modèles préchargés ("*" = tous, "" = aucun, sinon noms séparés par des virgules),
+# threads de préchargement et modèles mock (désactivés sauf demande explicite)
+PRELOAD_MODELS = os.environ.get("PRELOAD_MODELS", "*")
+PRELOAD_WORKERS = int(os.environ.get("PRELOAD_WORKERS", str(min(8, os.cpu_count() or 1))))
+ENABLE_MOCK_MODELS = os.environ.get("ENABLE_MOCK_MODELS", "0").lower() in ("1", "true", "yes")
+
+# Inférence hors de la boucle d'événements : pool de threads borné, avec par modèle
+# un nombre d'appels simultanés et une file d'attente limités (429 au-delà)
+inference_executor = InferenceExecutor(
+    max_workers=int(os.environ.get("INFERENCE_THREADS", str(os.cpu_count() or 1))),
+    max_concurrency=int(os.environ.get("INFERENCE_MODEL_CONCURRENCY", "2")),
+    max_queue=int(os.environ.get("INFERENCE_MODEL_QUEUE", "32"))
+)
+
+# Micro-batching de /api/predict (désactivé par défaut) : les requêtes concurrentes d'un
+# même modèle attendent au plus PREDICT_BATCH_WINDOW_MS et sont prédites en un seul appel
+PREDICT_BATCHING = os.environ.get("PREDICT_BATCHING", "0").lower() in ("1", "true", "yes")
+prediction_batcher = MicroBatcher(
+    window_ms=float(os.environ.get("PREDICT_BATCH_WINDOW_MS", "2")),
+    max_batch_size=int(os.environ.get("PREDICT_BATCH_MAX_SIZE", "64")),
+    runner=inference_executor.run
+) if PREDICT_BATCHING else None
+
+# Workers HTTP lancés par `python main.py` (> 1 : modèles partagés entre workers, voir prefork.py)
+WEB_WORKERS = int(os.environ.get("WEB_WORKERS", "1"))
+
+# Surveillance de models/ et metrics/ ("auto" : inotify sinon scrutation, "poll", "off") ;
+# tant qu'elle tourne, les requêtes ne relisent plus le dossier models/
+MODEL_WATCHER = os.environ.get("MODEL_WATCHER", "auto").lower()
+MODEL_WATCH_DEBOUNCE_MS = float(os.environ.get("MODEL_WATCH_DEBOUNCE_MS", "500"))
+
+# Cache des prédictions (désactivé par défaut) : clé (hash de l'artefact, hash du vecteur),
+# LRU borné à PREDICTION_CACHE_SIZE lignes, entrées expirées après PREDICTION_CACHE_TTL_SECONDS
+PREDICTION_CACHE = os.environ.get("PREDICTION_CACHE", "0").lower() in ("1", "true", "yes")
+prediction_cache = PredictionCache(
+    max_entries=int(os.environ.get("PREDICTION_CACHE_SIZE", "10000")),
+    ttl_seconds=float(os.environ.get("PREDICTION_CACHE_TTL_SECONDS", "300"))
+) if PREDICTION_CACHE else None
+
+# Métriques Prometheus exposées par /metrics (compteurs sans verrou, voir telemetry.py)
+HTTP_REQUESTS = metrics.counter("http_requests_total", "Requêtes HTTP par méthode, route et statut",
+                                ("method", "route", "status"))
+HTTP_LATENCY = metrics.histogram("http_request_duration_seconds", "Latence des requêtes HTTP par route", ("route",))
+MODEL_REQUEST_SECONDS = metrics.histogram("model_request_duration_seconds",
+                                          "Latence des requêtes de prédiction par route, modèle et statut",
+                                          ("route", "model", "status"))
+# Libellé des noms absents du registre (404, nom invalide) : cardinalité bornée
+UNKNOWN_MODEL_LABEL = "_unknown"
+
+# Compteurs existants lus à la collecte seulement
+REGISTRY_EVENTS = ("hits", "misses", "evictions", "loads", "shared_loads", "mapped_loads", "load_errors")
+
+def collect_registry_events():
+    stats = registry.stats()
+    return [("", {"event": event}, stats[event]) for event in REGISTRY_EVENTS]
+
+def collect_registry_gauges():
+    stats = registry.stats()
+    return [("_models_loaded", {}, stats["models_loaded"]), ("_models_known", {}, stats["models_known"]),
+            ("_memory_bytes", {}, stats["memory_bytes"])]
+
+def collect_inference_in_flight():
+    samples = []
+    for name, lane in inference_executor.stats()["models"].items():
+        samples.append(("", {"model": name, "state": "running"}, lane["running"]))
+        samples.append(("", {"model": name, "state": "waiting"}, lane["waiting"]))
+    return samples
+
+def collect_prediction_cache():
+    if prediction_cache is None:
+        return []
+    stats = prediction_cache.stats()
+    return [("", {"event": event}, stats[event]) for event in ("hits", "misses", "evictions", "expirations")]
+
+metrics.collector("registry_cache_events_total", "counter",
+                  "Accès et chargements du registre de modèles (hits, misses, évictions...)", collect_registry_events)
+metrics.collector("registry", "gauge", "Modèles indexés, chargés et mémoire estimée du registre",
+                  collect_registry_gauges)
+metrics.collector("inference_in_flight", "gauge", "Appels d'inférence en cours ou en attente par modèle",
+                  collect_inference_in_flight)
+metrics.collector("prediction_cache_events_total", "counter", "Hits, misses, évictions et expirations du cache",
+                  collect_prediction_cache)
+
+# État du démarrage exposé par /api/health/ready
+startup_state: Dict[str, Any] = {"ready": False, "started_at": None, "finished_at": None,
+                                 "duration_seconds": None, "steps": {}, "models": {}, "error": None}
 
 app = FastAPI(title="NASA Exoplanet Prediction API", version="1.0.0")
 
@@ -33,6 +155,15 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware, requests=HTTP_REQUESTS, latency=HTTP_LATENCY)
+
+# Taille par défaut des blocs lus dans un CSV envoyé à /api/predict-upload
+UPLOAD_CHUNK_SIZE = 5000
+# Attentes (Retry-After) tolérées pour un bloc d'upload quand le modèle est saturé en cours de flux
+UPLOAD_OVERLOAD_RETRIES = 3
+
+# Nombre de modèles combinés par /api/predict-ensemble quand aucun n'est demandé
+ENSEMBLE_DEFAULT_TOP_K = 5
 
 # Modèles Pydantic
 class ModelConfig(BaseModel):
@@ -44,177 +175,469 @@ class PredictionRequest(BaseModel):
     model_name: str
     features: List[float]
 
+class BatchPredictionRequest(BaseModel):
+    model_name: str
+    features: List[List[float]]
+
+class SearchRequest(BaseModel):
+    type: str
+    # Hyperparamètre -> liste de valeurs (grille) ou {"low", "high", "log", "type"}
+    param_space: Dict[str, Any]
+    n_candidates: Optional[int] = None
+    eta: int = 3
+    min_samples: int = 200
+    report_top: int = 5
+    # Nombre de meilleurs candidats enregistrés dans models/ (<préfixe>_Top<rang>)
+    save_top: int = 0
+    name_prefix: Optional[str] = None
+    seed: int = 42
+
+class EnsemblePredictionRequest(BaseModel):
+    features: List[List[float]]
+    # Modèles à combiner ; par défaut les top_k meilleurs f1_weighted disponibles
+    model_names: Optional[List[str]] = None
+    top_k: int = ENSEMBLE_DEFAULT_TOP_K
+
 # ==================== ROUTES API ====================
 
 @app.get("/")
 async def root():
     return {"message": "NASA Exoplanet Prediction API", "version": "1.0.0"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Métriques au format texte Prometheus (requêtes, inférence, registre, entraînement, lots)"""
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE)
+
+@app.get("/api/health/live")
+async def health_live():
+    """Liveness : le processus répond (modèles chauds ou non)"""
+    return {"status": "alive"}
+
+@app.get("/api/health/ready")
+async def health_ready():
+    """Readiness : 200 une fois les modèles préchargés, 503 pendant le démarrage"""
+    status_code = 200 if startup_state["ready"] else 503
+    return JSONResponse(status_code=status_code, content={
+        "status": "ready" if startup_state["ready"] else "starting",
+        **startup_state
+    })
+
 @app.get("/api/list-models")
 async def get_models():
     """Liste tous les modèles disponibles"""
     try:
-        # Charger les modèles .pkl du dossier models/
-        pkl_models = load_pkl_models()
-        
-        # Combiner avec les modèles en cache
-        all_models = {**models_cache, **custom_models_cache, **pkl_models}
-        working_models = [name for name, model in all_models.items() 
-                         if model is not None and hasattr(model, 'predict')]
+        # Synchroniser l'index avec le dossier models/ (seuls les sidecars sont lus)
+        load_pkl_models()
         
         return {
             "success": True,
-            "models": working_models,
-            "base_models_count": len(models_cache),
-            "custom_models_count": len(custom_models_cache),
-            "pkl_models_count": len(pkl_models)
+            "models": registry.names(),
+            "metadata": registry.describe(),
+            "base_models_count": registry.count(SOURCE_BASE),
+            "custom_models_count": registry.count(SOURCE_CUSTOM),
+            "pkl_models_count": registry.count(SOURCE_PKL)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
 
+@app.get("/api/predict/batching")
+async def get_batching_stats():
+    """Statistiques du micro-batching de /api/predict (lots, lignes par lot, déclencheurs)"""
+    return {
+        "success": True,
+        "enabled": prediction_batcher is not None,
+        "stats": prediction_batcher.stats() if prediction_batcher is not None else None
+    }
+
+@app.get("/api/predict/cache")
+async def get_prediction_cache_stats():
+    """Statistiques du cache de prédictions (hits, misses, taux, évictions, expirations)"""
+    return {
+        "success": True,
+        "enabled": prediction_cache is not None,
+        "stats": prediction_cache.stats() if prediction_cache is not None else None
+    }
+
+@app.delete("/api/predict/cache")
+async def clear_prediction_cache():
+    """Vide le cache de prédictions"""
+    if prediction_cache is None:
+        raise HTTPException(status_code=404, detail="Cache de prédictions désactivé")
+    return {"success": True, "removed": prediction_cache.clear()}
+
+@app.get("/api/inference/stats")
+async def get_inference_stats():
+    """Appels en cours, en attente, rejetés (429) et temps moyens d'attente / de calcul par modèle"""
+    return {"success": True, "stats": inference_executor.stats()}
+
+@app.get("/api/workers/memory")
+async def get_workers_memory():
+    """RSS partagée et propre de chaque worker (et du superviseur en mode WEB_WORKERS > 1)"""
+    return {"success": True, "memory": memory_report()}
+
+@app.get("/api/registry/stats")
+async def get_registry_stats():
+    """Compteurs du cache de modèles : hits, misses, évictions et mémoire utilisée"""
+    return {"success": True, "stats": registry.stats(), "tree_engine": TREE_ENGINE,
+            "watcher": model_watcher.stats() if model_watcher is not None else None}
+
 @app.post("/api/predict")
 async def predict(prediction: PredictionRequest):
     """Fait une prédiction avec un modèle"""
+    started = time.perf_counter()
+    status = 500
     try:
         print("=" * 80)
         print("DEBUT DE LA PREDICTION")
         print(f"Modele demande: {prediction.model_name}")
         print(f"Nombre de features recues: {len(prediction.features)}")
         
-        # Charger tous les modèles disponibles
-        pkl_models = load_pkl_models()
-        all_models = {**models_cache, **custom_models_cache, **pkl_models}
-        print(f"Modeles disponibles: {list(all_models.keys())}")
+        # Ne recharge que les fichiers ajoutés ou modifiés
+        load_pkl_models()
         
-        if prediction.model_name not in all_models:
+        real_model = await resolve_model(prediction.model_name)
+        if real_model is None:
             print(f"ERREUR: Modele {prediction.model_name} non trouve")
             raise HTTPException(status_code=404, detail="Modèle non trouvé")
         
-        model_data = all_models[prediction.model_name]
-        
-        # Trouve le vrai modele dans le dict
-        if isinstance(model_data, dict) and 'model' in model_data:
-            real_model = model_data['model']
-        else:
-            real_model = model_data
-        
         if len(prediction.features) != 20:
             print(f"ERREUR: Nombre de features incorrect: {len(prediction.features)} au lieu de 20")
             raise HTTPException(status_code=400, detail="20 caractéristiques requises")
         
-        features_array = np.array(prediction.features).reshape(1, -1)
-        
-        # Prédiction
-        prediction_result = real_model.predict(features_array)[0]
-        print(f"Resultat prediction brute: {prediction_result}")
-        
-        # Probabilités
-        probabilities = None
-        if hasattr(real_model, 'predict_proba'):
-            try:
-                probabilities = real_model.predict_proba(features_array)[0].tolist()
-                print("PROBABILITES DETAILLEES:")
-                print(f"   Classe 0 (Faux Positif): {probabilities[0]:.4f}")
-                print(f"   Classe 1 (Candidat): {probabilities[1]:.4f}")
-                print(f"   Classe 2 (Exoplanete): {probabilities[2]:.4f}")
-            except Exception as e:
-                print(f"Erreur calcul probabilites: {e}")
-                probabilities = [0.0, 0.0, 0.0]
-        else:
-            probabilities = [0.0, 0.0, 0.0]
+        # Un seul appel au modèle : label, probabilités alignées sur classes_ et marge
+        async def run_model(X):
+            if prediction_batcher is not None:
+                # Regroupé avec les requêtes concurrentes de ce modèle
+                return await prediction_batcher.predict(prediction.model_name, real_model, X[0])
+            return await inference_executor.run(prediction.model_name, infer, real_model, X)
         
-        CLASS_MAPPING = {0: "Faux Positif", 1: "Candidat", 2: "Exoplanete"}
-        prediction_label = CLASS_MAPPING.get(prediction_result, "Inconnu")
+        result, timing = await cached_infer(
+            prediction.model_name, real_model, to_feature_matrix(prediction.features), run_model
+        )
+        
+        prediction_result = to_builtin(result.labels[0])
+        proba, classes = align_classes(result.proba, result.classes)
+        probabilities = proba[0].tolist()
+        print(f"Resultat prediction brute: {prediction_result} ({result.source})")
+        print("PROBABILITES DETAILLEES:")
+        for class_id, probability in zip(classes, probabilities):
+            print(f"   Classe {class_id} ({class_label(class_id)}): {probability:.4f}")
+        
+        prediction_label = class_label(prediction_result)
         
         print(f"Resultat final: {prediction_result} ({prediction_label})")
         print("Prediction terminee avec succes")
         print("=" * 80)
+        status = 200
         
         return {
             "success": True,
-            "prediction": int(prediction_result),
+            "prediction": prediction_result,
             "prediction_label": prediction_label,
             "probabilities": probabilities,
+            "classes": classes,
+            "class_labels": [class_label(class_id) for class_id in classes],
+            "margin": float(result.margin[0]),
+            "probability_source": result.source,
             "model_used": prediction.model_name,
             "features_used": prediction.features,
-            "features_count": len(prediction.features)
+            "features_count": len(prediction.features),
+            "timing": timing
         }
         
+    except HTTPException as e:
+        status = e.status_code
+        raise
+    except InferenceOverloaded as e:
+        status = 429
+        raise overloaded_error(e)
     except Exception as e:
         print(f"ERREUR lors de la prediction: {e}")
         import traceback
         print(f"Stack trace: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
+    finally:
+        observe_model_request("/api/predict", prediction.model_name, status, started)
 
-@app.post("/api/create-model")
-async def create_model(config: ModelConfig):
-    """Crée un nouveau modèle personnalisé"""
+@app.post("/api/predict-batch")
+async def predict_batch(batch: BatchPredictionRequest):
+    """Prédit une matrice N×20 en un seul appel predict_proba (résultat par colonnes)"""
+    started = time.perf_counter()
+    status = 500
     try:
-        print(f"🔄 Création du modèle: {config.name} ({config.type})")
-        
-        # Créer le modèle
-        model = create_custom_model(config.type, config.hyperparams)
-        if model is None:
-            raise HTTPException(status_code=400, detail="Type de modèle non supporté")
-        
-        # Charger et préparer les données
-        X_train, X_test, y_train, y_test = load_training_data()
-        if X_train is None:
-            raise HTTPException(status_code=500, detail="Données d'entraînement non disponibles")
+        load_pkl_models()
         
-        # Entraîner et évaluer
-        metrics = train_and_evaluate_model(model, X_train, X_test, y_train, y_test)
-        if not metrics:
-            raise HTTPException(status_code=500, detail="Erreur lors de l'entraînement")
+        real_model = await resolve_model(batch.model_name)
+        if real_model is None:
+            raise HTTPException(status_code=404, detail="Modèle non trouvé")
         
-        # Sauvegarder le modèle
-        model_path = f"models/{config.name}.pkl"
-        os.makedirs("models", exist_ok=True)
+        try:
+            features_matrix = to_feature_matrix(batch.features)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        with open(model_path, 'wb') as f:
-            pickle.dump(model, f)
+        async def run_model(X):
+            return await inference_executor.run(batch.model_name, infer, real_model, X)
         
-        # Sauvegarder les métriques
-        save_success = save_custom_model_metrics(config.name, metrics, config.hyperparams)
+        # Seules les lignes absentes du cache sont envoyées au modèle
+        result, timing = await cached_infer(batch.model_name, real_model, features_matrix, run_model)
+        print(f"📦 Lot de {len(features_matrix)} lignes prédit avec {batch.model_name}")
+        BATCH_ROWS.observe(len(features_matrix), "predict_batch")
+        status = 200
         
-        # Mettre à jour le cache
-        custom_models_cache[config.name] = model
+        return {
+            "success": True,
+            "model_used": batch.model_name,
+            "rows_count": len(features_matrix),
+            **columnar_result(result),
+            "timing": timing
+        }
         
-        # Réponse
-        response = {
+    except HTTPException as e:
+        status = e.status_code
+        raise
+    except InferenceOverloaded as e:
+        status = 429
+        raise overloaded_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
+    finally:
+        observe_model_request("/api/predict-batch", batch.model_name, status, started)
+
+@app.post("/api/predict-ensemble")
+async def predict_ensemble(request: EnsemblePredictionRequest):
+    """Prédit une matrice N×20 avec plusieurs modèles en parallèle et combine leurs
+    résultats (vote souple, vote majoritaire, vote pondéré par f1_weighted)"""
+    try:
+        load_pkl_models()
+        start = datetime.now()
+
+        try:
+            features_matrix = to_feature_matrix(request.features)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        scores = metrics_store.latest_f1()
+        if request.model_names:
+            names = list(dict.fromkeys(request.model_names))
+        else:
+            if request.top_k < 1:
+                raise HTTPException(status_code=400, detail="top_k doit être au moins 1")
+            available = registry.names()
+            known = resolve_weights(available, scores)
+            # Meilleurs f1_weighted d'abord, modèles sans métriques ensuite
+            names = sorted(available, key=lambda n: (known[n] is None, -(known[n] or 0.0), n))[:request.top_k]
+        if not names:
+            raise HTTPException(status_code=404, detail="Aucun modèle disponible")
+
+        models = {}
+        for name in names:
+            model = await resolve_model(name)
+            if model is None:
+                raise HTTPException(status_code=404, detail=f"Modèle non trouvé: {name}")
+            models[name] = model
+
+        # Un artefact partagé par plusieurs noms (même contenu) n'est prédit qu'une fois
+        groups: Dict[int, List[str]] = {}
+        for name, model in models.items():
+            groups.setdefault(id(model), []).append(name)
+
+        async def run_group(group: List[str]):
+            name, model = group[0], models[group[0]]
+
+            async def run_model(X):
+                return await inference_executor.run(name, infer, model, X)
+
+            return await cached_infer(name, model, features_matrix, run_model)
+
+        outcomes = await asyncio.gather(*(run_group(group) for group in groups.values()))
+        predictions, timings = {}, {}
+        for group, (result, timing) in zip(groups.values(), outcomes):
+            for name in group:
+                predictions[name] = result
+            timings[group[0]] = timing
+
+        weights = resolve_weights(names, scores)
+        used_weights = vote_weights(weights)
+
+        try:
+            combined = aggregate(predictions, used_weights)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        per_model = []
+        for group in groups.values():
+            for name in group:
+                per_model.append({
+                    "model_name": name,
+                    "f1_weighted": weights[name],
+                    "weight": used_weights[name],
+                    "shares_artifact_with": group[0] if name != group[0] else None,
+                    **columnar_result(predictions[name]),
+                    "timing": timings[group[0]]
+                })
+        print(f"🗳️ Ensemble de {len(names)} modèles ({len(groups)} artefacts) sur {len(features_matrix)} lignes")
+
+        return {
             "success": True,
-            "model": {
-                "name": config.name,
-                "type": "custom",
-                "accuracy": metrics['accuracy'],
-                "precision": metrics['precision'],
-                "recall": metrics['recall'],
-                "f1_score": metrics['f1_weighted'],
-                "creation_time": datetime.now().isoformat(),
-                "hyperparameters": config.hyperparams,
-                "model_file": f"{config.name}.pkl"
-            },
-            "metrics": {
-                "confusion_matrix": metrics['confusion_matrix'],
-                "classification_report": metrics['classification_report'],
-                "training_samples": len(X_train),
-                "testing_samples": len(X_test)
-            }
+            "models_used": names,
+            "artifacts_computed": len(groups),
+            "rows_count": len(features_matrix),
+            "models": per_model,
+            **combined,
+            "timing": {"total_ms": round((datetime.now() - start).total_seconds() * 1000, 3)}
         }
+
+    except HTTPException:
+        raise
+    except InferenceOverloaded as e:
+        raise overloaded_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
+
+@app.post("/api/predict-upload")
+async def predict_upload(
+    file: UploadFile = File(...),
+    model_name: str = Form(...),
+    output_format: str = Form("ndjson"),
+    chunk_size: int = Form(UPLOAD_CHUNK_SIZE)
+):
+    """Prédit un gros CSV KOI bloc par bloc et renvoie les résultats en flux (NDJSON ou CSV)"""
+    load_pkl_models()
+    
+    real_model = await resolve_model(model_name)
+    if real_model is None:
+        raise HTTPException(status_code=404, detail="Modèle non trouvé")
+    if output_format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="Format de sortie supporté: ndjson ou csv")
+    if chunk_size <= 0:
+        raise HTTPException(status_code=400, detail="chunk_size doit être positif")
+    
+    print(f"📦 Prédiction en flux - Modèle: {model_name} - Fichier: {file.filename}")
+    media_type = "application/x-ndjson" if output_format == "ndjson" else "text/csv"
+    
+    # Premier bloc prédit avant la réponse : un modèle saturé donne un 429, pas un flux en erreur
+    stream = stream_csv_predictions(model_name, real_model, file.file, output_format, chunk_size)
+    try:
+        first = await stream.__anext__()
+    except InferenceOverloaded as e:
+        await stream.aclose()
+        raise overloaded_error(e)
+    except StopAsyncIteration:
+        first = None
+    
+    async def body():
+        if first is not None:
+            yield first
+            async for piece in stream:
+                yield piece
+    
+    return StreamingResponse(body(), media_type=media_type)
+
+@app.post("/api/create-model", status_code=202)
+async def create_model(config: ModelConfig):
+    """Soumet la création d'un modèle personnalisé ; l'entraînement tourne en arrière-plan"""
+    try:
+        if config.type not in SUPPORTED_MODEL_TYPES:
+            raise HTTPException(status_code=400, detail="Type de modèle non supporté")
+        require_model_name(config.name)
+        try:
+            await run_in_threadpool(validate_hyperparams, config.type, config.hyperparams)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Hyperparamètres invalides: {e}")
+        
+        job = training_jobs.submit(
+            config.name, config.type, config.hyperparams, on_success=finalize_training_job
+        )
+        print(f"🔄 Création du modèle: {config.name} ({config.type}) - job {job['job_id']}")
         
-        print(f"✅ Modèle {config.name} créé avec accuracy: {metrics['accuracy']:.4f}")
-        return response
+        return {
+            "success": True,
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "status_url": f"/api/jobs/{job['job_id']}"
+        }
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
 
+@app.get("/api/jobs")
+async def list_jobs():
+    """Liste les jobs d'entraînement (en attente, en cours et récents)"""
+    return {"success": True, "jobs": training_jobs.list()}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Statut, phase (load, split, fit, evaluate, persist) et progression d'un job"""
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job non trouvé")
+    return {"success": True, "job": job}
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Annule un job (immédiatement s'il est en attente, à la phase suivante s'il tourne)"""
+    job = training_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job non trouvé")
+    return {"success": True, "job": job}
+
+@app.post("/api/search", status_code=202)
+async def create_search(request: SearchRequest):
+    """Lance une recherche d'hyperparamètres (successive halving) en arrière-plan"""
+    try:
+        if request.name_prefix is not None:
+            require_model_name(request.name_prefix)
+        search = search_manager.submit(
+            request.type, request.param_space, n_candidates=request.n_candidates,
+            eta=request.eta, min_samples=request.min_samples, report_top=request.report_top,
+            save_top=request.save_top, name_prefix=request.name_prefix, seed=request.seed,
+            on_success=finalize_search
+        )
+        print(f"🔎 Recherche {search['search_id']} : {search['candidates_count']} candidats {request.type}")
+        return {
+            "success": True,
+            "search_id": search["search_id"],
+            "candidates_count": search["candidates_count"],
+            "status": search["status"],
+            "status_url": f"/api/search/{search['search_id']}"
+        }
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
+
+@app.get("/api/search")
+async def list_searches():
+    """Liste les recherches d'hyperparamètres (en cours et récentes)"""
+    return {"success": True, "searches": search_manager.list()}
+
+@app.get("/api/search/{search_id}")
+async def get_search(search_id: str):
+    """Statut, paliers et classement d'une recherche"""
+    search = search_manager.get(search_id)
+    if search is None:
+        raise HTTPException(status_code=404, detail="Recherche non trouvée")
+    return {"success": True, "search": search}
+
+@app.delete("/api/search/{search_id}")
+async def cancel_search(search_id: str):
+    """Annule une recherche à la fin du palier en cours"""
+    search = search_manager.cancel(search_id)
+    if search is None:
+        raise HTTPException(status_code=404, detail="Recherche non trouvée")
+    return {"success": True, "search": search}
+
 @app.delete("/api/models/{model_name}")
 async def delete_model(model_name: str):
     """Supprime un modèle personnalisé"""
+    require_model_name(model_name)
     try:
-        metrics_file = 'metrics/custom_models_metrics.json'
         models_path = 'models'
 
         # Supprimer le fichier .pkl
@@ -225,11 +648,14 @@ async def delete_model(model_name: str):
         else:
             print(f"⚠️ Fichier modèle non trouvé: {model_file_path}")
 
-        # Mettre à jour le cache
-        custom_models_cache.pop(model_name, None)
+        # Mettre à jour le registre et libérer le contenu s'il n'a plus d'alias
+        remove_metadata(models_path, model_name)
+        registry.remove(model_name)
+        collect_garbage(models_path)
 
-        # ✅ NETTOYER LE JSON APRÈS SUPPRESSION
-        clean_metrics_json()
+        # Supprimer ses métriques (requête indexée sur le nom)
+        for kind in (KIND_CUSTOM, KIND_RETRAINED):
+            metrics_store.delete_model(model_name, kind)
 
         return {
             "success": True, 
@@ -239,154 +665,130 @@ async def delete_model(model_name: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur suppression modèle: {str(e)}")
 
-@app.get("/api/custom-models")
-async def get_custom_models():
-    """Retourne les modèles personnalisés"""
+def list_metrics(kind: str, model_type: Optional[str], model_name: Optional[str],
+                 sort_by: str, order: str, limit: Optional[int], offset: int) -> Dict:
+    """Liste filtrée, triée et paginée des métriques d'un type de modèle"""
     try:
-        # ✅ NETTOYER AVANT DE RETOURNER LES DONNÉES
-        valid_metrics = clean_metrics_json()
-        
-        if valid_metrics is not None:
-            return {"success": True, "models": valid_metrics}
-        
-        # Fallback si le nettoyage échoue
-        metrics_file = "metrics/custom_models_metrics.json"
+        models, total = metrics_store.query(
+            kind, model_type=model_type, model_name=model_name,
+            sort_by=sort_by, order=order, limit=limit, offset=offset
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Métadonnées de l'artefact depuis l'index en mémoire (None si le .pkl n'existe plus)
+    for record in models:
+        record["artifact"] = registry.metadata(record.get("model_name"))
+        record["available"] = record.get("model_name") in registry
+    return {"success": True, "models": models, "total": total, "limit": limit, "offset": offset}
 
+@app.get("/api/custom-models")
+async def get_custom_models(
+    model_type: Optional[str] = None,
+    model_name: Optional[str] = None,
+    sort_by: str = "created_at",
+    order: str = "asc",
+    limit: Optional[int] = None,
+    offset: int = 0
+):
+    """Retourne les modèles personnalisés"""
+    return list_metrics(KIND_CUSTOM, model_type, model_name, sort_by, order, limit, offset)
 
-        if os.path.exists(metrics_file):
-            with open(metrics_file, "r") as f:
-                data = json.load(f)
-            return {"success": True, "models": data}
-        
-        return {"success": True, "models": []}
-        
-    except Exception as e:
-        return {"success": True, "models": []}
 @app.get("/api/retrained-models")
-async def get_retrained_models():
+async def get_retrained_models(
+    model_type: Optional[str] = None,
+    model_name: Optional[str] = None,
+    sort_by: str = "created_at",
+    order: str = "asc",
+    limit: Optional[int] = None,
+    offset: int = 0
+):
     """Retourne les modèles réentraînés"""
-    metrics_file = "metrics/retrained_models_metrics.json"
-    if os.path.exists(metrics_file):
-        with open(metrics_file, "r") as f:
-            data = json.load(f)
-        return {"success": True, "models": data}
-    return {"success": True, "models": []}
+    return list_metrics(KIND_RETRAINED, model_type, model_name, sort_by, order, limit, offset)
+
+@app.get("/api/dataset-versions")
+async def get_dataset_versions():
+    """Liste les versions du dataset d'entraînement (0 = CSV de base)"""
+    try:
+        return {"success": True, "versions": dataset_store.versions()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
 
 # Ajoutez cette route dans votre main.py
 @app.post("/api/retrain")
 async def retrain_model(request: dict):
-    """Réentraîne un modèle avec de nouvelles données"""
+    """Réentraîne un modèle avec de nouvelles données.
+
+    Les nouvelles lignes sont ajoutées au store versionné avant l'entraînement : la
+    version créée est conservée même si l'entraînement échoue (elle est indiquée dans
+    la réponse d'erreur et peut être réutilisée via dataset_version).
+    """
     try:
         original_model_name = request.get('original_model')
         new_data = request.get('new_data', [])
         new_model_name = request.get('model_name')
         options = request.get('options', {})
         
+        require_model_name(new_model_name)
         print(f"🔄 Réentraînement de {original_model_name} vers {new_model_name}")
         print(f"📊 Nouvelles données: {len(new_data)} lignes")
         
         # Charger le modèle original
-        pkl_models = load_pkl_models()
-        all_models = {**models_cache, **custom_models_cache, **pkl_models}
+        await run_in_threadpool(load_pkl_models)
         
-        if original_model_name not in all_models:
+        original_model = await resolve_model(original_model_name)
+        if original_model is None:
             raise HTTPException(status_code=404, detail="Modèle original non trouvé")
         
-        original_model = all_models[original_model_name]
-        
-        # Convertir les nouvelles données en DataFrame
-        import pandas as pd
-        new_df = pd.DataFrame(new_data)
-        
-        # Charger le dataset original
-        original_df = pd.read_csv('data/kepler_preprocessed.csv')
-        
-        # Fusionner les datasets
-        merged_df = pd.concat([original_df, new_df], ignore_index=True)
-        
-        # Nettoyer selon les options
-        if options.get('remove_duplicates', True):
-            before_dedup = len(merged_df)
-            merged_df = merged_df.drop_duplicates()
-            duplicates_removed = before_dedup - len(merged_df)
-            print(f"🧹 Doublons supprimés: {duplicates_removed}")
-        
-        if options.get('remove_na', True):
-            before_na = len(merged_df)
-            merged_df = merged_df.dropna()
-            na_removed = before_na - len(merged_df)
-            print(f"🧹 NA supprimés: {na_removed}")
-        
-        # Préparer les données pour l'entraînement
-        X = merged_df.iloc[:, :-1].values
-        y = merged_df.iloc[:, -1].values
-        
-        # Split train-test
-        from sklearn.model_selection import train_test_split
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42, stratify=y
+        # Ajouter les nouvelles lignes au store versionné (coût proportionnel au delta)
+        try:
+            if new_data:
+                append_stats = await run_in_threadpool(
+                    dataset_store.append,
+                    new_data,
+                    remove_duplicates=options.get('remove_duplicates', True),
+                    remove_na=options.get('remove_na', True)
+                )
+                print(f"🧹 Doublons supprimés: {append_stats['duplicates_removed']}")
+                print(f"🧹 NA supprimés: {append_stats['na_removed']}")
+                dataset_version = append_stats['version']
+            else:
+                append_stats = None
+                dataset_version = int(request.get('dataset_version', dataset_store.latest_version()))
+            
+            if not 0 <= dataset_version <= dataset_store.latest_version():
+                raise ValueError(f"Version de dataset inconnue: {dataset_version}")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        version_created = append_stats is not None and append_stats['created']
+        
+        # Copie non entraînée, entraînée dans un processus du pool : le modèle
+        # servi n'est jamais modifié et les prédictions en cours ne sont pas affectées
+        estimator = clone_estimator(original_model)
+        job = training_jobs.submit_retrain(
+            new_model_name, original_model_name, estimator, dataset_version,
+            on_success=lambda job, result: finalize_retrain_job(job, result, append_stats)
         )
-        
-        # Réentraîner le modèle
-        print("🎯 Réentraînement du modèle...")
-        original_model.fit(X_train, y_train)
-        
-        # Évaluation
-        y_pred = original_model.predict(X_test)
-        from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
-        
-        accuracy = accuracy_score(y_test, y_pred)
-        report = classification_report(y_test, y_pred, output_dict=True)
-        cm = confusion_matrix(y_test, y_pred)
-        
-        metrics = {
-            'accuracy': accuracy,
-            'precision': report['weighted avg']['precision'],
-            'recall': report['weighted avg']['recall'],
-            'f1_weighted': report['weighted avg']['f1-score'],
-            'f1_macro': report['macro avg']['f1-score'],
-            'confusion_matrix': cm.tolist(),
-            'training_samples': len(X_train),
-            'testing_samples': len(X_test)
-        }
-        
-        # Sauvegarder le nouveau modèle
-        model_path = f"models/{new_model_name}.pkl"
-        with open(model_path, 'wb') as f:
-            pickle.dump(original_model, f)
-        
-        # Sauvegarder les métriques
-        retrained_metrics_file = 'metrics/retrained_models_metrics.json'
-        if os.path.exists(retrained_metrics_file):
-            with open(retrained_metrics_file, 'r') as f:
-                all_metrics = json.load(f)
-        else:
-            all_metrics = []
-        
-        model_metrics = {
-            'model_name': new_model_name,
-            'original_model': original_model_name,
-            **metrics,
-            'dataset_stats': {
-                'original_size': len(merged_df),
-                'final_size': len(merged_df)
-            },
-            'retrain_time': datetime.now().isoformat()
-        }
-        
-        all_metrics.append(model_metrics)
-        
-        with open(retrained_metrics_file, 'w') as f:
-            json.dump(all_metrics, f, indent=2)
-        
-        print(f"✅ Réentraînement terminé - Accuracy: {accuracy:.4f}")
+        print(f"🎯 Réentraînement du modèle... (job {job['job_id']})")
+        
+        final_job = await asyncio.wrap_future(training_jobs.wait(job["job_id"]))
+        if final_job["status"] != "succeeded":
+            kept = f" (version de dataset {dataset_version} conservée)" if version_created else ""
+            raise HTTPException(
+                status_code=500,
+                detail=f"Erreur réentraînement: {final_job['error'] or final_job['status']}{kept}"
+            )
         
         return {
             "success": True,
-            "metrics": metrics,
-            "model_saved": new_model_name
+            "metrics": final_job["result"]["metrics"],
+            "model_saved": new_model_name,
+            "dataset_version": dataset_version,
+            "dataset_version_created": version_created,
+            "job_id": job["job_id"]
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Erreur réentraînement: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur réentraînement: {str(e)}")
@@ -394,100 +796,320 @@ async def retrain_model(request: dict):
 # ==================== FONCTIONS UTILITAIRES ====================
 
 def load_pkl_models():
-    """Charge tous les modèles .pkl du dossier models/"""
-    pkl_models = {}
-    models_dir = "models"
-    
-    if os.path.exists(models_dir):
-        for file in os.listdir(models_dir):
-            if file.endswith('.pkl'):
-                try:
-                    model_name = file.replace('.pkl', '')
-                    with open(f"{models_dir}/{file}", 'rb') as f:
-                        model = pickle.load(f)
-                    pkl_models[model_name] = model
-                    print(f"✅ Modèle PKL chargé: {model_name}")
-                except Exception as e:
-                    print(f"❌ Erreur chargement {file}: {e}")
-    else:
-        print("📁 Aucun dossier 'models' trouvé")
-    
-    return pkl_models
+    """Synchronise l'index du registre avec le dossier models/.
 
-def create_custom_model(model_type: str, hyperparams: Dict[str, Any]):
-    try:
-        if model_type == "RandomForest":
-            return RandomForestClassifier(
-                n_estimators=hyperparams.get('n_estimators', 100),
-                max_depth=hyperparams.get('max_depth', None),
-                random_state=42
-            )
-        elif model_type == "XGBoost":
-            return XGBClassifier(
-                n_estimators=hyperparams.get('n_estimators', 100),
-                max_depth=hyperparams.get('max_depth', 6),
-                random_state=42
-            )
-        elif model_type == "SVM":
-            return SVC(
-                C=hyperparams.get('C', 1.0),
-                kernel=hyperparams.get('kernel', 'rbf'),
-                probability=True,
-                random_state=42
-            )
+    Aucun fichier n'est désérialisé ici : un modèle nouveau ou modifié (mtime/taille)
+    est chargé à sa prochaine demande. Inutile quand la surveillance tourne : elle
+    applique déjà chaque changement du dossier.
+    """
+    if model_watcher is not None and model_watcher.running:
         return None
-    except Exception as e:
-        print(f"❌ Erreur création modèle: {e}")
+    return registry.refresh()
+
+def apply_fs_changes(changes: Dict[str, Any]):
+    """Applique un lot d'événements de models/ et metrics/ (thread de surveillance)"""
+    if "models" in changes:
+        filenames = changes["models"]
+        names = None
+        if filenames is not None:
+            names = {f[:-len('.pkl')] for f in filenames if f.endswith('.pkl')}
+            names |= {f[:-len(META_SUFFIX)] for f in filenames if f.endswith(META_SUFFIX)}
+        if names is None or names:
+            stats = registry.refresh(names)
+            if stats["added"] or stats["changed"] or stats["removed"]:
+                print(f"👀 models/ : +{stats['added']} ~{stats['changed']} -{stats['removed']}")
+            if stats["removed"]:
+                clean_metrics_json()
+    if "metrics" in changes:
+        filenames = changes["metrics"]
+        if filenames is None or filenames & set(LEGACY_FILES):
+            metrics_store.import_legacy_json("metrics")
+
+model_watcher = DirectoryWatcher(
+    {"models": "models", "metrics": "metrics"}, apply_fs_changes,
+    debounce=MODEL_WATCH_DEBOUNCE_MS / 1000.0, backend=MODEL_WATCHER
+) if MODEL_WATCHER != "off" else None
+
+async def resolve_model(name: str):
+    """Estimateur prêt à prédire ; un modèle pas encore en mémoire est désérialisé
+    dans le pool d'inférence pour ne pas bloquer la boucle d'événements."""
+    entry = registry.get_entry(name)
+    if entry is None and model_watcher is not None and model_watcher.running and is_model_name(name):
+        # Fichier déposé pendant le délai de regroupement de la surveillance
+        registry.refresh([name])
+        entry = registry.get_entry(name)
+    if entry is None:
         return None
+    if entry.loaded:
+        return registry.get(name)
+    return await inference_executor.run_blocking(registry.get, name)
 
-def load_training_data():
-    try:
-        df = pd.read_csv('data/kepler_preprocessed.csv')
-        X = df.iloc[:, :-1].values
-        y = df.iloc[:, -1].values
-        
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42, stratify=y
-        )
-        
-        return X_train, X_test, y_train, y_test
-    except Exception as e:
-        print(f"❌ Erreur chargement données: {e}")
-        return None, None, None, None
+def prediction_version(name: str, model) -> Optional[str]:
+    """Version du modèle pour le cache : hash de contenu de son artefact.
+
+    None si le registre sert déjà un autre estimateur sous ce nom (remplacé
+    entre-temps) : le résultat n'est alors pas mis en cache.
+    """
+    entry = registry.get_entry(name)
+    if entry is None or unwrap_model(entry.model) is not model:
+        return None
+    # Modèles en mémoire sans fichier (mock) : identifiés par l'objet lui-même
+    return entry.content_hash or f"{name}@{id(entry.model)}"
+
+async def cached_infer(name: str, model, X: np.ndarray, run_model):
+    """Prédit X via run_model(X) -> (Prediction, temps) en ne calculant que les
+    lignes absentes du cache de prédictions"""
+    version = prediction_version(name, model) if prediction_cache is not None else None
+    if version is None:
+        return await run_model(X)
+    keys = row_keys(X)
+    rows = prediction_cache.get_rows(version, keys)
+    missing = [i for i, row in enumerate(rows) if row is None]
+    timing = {"queue_wait_ms": 0.0, "compute_ms": 0.0}
+    if missing:
+        computed, timing = await run_model(X[missing])
+        prediction_cache.put_rows(version, [keys[i] for i in missing], computed)
+        if len(missing) == len(X):
+            return computed, {**timing, "cache_hits": 0}
+        for j, i in enumerate(missing):
+            rows[i] = computed.row(j)
+    return Prediction.concat(rows), {**timing, "cache_hits": len(X) - len(missing)}
+
+def require_model_name(name: Optional[str]) -> str:
+    """Nom fourni par le client qui deviendra models/<nom>.pkl : 400 s'il sort du dossier"""
+    if not isinstance(name, str) or not is_model_name(name):
+        raise HTTPException(status_code=400, detail=f"Nom de modèle invalide: {name!r}")
+    return name
+
+def observe_model_request(route: str, model_name: str, status: int, started: float):
+    """Durée d'une requête de prédiction, quel que soit son statut (succès, 4xx, 429, 5xx)"""
+    model = model_name if model_name in registry else UNKNOWN_MODEL_LABEL
+    MODEL_REQUEST_SECONDS.observe(time.perf_counter() - started, route, model, str(status))
+
+def overloaded_error(e: InferenceOverloaded) -> HTTPException:
+    """429 avec Retry-After quand la file d'un modèle est pleine"""
+    return HTTPException(status_code=429, detail=f"Erreur: {str(e)}",
+                         headers={"Retry-After": str(e.retry_after)})
+
+def select_feature_columns(chunk):
+    """Sélectionne les 20 features par nom si possible, sinon les 20 premières colonnes"""
+    if all(name in chunk.columns for name in FEATURE_NAMES):
+        return chunk[FEATURE_NAMES]
+    return chunk.iloc[:, :N_FEATURES]
+
+def upload_csv_columns(model) -> List[str]:
+    """Colonnes du CSV de sortie, fixées avant le premier bloc à partir de classes_"""
+    classes = getattr(model, 'classes_', None)
+    classes = list(classes) if classes is not None else list(CLASS_MAPPING.keys())
+    _, classes = align_classes(np.zeros((0, len(classes))), classes)
+    return (["row", "prediction", "prediction_label"] + [f"proba_{c}" for c in classes]
+            + ["margin", "error"])
+
+def read_upload_chunk(reader, row_offset: int):
+    """Bloc suivant du CSV (bloquant) : (numéros de ligne, matrice des lignes valides,
+    masque des lignes valides), ou None à la fin du fichier"""
+    import pandas as pd
+
+    chunk = next(reader, None)
+    if chunk is None:
+        return None
+    if chunk.shape[1] < N_FEATURES:
+        raise ValueError(f"Le CSV doit avoir au moins {N_FEATURES} colonnes de features (reçu: {chunk.shape[1]})")
+    features = select_feature_columns(chunk).apply(pd.to_numeric, errors='coerce')
+    valid = features.notna().all(axis=1).to_numpy()
+    rows = np.arange(row_offset, row_offset + len(chunk))
+    X = np.ascontiguousarray(features.to_numpy(dtype=np.float64)[valid])
+    return rows, X, valid
+
+def format_upload_chunk(rows, valid, result: Optional[Prediction], output_format: str,
+                        columns: Optional[List[str]]) -> str:
+    """Prédictions d'un bloc (et ses lignes invalides) au format de sortie"""
+    import pandas as pd
+
+    out = pd.DataFrame({"row": rows[valid]})
+    if result is not None:
+        probabilities, classes = align_classes(result.proba, result.classes)
+        out["prediction"] = [to_builtin(label) for label in result.labels]
+        out["prediction_label"] = [class_label(label) for label in result.labels]
+        for k, class_id in enumerate(classes):
+            out[f"proba_{class_id}"] = probabilities[:, k]
+        out["margin"] = result.margin
+    invalid_rows = rows[~valid]
+    
+    parts = []
+    if output_format == "csv":
+        if len(out):
+            parts.append(out.reindex(columns=columns).to_csv(index=False, header=False))
+        if len(invalid_rows):
+            errors = pd.DataFrame({"row": invalid_rows, "error": "Valeurs manquantes ou non numériques"})
+            parts.append(errors.reindex(columns=columns).to_csv(index=False, header=False))
+    else:
+        if len(out):
+            parts.append(out.to_json(orient="records", lines=True).rstrip("\n") + "\n")
+        for row in invalid_rows:
+            parts.append(json.dumps({"row": int(row), "error": "Valeurs manquantes ou non numériques"}) + "\n")
+    return "".join(parts)
+
+async def predict_upload_chunk(model_name: str, model, X: np.ndarray, wait_if_overloaded: bool) -> Prediction:
+    """Prédit un bloc dans l'exécuteur borné (limites du modèle, file, temps d'attente/calcul).
+
+    Sur le premier bloc, InferenceOverloaded remonte (429) ; ensuite le flux est
+    déjà commencé : on attend Retry-After quelques fois avant d'abandonner.
+    """
+    attempt = 0
+    while True:
+        try:
+            result, _ = await inference_executor.run(model_name, infer, model, X)
+            return result
+        except InferenceOverloaded as e:
+            if not wait_if_overloaded or attempt >= UPLOAD_OVERLOAD_RETRIES:
+                raise
+            attempt += 1
+            await asyncio.sleep(e.retry_after)
+
+async def stream_csv_predictions(model_name: str, model, file_obj, output_format: str, chunk_size: int):
+    """Lit le CSV par blocs de chunk_size lignes et produit les prédictions bloc par bloc.
 
-def train_and_evaluate_model(model, X_train, X_test, y_train, y_test):
+    Seul le bloc courant est en mémoire ; chaque bloc est envoyé dès qu'il est prédit.
+    La lecture du CSV tourne dans un thread, la prédiction dans l'exécuteur
+    d'inférence. En CSV, l'en-tête est écrit une seule fois et les lignes
+    invalides sont signalées dans la colonne error, comme en NDJSON.
+    Une saturation du modèle sur le premier bloc lève InferenceOverloaded.
+    """
+    import pandas as pd  # importé au premier upload seulement
+
+    columns = upload_csv_columns(model) if output_format == "csv" else None
+    # L'en-tête part avec le premier bloc : rien n'est envoyé avant son admission
+    pending = ",".join(columns) + "\n" if columns is not None else ""
+    started = False
+
+    row_offset = 2  # ligne 1 = en-têtes
     try:
-        model.fit(X_train, y_train)
-        y_pred = model.predict(X_test)
-        
-        accuracy = accuracy_score(y_test, y_pred)
-        report = classification_report(y_test, y_pred, output_dict=True)
-        cm = confusion_matrix(y_test, y_pred)
-        
-        return {
-            'accuracy': accuracy,
-            'precision': report['weighted avg']['precision'],
-            'recall': report['weighted avg']['recall'],
-            'f1_weighted': report['weighted avg']['f1-score'],
-            'f1_macro': report['macro avg']['f1-score'],
-            'confusion_matrix': cm.tolist(),
-            'classification_report': report
-        }
+        reader = await run_in_threadpool(pd.read_csv, file_obj, chunksize=chunk_size)
+        while True:
+            chunk = await run_in_threadpool(read_upload_chunk, reader, row_offset)
+            if chunk is None:
+                break
+            rows, X, valid = chunk
+            row_offset += len(rows)
+            
+            result = None
+            if len(X):
+                result = await predict_upload_chunk(model_name, model, X, wait_if_overloaded=started)
+                BATCH_ROWS.observe(len(X), "upload")
+            
+            started = True
+            yield pending + format_upload_chunk(rows, valid, result, output_format, columns)
+            pending = ""
+        if pending:
+            yield pending
+    except InferenceOverloaded as e:
+        if not started:
+            raise
+        error = e
     except Exception as e:
-        print(f"❌ Erreur entraînement: {e}")
-        return None
+        error = e
+    else:
+        return
+    print(f"❌ Erreur prédiction en flux: {error}")
+    if output_format == "ndjson":
+        yield json.dumps({"error": str(error)}) + "\n"
+    else:
+        yield pending + pd.DataFrame([{"error": str(error)}]).reindex(columns=columns).to_csv(index=False, header=False)
+
+def finalize_training_job(job: Dict, result: Dict) -> Dict:
+    """Appelé dans le processus parent quand un job réussit : métriques + registre"""
+    name = job["model_name"]
+    metrics = result["metrics"]
+    
+    save_custom_model_metrics(name, metrics, job["hyperparameters"], job["model_type"])
+    
+    registry.load(name, result["model_path"], SOURCE_CUSTOM)
+    
+    print(f"✅ Modèle {name} créé avec accuracy: {metrics['accuracy']:.4f}")
+    return {
+        "model": {
+            "name": name,
+            "type": "custom",
+            "accuracy": metrics['accuracy'],
+            "precision": metrics['precision'],
+            "recall": metrics['recall'],
+            "f1_score": metrics['f1_weighted'],
+            "creation_time": datetime.now().isoformat(),
+            "hyperparameters": job["hyperparameters"],
+            "model_file": f"{name}.pkl"
+        },
+        "metrics": {
+            "confusion_matrix": metrics['confusion_matrix'],
+            "classification_report": metrics['classification_report'],
+            "training_samples": result["training_samples"],
+            "testing_samples": result["testing_samples"]
+        },
+        "phase_times": result["phase_times"]
+    }
 
-def save_custom_model_metrics(model_name: str, metrics: Dict, hyperparams: Dict) -> bool:
+def finalize_retrain_job(job: Dict, result: Dict, append_stats: Optional[Dict]) -> Dict:
+    """Appelé dans le processus parent quand un ré-entraînement réussit.
+
+    Le nouveau modèle est publié sous son propre nom par un remplacement atomique
+    du registre ; le modèle d'origine reste servi tel quel.
+    """
+    name = job["model_name"]
+    evaluation = result["metrics"]
+    metrics = {
+        'accuracy': evaluation['accuracy'],
+        'precision': evaluation['precision'],
+        'recall': evaluation['recall'],
+        'f1_weighted': evaluation['f1_weighted'],
+        'f1_macro': evaluation['f1_macro'],
+        'confusion_matrix': evaluation['confusion_matrix'],
+        'training_samples': result['training_samples'],
+        'testing_samples': result['testing_samples']
+    }
+    
+    registry.load(name, result["model_path"], SOURCE_CUSTOM)
+    
+    # Sauvegarder les métriques
+    model_metrics = {
+        'model_name': name,
+        'original_model': job["original_model"],
+        **metrics,
+        'dataset_version': job["dataset_version"],
+        'dataset_stats': {
+            'original_size': dataset_store.versions()[0]['total_rows'],
+            'final_size': result['dataset_size'],
+            'added_rows': append_stats['added_rows'] if append_stats else 0,
+            'duplicates_removed': append_stats['duplicates_removed'] if append_stats else 0,
+            'na_removed': append_stats['na_removed'] if append_stats else 0
+        },
+        'retrain_time': datetime.now().isoformat()
+    }
+    
+    metrics_store.append(KIND_RETRAINED, model_metrics, model_family(job["model_type"]))
+    
+    print(f"✅ Réentraînement terminé - Accuracy: {metrics['accuracy']:.4f}")
+    return {"metrics": metrics, "model_saved": name, "phase_times": result["phase_times"]}
+
+training_jobs = TrainingJobManager(
+    max_workers=TRAINING_WORKERS, models_dir="models", data_path=TRAINING_DATA_PATH
+)
+
+search_manager = SearchManager(
+    max_workers=SEARCH_WORKERS, models_dir="models", data_path=TRAINING_DATA_PATH,
+    output_dir="metrics/searches"
+)
+
+def finalize_search(search: Dict, saved: List[Dict]):
+    """Appelé quand une recherche réussit : métriques et registre des modèles enregistrés"""
+    for record in saved:
+        save_custom_model_metrics(record["model_name"], record["metrics"], record["hyperparameters"],
+                                  search["model_type"])
+        registry.load(record["model_name"], record["model_path"], SOURCE_CUSTOM)
+        print(f"✅ Modèle {record['model_name']} enregistré par la recherche {search['search_id'][:8]}")
+
+def save_custom_model_metrics(model_name: str, metrics: Dict, hyperparams: Dict,
+                              model_type: Optional[str] = None) -> bool:
     try:
-        os.makedirs("metrics", exist_ok=True)
-        metrics_file = 'metrics/custom_models_metrics.json'
-        
-        if os.path.exists(metrics_file):
-            with open(metrics_file, 'r') as f:
-                all_metrics = json.load(f)
-        else:
-            all_metrics = []
-        
         model_metrics = {
             'model_name': model_name,
             **metrics,
@@ -495,11 +1117,7 @@ def save_custom_model_metrics(model_name: str, metrics: Dict, hyperparams: Dict)
             'creation_time': datetime.now().isoformat()
         }
         
-        all_metrics.append(model_metrics)
-        
-        with open(metrics_file, 'w') as f:
-            json.dump(all_metrics, f, indent=2)
-        
+        metrics_store.append(KIND_CUSTOM, model_metrics, model_type)
         return True
     except Exception as e:
         print(f"❌ Erreur sauvegarde métriques: {e}")
@@ -508,68 +1126,122 @@ def save_custom_model_metrics(model_name: str, metrics: Dict, hyperparams: Dict)
 def create_mock_models():
     """Crée des modèles mock pour le test"""
     try:
+        from sklearn.ensemble import RandomForestClassifier
+        from xgboost import XGBClassifier
+        
         # Mock XGBoost
         xgb_model = XGBClassifier(n_estimators=10, random_state=42)
         X_dummy = np.random.rand(100, 20)
         y_dummy = np.random.randint(0, 3, 100)
         xgb_model.fit(X_dummy, y_dummy)
-        models_cache["XGBoost_top1"] = xgb_model
+        registry.register("XGBoost_top1", xgb_model, SOURCE_BASE)
         
         # Mock RandomForest
         rf_model = RandomForestClassifier(n_estimators=10, random_state=42)
         rf_model.fit(X_dummy, y_dummy)
-        models_cache["RandomForest_top1"] = rf_model
+        registry.register("RandomForest_top1", rf_model, SOURCE_BASE)
         
         print("✅ Modèles mock créés avec succès")
     except Exception as e:
         print(f"❌ Erreur création modèles mock: {e}")
 
+def preload_names() -> List[str]:
+    """Modèles à précharger d'après PRELOAD_MODELS"""
+    if PRELOAD_MODELS.strip() == "*":
+        return registry.names()
+    wanted = [name.strip() for name in PRELOAD_MODELS.split(",") if name.strip()]
+    return [name for name in wanted if name in registry]
+
+def warm_up(preload_workers: int = PRELOAD_WORKERS):
+    """Préparation complète du service, exécutée hors de la boucle d'événements.
+
+    Chaque étape est chronométrée ; le service passe "ready" à la fin, même si
+    certains modèles n'ont pas pu être chargés (ils sont signalés dans "models").
+    Avec preload_workers=1, rien ne tourne hors du thread appelant (avant un fork).
+    """
+    steps = [
+        ("dedupe", lambda: dedupe_directory("models")),    # Fichiers identiques -> un seul contenu
+        ("metadata", lambda: ensure_metadata("models")),   # Sidecars .meta.json des anciens .pkl
+        ("index", registry.refresh),                       # Index de models/ (sans désérialiser)
+        ("legacy_metrics", lambda: metrics_store.import_legacy_json("metrics")),
+        ("clean_metrics", clean_metrics_json),
+    ]
+    if ENABLE_MOCK_MODELS:
+        steps.insert(0, ("mock_models", create_mock_models))
+    start = datetime.now()
+    startup_state["started_at"] = start.isoformat()
+    try:
+        for step, fn in steps:
+            t0 = datetime.now()
+            result = fn()
+            startup_state["steps"][step] = {
+                "seconds": round((datetime.now() - t0).total_seconds(), 4),
+                "result": result if isinstance(result, (dict, int)) else None
+            }
+
+        names = preload_names()
+        print(f"📊 Préchargement de {len(names)} modèles ({preload_workers} threads)...")
+        t0 = datetime.now()
+        startup_state["models"] = registry.preload(names, max_workers=preload_workers)
+        startup_state["steps"]["preload"] = {"seconds": round((datetime.now() - t0).total_seconds(), 4),
+                                             "result": len(names)}
+        for name, report in sorted(startup_state["models"].items(), key=lambda item: -item[1]["seconds"]):
+            print(f"   ⏱️ {name}: {report['seconds']:.3f}s{'' if report['loaded'] else ' (non chargé)'}")
+    except Exception as e:
+        print(f"❌ Erreur au démarrage: {e}")
+        startup_state["error"] = str(e)
+    finally:
+        finished = datetime.now()
+        startup_state["finished_at"] = finished.isoformat()
+        startup_state["duration_seconds"] = round((finished - start).total_seconds(), 4)
+        startup_state["ready"] = startup_state["error"] is None
+        print(f"✅ Service prêt en {startup_state['duration_seconds']:.2f}s" if startup_state["ready"]
+              else "❌ Service non prêt")
+
 # Initialisation
 @app.on_event("startup")
 async def startup_event():
     print("🚀 NASA Exoplanet API démarrée")
-    print("📊 Chargement des modèles existants...")
-    create_mock_models()  # Créer les modèles de base
-    load_pkl_models()     # Charger les modèles .pkl
+    if model_watcher is not None:
+        model_watcher.start()
+    if startup_state["started_at"] is not None:
+        # Worker forké par prefork.serve : le parent a déjà tout préparé
+        return
+    # Le préchargement tourne en arrière-plan : /api/health/live répond tout de suite,
+    # /api/health/ready seulement quand les modèles sont chauds
+    asyncio.get_running_loop().run_in_executor(None, warm_up)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    training_jobs.shutdown()
+    search_manager.shutdown()
+    inference_executor.shutdown()
+    if model_watcher is not None:
+        model_watcher.stop()
 
 def clean_metrics_json():
-    """Nettoie le fichier JSON des modèles qui n'ont plus de fichier .pkl"""
+    """Supprime les métriques des modèles personnalisés qui n'ont plus de fichier .pkl.
+
+    Exécuté une fois au démarrage, après l'indexation de models/ ; ensuite
+    delete_model tient la base à jour.
+    """
     try:
-        metrics_file = 'metrics/custom_models_metrics.json'
-        models_dir = 'models'
-        
-        if not os.path.exists(metrics_file):
-            return
-        
-        with open(metrics_file, 'r') as f:
-            all_metrics = json.load(f)
-        
-        # Filtrer pour garder seulement les modèles avec fichier .pkl existant
-        valid_metrics = []
         removed_count = 0
-        
-        for model in all_metrics:
-            model_name = model.get('model_name')
-            model_file = model.get('model_file', f"{model_name}.pkl")
-            model_path = os.path.join(models_dir, model_file)
-            
-            if os.path.exists(model_path):
-                valid_metrics.append(model)
-            else:
+        for model_name in metrics_store.model_names(KIND_CUSTOM):
+            if model_name not in registry:
                 print(f"🧹 Suppression du modèle {model_name} - fichier .pkl manquant")
-                removed_count += 1
-        
-        # Mettre à jour le fichier si nécessaire
+                removed_count += metrics_store.delete_model(model_name, KIND_CUSTOM)
         if removed_count > 0:
-            with open(metrics_file, 'w') as f:
-                json.dump(valid_metrics, f, indent=2)
-            print(f"✅ Fichier JSON nettoyé: {removed_count} modèles supprimés")
-            
-        return valid_metrics
-        
+            print(f"✅ Métriques nettoyées: {removed_count} entrées supprimées")
+        return removed_count
     except Exception as e:
-        print(f"❌ Erreur nettoyage JSON: {e}")
+        print(f"❌ Erreur nettoyage métriques: {e}")
         return None
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    if WEB_WORKERS > 1:
+        # Modèles chargés une fois dans le parent, partagés en copy-on-write par les workers ;
+        # chargement séquentiel : le parent ne doit avoir aucun thread au moment du fork
+        serve(app, host="0.0.0.0", port=8000, workers=WEB_WORKERS, prepare=lambda: warm_up(preload_workers=1))
+    else:
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,211 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_DB_PATH = "metrics/metrics.db"
+
+KIND_BASE = "base"            # metrics/all_models_metrics.json (modèles livrés)
+KIND_CUSTOM = "custom"        # modèles créés via /api/create-model
+KIND_RETRAINED = "retrained"  # modèles issus de /api/retrain
+
+# Anciens fichiers JSON importés une seule fois dans la base
+LEGACY_FILES = {
+    "all_models_metrics.json": KIND_BASE,
+    "custom_models_metrics.json": KIND_CUSTOM,
+    "retrained_models_metrics.json": KIND_RETRAINED,
+}
+
+# Colonnes triables exposées par les endpoints de liste
+SORTABLE_COLUMNS = ("created_at", "model_name", "model_type", "accuracy", "f1_weighted")
+
+# Nom de classe de l'estimateur -> famille
+MODEL_FAMILIES = {
+    "RandomForestClassifier": "RandomForest",
+    "XGBClassifier": "XGBoost",
+    "SVC": "SVM",
+    "KNeighborsClassifier": "KNN",
+    "LogisticRegression": "LogisticRegression",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS model_metrics (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    model_name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    model_type TEXT,
+    created_at TEXT,
+    accuracy REAL,
+    f1_weighted REAL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_metrics_name ON model_metrics (model_name);
+CREATE INDEX IF NOT EXISTS idx_metrics_kind_type ON model_metrics (kind, model_type);
+CREATE INDEX IF NOT EXISTS idx_metrics_kind_created ON model_metrics (kind, created_at);
+CREATE TABLE IF NOT EXISTS legacy_imports (
+    source TEXT PRIMARY KEY,
+    rows INTEGER NOT NULL,
+    imported_at TEXT NOT NULL
+);
+"""
+
+
+def model_family(name_or_class: Optional[str]) -> Optional[str]:
+    """Famille d'un modèle à partir de sa classe ('SVC') ou de son nom ('SVM_top1')"""
+    if not name_or_class:
+        return None
+    if name_or_class in MODEL_FAMILIES:
+        return MODEL_FAMILIES[name_or_class]
+    prefix = name_or_class.split("_")[0]
+    if prefix in MODEL_FAMILIES.values():
+        return prefix
+    return None
+
+
+class MetricsStore:
+    """Stockage des métriques de modèles dans SQLite (mode WAL).
+
+    Chaque écriture est un INSERT ; les listes sont filtrées, triées et
+    paginées par SQL sur des colonnes indexées. Une connexion par thread.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        # Une connexion SQLite ne doit pas traverser un fork (workers de prefork.serve)
+        os.register_at_fork(after_in_child=self._forget_connections)
+
+    def _forget_connections(self):
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            if not self._schema_ready:
+                with self._schema_lock:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+        return conn
+
+    # ---------- écriture ----------
+
+    def append(self, kind: str, record: Dict[str, Any], model_type: Optional[str] = None) -> int:
+        """Ajoute un enregistrement de métriques (O(1))"""
+        name = record.get("model_name")
+        created_at = record.get("creation_time") or record.get("retrain_time") or datetime.now().isoformat()
+        conn = self._conn()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO model_metrics (model_name, kind, model_type, created_at, accuracy, f1_weighted, payload)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (name, kind, model_type or model_family(name), created_at,
+                 record.get("accuracy"), record.get("f1_weighted"), json.dumps(record))
+            )
+        return cursor.lastrowid
+
+    def delete_model(self, model_name: str, kind: Optional[str] = None) -> int:
+        """Supprime les métriques d'un modèle ; retourne le nombre de lignes supprimées"""
+        conn = self._conn()
+        with conn:
+            if kind is None:
+                cursor = conn.execute("DELETE FROM model_metrics WHERE model_name = ?", (model_name,))
+            else:
+                cursor = conn.execute("DELETE FROM model_metrics WHERE model_name = ? AND kind = ?",
+                                      (model_name, kind))
+        return cursor.rowcount
+
+    # ---------- lecture ----------
+
+    def query(self, kind: Optional[str] = None, model_type: Optional[str] = None,
+              model_name: Optional[str] = None, sort_by: str = "created_at", order: str = "asc",
+              limit: Optional[int] = None, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """Retourne (enregistrements de la page, nombre total correspondant aux filtres)"""
+        if sort_by not in SORTABLE_COLUMNS:
+            raise ValueError(f"Tri supporté: {', '.join(SORTABLE_COLUMNS)}")
+        direction = "DESC" if order.lower() == "desc" else "ASC"
+
+        clauses, params = [], []
+        if kind is not None:
+            clauses.append("kind = ?")
+            params.append(kind)
+        if model_type is not None:
+            clauses.append("model_type = ?")
+            params.append(model_type)
+        if model_name is not None:
+            clauses.append("model_name = ?")
+            params.append(model_name)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        conn = self._conn()
+        total = conn.execute(f"SELECT COUNT(*) FROM model_metrics {where}", params).fetchone()[0]
+        sql = f"SELECT payload FROM model_metrics {where} ORDER BY {sort_by} {direction}, id {direction}"
+        page_params = list(params)
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            page_params += [limit, offset]
+        elif offset:
+            sql += " LIMIT -1 OFFSET ?"
+            page_params.append(offset)
+        rows = conn.execute(sql, page_params).fetchall()
+        return [json.loads(payload) for (payload,) in rows], total
+
+    def model_names(self, kind: Optional[str] = None) -> List[str]:
+        conn = self._conn()
+        if kind is None:
+            rows = conn.execute("SELECT DISTINCT model_name FROM model_metrics").fetchall()
+        else:
+            rows = conn.execute("SELECT DISTINCT model_name FROM model_metrics WHERE kind = ?", (kind,)).fetchall()
+        return [name for (name,) in rows]
+
+    def latest_f1(self) -> Dict[str, float]:
+        """f1_weighted du dernier enregistrement de chaque modèle (une seule requête)"""
+        rows = self._conn().execute(
+            "SELECT model_name, f1_weighted FROM model_metrics WHERE id IN"
+            " (SELECT MAX(id) FROM model_metrics WHERE f1_weighted IS NOT NULL GROUP BY model_name)"
+        ).fetchall()
+        return {name: f1 for name, f1 in rows}
+
+    # ---------- import des anciens fichiers JSON ----------
+
+    def import_legacy_json(self, metrics_dir: str = "metrics") -> Dict[str, int]:
+        """Importe une seule fois les anciens metrics/*.json (les fichiers ne sont pas modifiés)"""
+        conn = self._conn()
+        imported = {}
+        for filename, kind in LEGACY_FILES.items():
+            path = os.path.join(metrics_dir, filename)
+            if not os.path.exists(path):
+                continue
+            done = conn.execute("SELECT 1 FROM legacy_imports WHERE source = ?", (filename,)).fetchone()
+            if done:
+                continue
+            with open(path, 'r') as f:
+                records = json.load(f)
+            with conn:
+                for record in records:
+                    name = record.get("model_name")
+                    created_at = record.get("creation_time") or record.get("retrain_time")
+                    conn.execute(
+                        "INSERT INTO model_metrics (model_name, kind, model_type, created_at, accuracy, f1_weighted, payload)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (name, kind, model_family(name), created_at,
+                         record.get("accuracy"), record.get("f1_weighted"), json.dumps(record))
+                    )
+                conn.execute("INSERT INTO legacy_imports (source, rows, imported_at) VALUES (?, ?, ?)",
+                             (filename, len(records), datetime.now().isoformat()))
+            imported[filename] = len(records)
+            print(f"📥 Métriques importées depuis {filename}: {len(records)} entrées")
+        return imported
+
+
+if __name__ == "__main__":
+    # Import manuel : python metrics_store.py (depuis le dossier api/)
+    print(MetricsStore().import_legacy_json())
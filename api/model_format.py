@@ -0,0 +1,325 @@
+import copyreg
+import functools
+import importlib
+import json
+import math
+import os
+import pickle
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from model_store import ARRAYS_SUFFIX, objects_dir
+
+# Format "arrays" : en-tête JSON + tableaux bruts alignés, lu par np.memmap.
+#
+#   MAGIC | longueur de l'en-tête (uint64 LE) | en-tête JSON | bourrage | données
+#
+# L'en-tête décrit le graphe d'objets de l'estimateur ; chaque tableau NumPy y
+# est remplacé par une référence (décalage, dtype, forme) vers la zone de données.
+# Le fichier est rangé par contenu à côté du pickle d'origine :
+# models/.objects/<sha256 du .pkl>.arrays
+MAGIC = b"EXOARR1\n"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+# Seules ces classes (module:nom qualifié de leur définition) sont reconstruites au
+# chargement : les estimateurs servis, leurs arbres et les métriques des arbres KNN.
+# Un modèle contenant une autre classe n'est pas exporté et reste servi par pickle.
+ALLOWED_CLASSES = frozenset({
+    "sklearn.ensemble._forest:RandomForestClassifier",
+    "sklearn.tree._classes:DecisionTreeClassifier",
+    "sklearn.tree._tree:Tree",
+    "sklearn.svm._classes:SVC",
+    "sklearn.linear_model._logistic:LogisticRegression",
+    "sklearn.neighbors._classification:KNeighborsClassifier",
+    "sklearn.neighbors._kd_tree:KDTree",
+    "sklearn.neighbors._ball_tree:BallTree",
+    "xgboost.sklearn:XGBClassifier",
+    "xgboost.core:Booster",
+}) | frozenset(
+    f"sklearn.metrics._dist_metrics:{metric}Distance{bits}"
+    for metric in ("Euclidean", "SEuclidean", "Manhattan", "Chebyshev", "Minkowski", "Mahalanobis",
+                   "Haversine", "Hamming", "Canberra", "BrayCurtis")
+    for bits in (32, 64)
+)
+# Types d'extension reconstruits par appel du constructeur (les autres par __new__ + état)
+CONSTRUCTIBLE = {"sklearn.tree._tree:Tree"}
+
+
+class UnsupportedModel(ValueError):
+    pass
+
+
+def export_path(models_dir: str, digest: str) -> str:
+    return os.path.join(objects_dir(models_dir), f"{digest}{ARRAYS_SUFFIX}")
+
+
+def _class_name(cls: type) -> str:
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def _resolve(name: str, constructor: bool = False) -> type:
+    if name not in ALLOWED_CLASSES:
+        raise UnsupportedModel(f"Classe non autorisée: {name}")
+    if constructor and name not in CONSTRUCTIBLE:
+        raise UnsupportedModel(f"Construction non autorisée: {name}")
+    module_name, _, qualname = name.partition(":")
+    obj = importlib.import_module(module_name)
+    for part in qualname.split("."):
+        obj = getattr(obj, part, None)
+    # La classe trouvée doit être définie sous ce nom (pas un type réexporté par le module)
+    if not isinstance(obj, type) or _class_name(obj) != name:
+        raise UnsupportedModel(f"{name} n'est pas une classe autorisée")
+    return obj
+
+
+# ---------- encodage ----------
+
+class _Encoder:
+    def __init__(self):
+        self.arrays: List[np.ndarray] = []
+
+    def add_array(self, array: np.ndarray) -> int:
+        self.arrays.append(array)
+        return len(self.arrays) - 1
+
+    def encode(self, obj) -> Any:
+        if obj is None or isinstance(obj, (bool, int, str)):
+            return obj
+        if isinstance(obj, float):
+            return obj if math.isfinite(obj) else {"$t": "float", "v": repr(obj)}
+        if isinstance(obj, np.ndarray):
+            if obj.dtype.hasobject:
+                return {"$t": "objarray", "shape": list(obj.shape),
+                        "items": [self.encode(x) for x in obj.ravel()]}
+            return {"$t": "array", "i": self.add_array(obj)}
+        if isinstance(obj, np.generic):
+            return {"$t": "scalar", "dtype": obj.dtype.str, "v": self.encode(obj.item())}
+        if isinstance(obj, (bytes, bytearray)):
+            return {"$t": type(obj).__name__, "i": self.add_array(np.frombuffer(bytes(obj), dtype=np.uint8))}
+        if isinstance(obj, list):
+            return [self.encode(x) for x in obj]
+        if isinstance(obj, tuple):
+            return {"$t": "tuple", "items": [self.encode(x) for x in obj]}
+        if isinstance(obj, dict):
+            return {"$t": "dict", "items": [[self.encode(k), self.encode(v)] for k, v in obj.items()]}
+        if isinstance(obj, np.dtype):
+            return {"$t": "dtype", "descr": np.lib.format.dtype_to_descr(obj)}
+        if isinstance(obj, type):
+            _resolve(_class_name(obj))
+            return {"$t": "class", "name": _class_name(obj)}
+        return self.encode_object(obj)
+
+    def encode_object(self, obj) -> Dict[str, Any]:
+        reduced = obj.__reduce_ex__(4)
+        if isinstance(reduced, str) or len(reduced) > 3 and any(r is not None for r in reduced[3:]):
+            raise UnsupportedModel(f"Objet non exportable: {type(obj).__name__}")
+        factory, args = reduced[0], reduced[1]
+        state = reduced[2] if len(reduced) > 2 else None
+        # __newobj__ (objets Python) ou newObj (arbres et métriques de sklearn) : cls.__new__(cls)
+        if factory is copyreg.__newobj__ or (getattr(factory, "__name__", None) == "newObj"
+                                             and getattr(factory, "__module__", "").startswith("sklearn.")):
+            cls, args, new = args[0], args[1:], True
+        elif isinstance(factory, type):
+            cls, new = factory, False
+        else:
+            raise UnsupportedModel(f"Objet non exportable: {type(obj).__name__}")
+        name = _class_name(cls)
+        _resolve(name, constructor=not new)
+        return {"$t": "object", "class": name, "new": new,
+                "args": [self.encode(a) for a in args], "state": self.encode(state)}
+
+
+# ---------- décodage ----------
+
+class _Decoder:
+    def __init__(self, arrays: List[np.ndarray]):
+        self.arrays = arrays
+
+    def decode(self, node) -> Any:
+        if node is None or isinstance(node, (bool, int, float, str)):
+            return node
+        if isinstance(node, list):
+            return [self.decode(x) for x in node]
+        tag = node["$t"]
+        if tag == "float":
+            return float(node["v"])
+        if tag == "array":
+            return self.arrays[node["i"]]
+        if tag == "objarray":
+            items = [self.decode(x) for x in node["items"]]
+            array = np.empty(len(items), dtype=object)
+            array[:] = items
+            return array.reshape(node["shape"])
+        if tag == "scalar":
+            return np.dtype(node["dtype"]).type(self.decode(node["v"]))
+        if tag == "bytes":
+            return self.arrays[node["i"]].tobytes()
+        if tag == "bytearray":
+            return bytearray(self.arrays[node["i"]].tobytes())
+        if tag == "tuple":
+            return tuple(self.decode(x) for x in node["items"])
+        if tag == "dict":
+            return {_hashable(self.decode(k)): self.decode(v) for k, v in node["items"]}
+        if tag == "dtype":
+            return _dtype(node["descr"])
+        if tag == "class":
+            return _resolve(node["name"])
+        if tag == "object":
+            return self.decode_object(node)
+        raise UnsupportedModel(f"Entrée inconnue dans l'en-tête: {tag}")
+
+    def decode_object(self, node):
+        cls = _resolve(node["class"], constructor=not node["new"])
+        args = [self.decode(a) for a in node["args"]]
+        obj = cls.__new__(cls, *args) if node["new"] else cls(*args)
+        state = self.decode(node["state"])
+        if state is None:
+            return obj
+        # Même logique que pickle : __setstate__ sinon mise à jour de __dict__ (et des slots)
+        setstate = getattr(obj, "__setstate__", None)
+        if setstate is not None:
+            setstate(state)
+            return obj
+        slots = None
+        if isinstance(state, tuple) and len(state) == 2:
+            state, slots = state
+        if state:
+            obj.__dict__.update(state)
+        for key, value in (slots or {}).items():
+            setattr(obj, key, value)
+        return obj
+
+
+def _hashable(value):
+    return tuple(_hashable(v) for v in value) if isinstance(value, list) else value
+
+
+def _descr(descr):
+    """Les champs d'un dtype structuré (nom, type[, forme]) sont des tuples, devenus des listes en JSON"""
+    if isinstance(descr, str):
+        return descr
+    return [(field[0], _descr(field[1]), *[tuple(shape) for shape in field[2:]]) for field in descr]
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_dtype(key: str) -> np.dtype:
+    return np.lib.format.descr_to_dtype(_descr(json.loads(key)))
+
+
+def _dtype(descr) -> np.dtype:
+    # Les mêmes dtypes reviennent pour chaque arbre d'une forêt
+    return _parse_dtype(json.dumps(descr))
+
+
+# ---------- lecture / écriture ----------
+
+def export_model(model, path: str, source: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Écrit l'estimateur au format arrays (atomiquement) ; retourne l'en-tête.
+
+    Lève UnsupportedModel si le graphe contient une classe hors de ALLOWED_CLASSES.
+    """
+    encoder = _Encoder()
+    root = encoder.encode(model)
+
+    entries, offset = [], 0
+    for array in encoder.arrays:
+        fortran = array.ndim > 1 and array.flags.f_contiguous and not array.flags.c_contiguous
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        entries.append({"offset": offset, "nbytes": int(array.nbytes), "shape": list(array.shape),
+                        "dtype": np.lib.format.dtype_to_descr(array.dtype), "fortran": fortran})
+        offset += array.nbytes
+
+    header = {"format_version": FORMAT_VERSION, "created_at": datetime.now().isoformat(),
+              "source": source or {}, "data_bytes": offset, "arrays": entries, "root": root}
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(header_bytes).to_bytes(8, "little"))
+        f.write(header_bytes)
+        for array, entry in zip(encoder.arrays, entries):
+            f.seek(data_start + entry["offset"])
+            f.write(np.asfortranarray(array).tobytes(order="F") if entry["fortran"]
+                    else np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+    return header
+
+
+def _read_header(f) -> Dict[str, Any]:
+    if f.read(len(MAGIC)) != MAGIC:
+        raise UnsupportedModel("Fichier arrays invalide")
+    size = int.from_bytes(f.read(8), "little")
+    header = json.loads(f.read(size))
+    if header.get("format_version") != FORMAT_VERSION:
+        raise UnsupportedModel(f"Version de format non supportée: {header.get('format_version')}")
+    header["data_start"] = -(-(len(MAGIC) + 8 + size) // ALIGNMENT) * ALIGNMENT
+    return header
+
+
+def read_header(path: str) -> Dict[str, Any]:
+    with open(path, 'rb') as f:
+        return _read_header(f)
+
+
+def import_model(path: str):
+    """Reconstruit un estimateur sans pickle : les tableaux sont des vues d'un unique
+    mapping copy-on-write du fichier (pages partagées entre processus tant qu'elles
+    ne sont pas modifiées)."""
+    with open(path, 'rb') as f:
+        header = _read_header(f)
+    arrays = []
+    if header["arrays"]:
+        blob = np.memmap(path, dtype=np.uint8, mode='c').view(np.ndarray)
+        for entry in header["arrays"]:
+            start = header["data_start"] + entry["offset"]
+            dtype = _dtype(entry["dtype"])
+            array = blob[start:start + entry["nbytes"]].view(dtype)
+            arrays.append(array.reshape(entry["shape"], order="F" if entry["fortran"] else "C"))
+    return _Decoder(arrays).decode(header["root"])
+
+
+def export_directory(models_dir: str) -> Dict[str, int]:
+    """Exporte au format arrays chaque contenu de models/.objects qui n'a pas encore d'export.
+
+    Les pickles sont désérialisés une dernière fois : à lancer sur des fichiers de confiance.
+    """
+    stats = {"exported": 0, "existing": 0, "unsupported": 0, "errors": 0}
+    directory = objects_dir(models_dir)
+    if not os.path.isdir(directory):
+        return stats
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.pkl'):
+            continue
+        digest = filename[:-len('.pkl')]
+        path = export_path(models_dir, digest)
+        if os.path.exists(path):
+            stats["existing"] += 1
+            continue
+        object_path = os.path.join(directory, filename)
+        try:
+            with open(object_path, 'rb') as f:
+                model = pickle.load(f)
+            export_model(model, path, {"content_hash": digest, "size_bytes": os.path.getsize(object_path)})
+            stats["exported"] += 1
+        except UnsupportedModel as e:
+            print(f"⚠️ Export arrays impossible pour {filename}: {e}")
+            stats["unsupported"] += 1
+        except Exception as e:
+            print(f"❌ Export arrays échoué pour {filename}: {e}")
+            stats["errors"] += 1
+    return stats
+
+
+if __name__ == "__main__":
+    # python model_format.py [dossier_models] : export des modèles existants
+    # (à lancer après python model_store.py, qui range les .pkl par contenu)
+    directory = sys.argv[1] if len(sys.argv) > 1 else "models"
+    print(export_directory(directory))
@@ -0,0 +1,287 @@
+import contextlib
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus, seul le délai de grâce protège
+    fcntl = None
+
+# Les contenus sont rangés dans models/.objects/<sha256>.pkl ; chaque
+# models/<nom>.pkl est un lien physique (alias) vers son contenu.
+OBJECTS_DIRNAME = ".objects"
+
+# Métadonnées de chaque alias : models/<nom>.meta.json, écrites à la sauvegarde
+META_SUFFIX = ".meta.json"
+
+# Export sans pickle d'un contenu (voir model_format.py) : models/.objects/<sha256>.arrays
+ARRAYS_SUFFIX = ".arrays"
+
+# Verrou de models/.objects : l'écriture d'un contenu et la création de son alias
+# forment une seule étape vis-à-vis du ramasse-miettes (threads et processus)
+LOCK_FILENAME = ".lock"
+
+# Un contenu plus récent que ce délai n'est jamais supprimé par collect_garbage
+GC_GRACE_SECONDS = 60.0
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def objects_dir(models_dir: str) -> str:
+    return os.path.join(models_dir, OBJECTS_DIRNAME)
+
+
+@contextlib.contextmanager
+def objects_lock(models_dir: str):
+    """Verrou exclusif sur models/.objects (flock : aussi entre processus)"""
+    os.makedirs(objects_dir(models_dir), exist_ok=True)
+    with open(os.path.join(objects_dir(models_dir), LOCK_FILENAME), 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _link_alias(object_path: str, alias_path: str):
+    """Fait pointer alias_path vers object_path (lien physique, copie si impossible), atomiquement"""
+    tmp_path = f"{alias_path}.{os.getpid()}.link"
+    try:
+        os.link(object_path, tmp_path)
+    except OSError:
+        # Système de fichiers sans liens physiques : on retombe sur une copie
+        shutil.copyfile(object_path, tmp_path)
+    os.replace(tmp_path, alias_path)
+
+
+def _store_object(models_dir: str, data: bytes, digest: str) -> str:
+    object_path = os.path.join(objects_dir(models_dir), f"{digest}.pkl")
+    if not os.path.exists(object_path):
+        os.makedirs(objects_dir(models_dir), exist_ok=True)
+        tmp_path = f"{object_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, object_path)
+    return object_path
+
+
+def save_model_bytes(models_dir: str, name: str, data: bytes,
+                     metadata: Optional[Dict[str, Any]] = None) -> str:
+    """Écrit un modèle sérialisé par contenu et crée/remplace l'alias models/<name>.pkl.
+
+    Retourne le chemin de l'alias. Deux noms au contenu identique partagent le même fichier.
+    Si metadata est fourni (voir describe_model), le sidecar <name>.meta.json est écrit après l'alias.
+    """
+    os.makedirs(models_dir, exist_ok=True)
+    digest = content_hash(data)
+    alias_path = os.path.join(models_dir, f"{name}.pkl")
+    # Sous verrou : collect_garbage ne peut pas voir le contenu sans son alias
+    with objects_lock(models_dir):
+        object_path = _store_object(models_dir, data, digest)
+        _link_alias(object_path, alias_path)
+    if metadata is not None:
+        write_metadata(models_dir, name, {**metadata, "content_hash": digest, "size_bytes": len(data)})
+    return alias_path
+
+
+def save_model(models_dir: str, name: str, model, **describe_kwargs) -> str:
+    return save_model_bytes(models_dir, name, pickle.dumps(model), describe_model(model, **describe_kwargs))
+
+
+# ---------- métadonnées ----------
+
+def metadata_path(models_dir: str, name: str) -> str:
+    return os.path.join(models_dir, f"{name}{META_SUFFIX}")
+
+
+def describe_model(model, feature_names: Optional[List[str]] = None,
+                   dataset_fingerprint: Optional[str] = None) -> Dict[str, Any]:
+    """Métadonnées d'un estimateur, lisibles sans le désérialiser"""
+    if isinstance(model, dict) and 'model' in model:
+        model = model['model']
+    names = getattr(model, 'feature_names_in_', None)
+    classes = getattr(model, 'classes_', None)
+    n_features = getattr(model, 'n_features_in_', None)
+    return {
+        "estimator_type": type(model).__name__,
+        "n_features": int(n_features) if n_features is not None else None,
+        "feature_names": [str(n) for n in names] if names is not None else feature_names,
+        "classes": [c.item() if hasattr(c, 'item') else c for c in classes] if classes is not None else None,
+        "dataset_fingerprint": dataset_fingerprint,
+        "supports_predict": hasattr(model, 'predict'),
+        "supports_proba": hasattr(model, 'predict_proba'),
+        "saved_at": datetime.now().isoformat(),
+    }
+
+
+def write_metadata(models_dir: str, name: str, metadata: Dict[str, Any]):
+    """Écrit le sidecar d'un alias en y associant la clé (mtime_ns, taille) du .pkl actuel"""
+    alias_path = os.path.join(models_dir, f"{name}.pkl")
+    st = os.stat(alias_path)
+    metadata = {**metadata, "file_key": [st.st_mtime_ns, st.st_size]}
+    path = metadata_path(models_dir, name)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(metadata, f)
+    os.replace(tmp_path, path)
+
+
+def read_metadata(models_dir: str, name: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(metadata_path(models_dir, name), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def remove_metadata(models_dir: str, name: str):
+    try:
+        os.remove(metadata_path(models_dir, name))
+    except FileNotFoundError:
+        pass
+
+
+def ensure_metadata(models_dir: str) -> Dict[str, int]:
+    """Crée ou met à jour les sidecars manquants ou périmés (migration des anciens .pkl).
+
+    Un sidecar dont la clé de fichier a changé mais dont le contenu est identique
+    (ex. après dedupe_directory) est simplement mis à jour ; sinon le modèle est
+    désérialisé une fois. Un fichier illisible reçoit un sidecar "error" pour ne
+    pas être retenté tant qu'il ne change pas.
+    """
+    stats = {"valid": 0, "rekeyed": 0, "described": 0, "errors": 0}
+    if not os.path.isdir(models_dir):
+        return stats
+    for filename in sorted(os.listdir(models_dir)):
+        alias_path = os.path.join(models_dir, filename)
+        if not filename.endswith('.pkl') or not os.path.isfile(alias_path):
+            continue
+        name = filename[:-len('.pkl')]
+        st = os.stat(alias_path)
+        metadata = read_metadata(models_dir, name)
+        if metadata is not None and metadata.get("file_key") == [st.st_mtime_ns, st.st_size]:
+            stats["valid"] += 1
+            continue
+        digest = file_hash(alias_path)
+        if metadata is not None and metadata.get("content_hash") == digest:
+            write_metadata(models_dir, name, metadata)
+            stats["rekeyed"] += 1
+            continue
+        try:
+            with open(alias_path, 'rb') as f:
+                metadata = describe_model(pickle.load(f))
+            stats["described"] += 1
+        except Exception as e:
+            print(f"❌ Métadonnées impossibles pour {filename}: {e}")
+            metadata = {"error": str(e)}
+            stats["errors"] += 1
+        write_metadata(models_dir, name, {**metadata, "content_hash": digest, "size_bytes": st.st_size})
+    return stats
+
+
+def dedupe_directory(models_dir: str) -> Dict[str, int]:
+    """Convertit les .pkl d'un dossier en alias vers des contenus uniques.
+
+    Les fichiers identiques octet pour octet n'occupent plus qu'une fois l'espace disque.
+    """
+    stats = {"files": 0, "objects": 0, "linked": 0, "bytes_saved": 0}
+    if not os.path.isdir(models_dir):
+        return stats
+    with objects_lock(models_dir):
+        return _dedupe_locked(models_dir, stats)
+
+
+def _dedupe_locked(models_dir: str, stats: Dict[str, int]) -> Dict[str, int]:
+    seen = set()
+    for filename in sorted(os.listdir(models_dir)):
+        alias_path = os.path.join(models_dir, filename)
+        if not filename.endswith('.pkl') or not os.path.isfile(alias_path):
+            continue
+        stats["files"] += 1
+        digest = file_hash(alias_path)
+        object_path = os.path.join(objects_dir(models_dir), f"{digest}.pkl")
+        if digest not in seen:
+            seen.add(digest)
+            stats["objects"] += 1
+        if os.path.exists(object_path):
+            if os.path.samefile(object_path, alias_path):
+                continue
+            stats["bytes_saved"] += os.path.getsize(alias_path)
+        else:
+            os.makedirs(objects_dir(models_dir), exist_ok=True)
+            try:
+                os.link(alias_path, object_path)
+                continue
+            except OSError:
+                shutil.copyfile(alias_path, object_path)
+        _link_alias(object_path, alias_path)
+        stats["linked"] += 1
+    return stats
+
+
+def collect_garbage(models_dir: str, grace_seconds: float = GC_GRACE_SECONDS) -> int:
+    """Supprime les contenus qui ne sont plus référencés par aucun alias, et leurs exports.
+
+    Exécuté sous le verrou de models/.objects ; les contenus écrits depuis moins
+    de grace_seconds sont conservés (écritures sans verrou possible, ex. Windows).
+    """
+    directory = objects_dir(models_dir)
+    if not os.path.isdir(directory):
+        return 0
+    with objects_lock(models_dir):
+        return _collect_locked(models_dir, directory, grace_seconds)
+
+
+def _collect_locked(models_dir: str, directory: str, grace_seconds: float) -> int:
+    copied_hashes = None
+    removed = 0
+    now = time.time()
+    for filename in os.listdir(directory):
+        object_path = os.path.join(directory, filename)
+        if not filename.endswith('.pkl'):
+            continue
+        st = os.stat(object_path)
+        if st.st_nlink > 1 or now - st.st_mtime < grace_seconds:
+            continue
+        if copied_hashes is None:
+            # Alias copiés (sans lien physique) : on compare les contenus
+            copied_hashes = {
+                file_hash(os.path.join(models_dir, alias))
+                for alias in os.listdir(models_dir)
+                if alias.endswith('.pkl') and os.path.isfile(os.path.join(models_dir, alias))
+                and os.stat(os.path.join(models_dir, alias)).st_nlink == 1
+            }
+        if filename[:-len('.pkl')] not in copied_hashes:
+            os.remove(object_path)
+            removed += 1
+    for filename in os.listdir(directory):
+        digest = filename[:-len(ARRAYS_SUFFIX)]
+        if filename.endswith(ARRAYS_SUFFIX) and not os.path.exists(os.path.join(directory, f"{digest}.pkl")):
+            os.remove(os.path.join(directory, filename))
+    return removed
+
+
+if __name__ == "__main__":
+    # python model_store.py [dossier_models]
+    directory = sys.argv[1] if len(sys.argv) > 1 else "models"
+    print(dedupe_directory(directory))
+    print(ensure_metadata(directory))
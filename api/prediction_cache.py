@@ -0,0 +1,80 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from inference import Prediction
+
+
+def row_keys(X: np.ndarray) -> List[bytes]:
+    """Empreinte de chaque ligne d'une matrice N×20 (valeurs float64)"""
+    # + 0.0 normalise -0.0 en 0.0 : deux vecteurs égaux ont la même empreinte
+    rows = np.ascontiguousarray(X, dtype=np.float64) + 0.0
+    return [hashlib.blake2b(row.tobytes(), digest_size=16).digest() for row in rows]
+
+
+class PredictionCache:
+    """Cache LRU + TTL des prédictions, ligne par ligne.
+
+    La clé est (version du modèle, empreinte du vecteur de features). La version
+    est le hash de contenu de l'artefact : un modèle remplacé ou ré-entraîné
+    change de version, ses anciennes entrées ne sont plus jamais servies et
+    sortent du cache par LRU ou expiration.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, bytes], Tuple[float, Prediction]]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get_rows(self, version: str, keys: List[bytes]) -> List[Optional[Prediction]]:
+        """Prédiction en cache de chaque ligne (None si absente ou expirée)"""
+        now = time.monotonic()
+        found = []
+        with self._lock:
+            for key in keys:
+                item = self._entries.get((version, key))
+                if item is not None and item[0] <= now:
+                    del self._entries[(version, key)]
+                    self._stats["expirations"] += 1
+                    item = None
+                if item is None:
+                    self._stats["misses"] += 1
+                    found.append(None)
+                else:
+                    self._entries.move_to_end((version, key))
+                    self._stats["hits"] += 1
+                    found.append(item[1])
+        return found
+
+    def put_rows(self, version: str, keys: List[bytes], prediction: Prediction):
+        """Range chaque ligne de prediction sous la clé correspondante"""
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for i, key in enumerate(keys):
+                self._entries[(version, key)] = (expires_at, prediction.row(i))
+                self._entries.move_to_end((version, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self) -> int:
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+        }
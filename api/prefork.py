@@ -0,0 +1,209 @@
+import gc
+import os
+import signal
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import uvicorn
+
+# PID du superviseur, transmis aux workers pour le rapport mémoire
+SUPERVISOR_ENV = "PREFORK_SUPERVISOR_PID"
+
+# Pools de threads natifs qui ne survivent pas à un fork (OpenMP de xgboost et
+# sklearn) : limités à un thread dans le parent, donc aussi dans les workers,
+# où le parallélisme vient des processus
+SINGLE_THREAD_ENV = ("OMP_NUM_THREADS",)
+
+# Champs de /proc/<pid>/smaps_rollup (en kB)
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def serve(app, host: str = "0.0.0.0", port: int = 8000, workers: int = 2,
+          prepare: Optional[Callable[[], Any]] = None):
+    """Sert app avec plusieurs workers uvicorn qui partagent les modèles du parent.
+
+    uvicorn --workers démarre chaque worker par spawn : chacun recharge tous les
+    modèles. Ici le parent exécute prepare() (préchargement du registre), gèle
+    les objets avec gc.freeze() puis forke les workers : les tableaux des modèles
+    restent des pages partagées en copy-on-write tant qu'aucun worker ne les
+    modifie. Un worker qui meurt est relancé.
+
+    Un fork ne copie que le thread appelant : prepare() doit tout faire dans ce
+    thread et ne laisser aucun thread derrière lui (pool Python ou OpenMP),
+    sinon un verrou tenu par un thread disparu bloquerait le worker. C'est
+    vérifié avant de forker.
+    """
+    config = uvicorn.Config(app, host=host, port=port)
+    sock = config.bind_socket()
+
+    # Avant tout chargement d'OpenMP : aucune région parallèle n'y crée de pool
+    for var in SINGLE_THREAD_ENV:
+        os.environ.setdefault(var, "1")
+    before = native_threads()
+    try:
+        if prepare is not None:
+            prepare()
+        check_fork_safe(before)
+    except BaseException:
+        sock.close()
+        raise
+    # Objets du parent hors du ramasse-miettes : les collectes des workers ne
+    # réécrivent pas leurs en-têtes (ce qui dupliquerait les pages)
+    gc.collect()
+    gc.freeze()
+    os.environ[SUPERVISOR_ENV] = str(os.getpid())
+
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def spawn(slot: int):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                uvicorn.Server(config).run(sockets=[sock])
+            finally:
+                os._exit(0)
+        children[pid] = slot
+        print(f"👷 Worker {slot} démarré (pid {pid})")
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for slot in range(workers):
+        spawn(slot)
+    print(f"🚀 {workers} workers sur http://{host}:{port} (superviseur pid {os.getpid()})")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        slot = children.pop(pid, None)
+        if slot is not None and not stopping:
+            print(f"⚠️ Worker {slot} (pid {pid}) arrêté (statut {status}), relance")
+            time.sleep(0.5)
+            spawn(slot)
+    sock.close()
+
+
+def native_threads() -> set:
+    """Identifiants des threads du processus, y compris ceux créés hors de Python"""
+    try:
+        return set(os.listdir("/proc/self/task"))
+    except OSError:
+        return {thread.ident for thread in threading.enumerate()}
+
+
+def check_fork_safe(before: set):
+    """Lève RuntimeError si des threads créés depuis before tournent encore :
+    ils n'existeraient pas dans les workers forkés"""
+    python_threads = [t.name for t in threading.enumerate() if t is not threading.main_thread()]
+    leftover = native_threads() - before
+    if python_threads or leftover:
+        raise RuntimeError(f"Fork impossible : threads actifs après la préparation "
+                           f"({len(leftover)} natifs, Python: {python_threads})")
+
+
+# ---------- rapport mémoire ----------
+
+def process_memory(pid: int) -> Optional[Dict[str, int]]:
+    """RSS d'un processus (octets) : partagée avec d'autres processus vs propre à celui-ci"""
+    values = dict.fromkeys(SMAPS_FIELDS, 0)
+    try:
+        path = f"/proc/{pid}/smaps_rollup"
+        if not os.path.exists(path):
+            path = f"/proc/{pid}/smaps"
+        with open(path, 'r') as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in values:
+                    values[key] += int(rest.split()[0]) * 1024
+    except (OSError, ValueError):
+        return None
+    return {
+        "rss": values["Rss"],
+        "pss": values["Pss"],
+        "shared": values["Shared_Clean"] + values["Shared_Dirty"],
+        "unique": values["Private_Clean"] + values["Private_Dirty"],
+    }
+
+
+def child_pids(parent: int) -> List[int]:
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", 'r') as f:
+                # Le nom du processus (2e champ) peut contenir des espaces : on part de la fin
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == parent:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def memory_report(supervisor: Optional[int] = None) -> Dict[str, Any]:
+    """Mémoire du superviseur et de chacun de ses workers (processus courant seul sinon).
+
+    La somme des PSS est la mémoire réellement consommée : chaque page partagée
+    y est répartie entre les processus qui la projettent.
+    """
+    if not os.path.isdir("/proc"):
+        return {"supported": False}
+    if supervisor is None and os.environ.get(SUPERVISOR_ENV):
+        supervisor = int(os.environ[SUPERVISOR_ENV])
+    if supervisor is None:
+        processes = {os.getpid(): "worker"}
+    else:
+        processes = {supervisor: "supervisor", **{pid: "worker" for pid in child_pids(supervisor)}}
+
+    report = []
+    for pid, role in processes.items():
+        memory = process_memory(pid)
+        if memory is not None:
+            report.append({"pid": pid, "role": role, "current": pid == os.getpid(), **memory})
+    workers = [p for p in report if p["role"] == "worker"]
+    return {
+        "supported": True,
+        "supervisor_pid": supervisor,
+        "processes": report,
+        "workers": len(workers),
+        "total_rss": sum(p["rss"] for p in report),
+        "total_pss": sum(p["pss"] for p in report),
+        "worker_unique_mean": sum(p["unique"] for p in workers) / len(workers) if workers else 0,
+        "worker_shared_mean": sum(p["shared"] for p in workers) / len(workers) if workers else 0,
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    if not report["supported"]:
+        print("⚠️ Rapport mémoire indisponible (pas de /proc)")
+        return
+    for p in report["processes"]:
+        print(f"🧠 {p['role']:10s} pid {p['pid']:>7}  RSS {p['rss'] / 1e6:8.1f} Mo  "
+              f"partagée {p['shared'] / 1e6:8.1f} Mo  propre {p['unique'] / 1e6:8.1f} Mo  "
+              f"PSS {p['pss'] / 1e6:8.1f} Mo")
+    print(f"📊 Total RSS {report['total_rss'] / 1e6:.1f} Mo, PSS {report['total_pss'] / 1e6:.1f} Mo "
+          f"pour {report['workers']} workers")
+
+
+if __name__ == "__main__":
+    # python prefork.py <pid du superviseur>
+    print_report(memory_report(int(sys.argv[1]) if len(sys.argv) > 1 else None))
@@ -0,0 +1,470 @@
+import itertools
+import os
+import pickle
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from model_store import META_SUFFIX, content_hash, describe_model, read_metadata, write_metadata
+from model_format import export_path, import_model
+from telemetry import DURATION_BUCKETS, metrics
+
+MODEL_LOAD_SECONDS = metrics.histogram("model_load_duration_seconds",
+                                       "Durée de chargement d'un modèle (pickle, arrays ou partagé)",
+                                       ("format",), buckets=DURATION_BUCKETS)
+MODEL_LOAD_BYTES = metrics.counter("model_load_bytes_total", "Octets d'artefacts chargés", ("format",))
+
+# Sources possibles d'un modèle dans le registre
+SOURCE_BASE = "base"      # modèles créés en mémoire au démarrage (mock)
+SOURCE_CUSTOM = "custom"  # modèles créés via /api/create-model
+SOURCE_PKL = "pkl"        # modèles .pkl découverts dans models/
+
+# Horloge logique de l'ordre LRU : next() est atomique, aucun verrou à la lecture
+_usage_clock = itertools.count(1)
+
+# Objets jamais parcourus par estimate_model_bytes
+_OPAQUE_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+                 types.MethodType, bool, int, float, complex)
+
+
+def is_model_name(name: str) -> bool:
+    """Nom utilisable comme fichier de models/ : ni séparateur de chemin ni '..'"""
+    return (bool(name) and "/" not in name and "\\" not in name and "\0" not in name
+            and ".." not in name and os.path.basename(name) == name)
+
+
+@dataclass
+class RegistryEntry:
+    name: str
+    model: Any
+    source: str
+    path: Optional[str] = None
+    # Clé de fraîcheur du fichier : (mtime_ns, size). None pour un modèle en mémoire.
+    file_key: Optional[Tuple[int, int]] = None
+    # SHA-256 du contenu : deux noms au même contenu partagent le même estimateur
+    content_hash: Optional[str] = None
+    # Empreinte mémoire mesurée au chargement (octets)
+    footprint: int = 0
+    last_used: int = 0
+    # Sidecar <nom>.meta.json (type, features, classes, empreinte du dataset...)
+    metadata: Optional[Dict[str, Any]] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.model is not None
+
+    @property
+    def evictable(self) -> bool:
+        # Un modèle sans fichier ne pourrait pas être rechargé
+        return self.path is not None
+
+    @property
+    def usable(self) -> bool:
+        """Faux si les métadonnées indiquent un fichier illisible ou un objet sans predict"""
+        if self.metadata is None:
+            return True
+        return "error" not in self.metadata and self.metadata.get("supports_predict", True)
+
+
+def unwrap_model(model_data):
+    """Retourne l'estimateur réel (certains .pkl contiennent un dict {'model': ...})"""
+    if isinstance(model_data, dict) and 'model' in model_data:
+        return model_data['model']
+    return model_data
+
+
+def estimate_model_bytes(model) -> int:
+    """Empreinte mémoire d'un estimateur : nbytes de ses tableaux NumPy, arbres
+    Cython (via __getstate__) et booster XGBoost (modèle brut sérialisé)."""
+    total = 0
+    # id -> objet : garder une référence empêche la réutilisation des id des états temporaires
+    seen = {}
+    stack = [model]
+    while stack:
+        obj = stack.pop()
+        if obj is None or isinstance(obj, _OPAQUE_TYPES) or id(obj) in seen:
+            continue
+        seen[id(obj)] = obj
+        if isinstance(obj, np.ndarray):
+            total += obj.nbytes
+            if obj.dtype == object:
+                stack.extend(obj.ravel().tolist())
+        elif isinstance(obj, (str, bytes, bytearray, memoryview)):
+            total += len(obj)
+        elif isinstance(obj, dict):
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        else:
+            try:
+                state = obj.__getstate__()
+            except Exception:
+                state = getattr(obj, '__dict__', None)
+            if state is not None and state is not obj:
+                stack.append(state)
+    return total
+
+
+class ModelRegistry:
+    """Registre de modèles partagé par tout le processus.
+
+    Les fichiers .pkl de models/ sont indexés par (chemin, mtime, taille) sans
+    être désérialisés ; un modèle est chargé à sa première demande. Les
+    modèles issus d'un fichier restent en mémoire tant que le budget
+    (memory_budget octets, 0 = illimité) le permet, puis les moins récemment
+    utilisés sont évincés. Les modèles en mémoire (base, custom non
+    sauvegardés) passent par la même table et ne sont jamais évincés.
+    Un contenu exporté au format arrays (model_format) est reconstruit par
+    memmap, sans lire ni désérialiser le pickle.
+
+    transform, s'il est fourni, remplace chaque estimateur chargé depuis un
+    fichier (ex. forêt compilée par tree_engine) ; les métadonnées décrivent
+    toujours l'estimateur d'origine.
+
+    Les lectures sont sans verrou : chaque modification publie un nouveau dict.
+    """
+
+    def __init__(self, models_dir: str = "models", memory_budget: int = 0,
+                 transform: Optional[Callable[[Any], Any]] = None):
+        self.models_dir = models_dir
+        self.memory_budget = memory_budget
+        # Appliqué à chaque estimateur désérialisé (ex. tree_engine.compile_model)
+        self.transform = transform
+        self._lock = threading.Lock()
+        self._entries: Dict[str, RegistryEntry] = {}
+        # Fichiers illisibles : on ne retente que si (mtime, taille) change
+        self._failed: Dict[str, Tuple[int, int]] = {}
+        # Un verrou par nom : deux requêtes simultanées ne chargent pas deux fois le même fichier
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "loads": 0,
+                          "shared_loads": 0, "mapped_loads": 0, "load_errors": 0}
+
+    @staticmethod
+    def _file_key(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def _read_file(path: str) -> Tuple[bytes, str]:
+        with open(path, 'rb') as f:
+            data = f.read()
+        return data, content_hash(data)
+
+    def _publish(self, updates: Dict[str, Optional[RegistryEntry]]):
+        """Remplace atomiquement la table (None = suppression du nom)"""
+        with self._lock:
+            entries = dict(self._entries)
+            for name, entry in updates.items():
+                if entry is None:
+                    entries.pop(name, None)
+                else:
+                    entries[name] = entry
+            self._entries = entries
+
+    def _read_metadata(self, name: str, key: Tuple[int, int]) -> Optional[Dict[str, Any]]:
+        """Sidecar du fichier, seulement s'il décrit bien sa version actuelle"""
+        metadata = read_metadata(self.models_dir, name)
+        if metadata is not None and metadata.get("file_key") == list(key):
+            return metadata
+        return None
+
+    def refresh(self, names: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """Synchronise l'index avec models/ sans rien désérialiser : seuls les
+        sidecars .meta.json sont lus ; les fichiers nouveaux ou modifiés seront
+        (re)chargés à leur prochaine demande.
+
+        Avec names, seuls ces modèles sont examinés (un stat chacun) : c'est ce
+        qu'utilise la surveillance de models/ pour appliquer ses événements.
+        """
+        stats = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+
+        on_disk = {}
+        with_metadata = set()
+        scope = set(names) if names is not None else None
+        if scope is not None:
+            for name in scope:
+                if not is_model_name(name):
+                    continue
+                path = os.path.join(self.models_dir, f"{name}.pkl")
+                key = self._file_key(path)
+                if key is not None:
+                    on_disk[name] = (path, key)
+                if os.path.exists(os.path.join(self.models_dir, f"{name}{META_SUFFIX}")):
+                    with_metadata.add(name)
+        elif os.path.isdir(self.models_dir):
+            with os.scandir(self.models_dir) as it:
+                for dir_entry in it:
+                    if not dir_entry.is_file():
+                        continue
+                    if dir_entry.name.endswith('.pkl'):
+                        st = dir_entry.stat()
+                        name = dir_entry.name[:-len('.pkl')]
+                        on_disk[name] = (dir_entry.path, (st.st_mtime_ns, st.st_size))
+                    elif dir_entry.name.endswith(META_SUFFIX):
+                        with_metadata.add(dir_entry.name[:-len(META_SUFFIX)])
+        else:
+            print(f"📁 Aucun dossier '{self.models_dir}' trouvé")
+
+        current = self._entries
+        updates = {}
+        for name, (path, key) in on_disk.items():
+            entry = current.get(name)
+            metadata = self._read_metadata(name, key) if name in with_metadata else None
+            if entry is not None and entry.path == path and entry.file_key == key:
+                stats["unchanged"] += 1
+                if entry.metadata is None and metadata is not None:
+                    # Sidecar écrit après coup (migration, chargement à la demande)
+                    updates[name] = replace(entry, metadata=metadata)
+                continue
+            source = entry.source if entry is not None and entry.path == path else SOURCE_PKL
+            updates[name] = RegistryEntry(name, None, source, path, key, metadata=metadata)
+            stats["changed" if entry is not None else "added"] += 1
+        for name, entry in current.items():
+            if entry.path is not None and name not in on_disk and (scope is None or name in scope):
+                updates[name] = None
+                stats["removed"] += 1
+
+        if updates:
+            self._publish(updates)
+        return stats
+
+    def _find_loaded(self, digest: str) -> Optional[RegistryEntry]:
+        for entry in self._entries.values():
+            if entry.loaded and entry.content_hash == digest:
+                return entry
+        return None
+
+    def _load_entry(self, name: str) -> Optional[RegistryEntry]:
+        """Désérialise le fichier d'une entrée, ou partage l'estimateur d'un contenu identique"""
+        with self._lock:
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        with load_lock:
+            entry = self._entries.get(name)
+            if entry is None or entry.loaded:
+                return entry
+            if self._failed.get(entry.path) == entry.file_key:
+                return None
+            started = time.perf_counter()
+            try:
+                # Sidecar valide et export arrays présent : ni lecture du .pkl ni pickle
+                digest = (entry.metadata or {}).get("content_hash")
+                exported = digest is not None and os.path.exists(export_path(self.models_dir, digest))
+                if exported:
+                    size = entry.metadata.get("size_bytes") or entry.file_key[1]
+                else:
+                    data, digest = self._read_file(entry.path)
+                    size = len(data)
+                shared = self._find_loaded(digest)
+                if shared is not None:
+                    model, footprint = shared.model, shared.footprint
+                    description = shared.metadata or describe_model(model)
+                    self._counters["shared_loads"] += 1
+                    load_format = "shared"
+                else:
+                    model = self._import_export(digest) if exported else None
+                    load_format = "arrays"
+                    if model is None:
+                        load_format = "pickle"
+                        if exported:
+                            data, _ = self._read_file(entry.path)
+                        model = pickle.loads(data)
+                        self._counters["loads"] += 1
+                    # Décrit l'estimateur d'origine, avant une éventuelle compilation
+                    description = describe_model(model)
+                    if self.transform is not None:
+                        model = self.transform(unwrap_model(model))
+                    footprint = estimate_model_bytes(model) or size
+            except Exception as e:
+                print(f"❌ Erreur chargement {os.path.basename(entry.path)}: {e}")
+                self._failed[entry.path] = entry.file_key
+                self._counters["load_errors"] += 1
+                return None
+            self._failed.pop(entry.path, None)
+            MODEL_LOAD_SECONDS.observe(time.perf_counter() - started, load_format)
+            if load_format != "shared":
+                MODEL_LOAD_BYTES.inc(load_format, amount=size)
+            metadata = entry.metadata
+            if metadata is None:
+                metadata = self._write_missing_metadata(name, description, digest, size)
+            pending = entry
+            entry = replace(entry, model=model, content_hash=digest, footprint=footprint,
+                            last_used=next(_usage_clock), metadata=metadata)
+            with self._lock:
+                # Ne publie pas si le nom a été supprimé ou remplacé pendant le chargement
+                if self._entries.get(name) is not pending:
+                    return self._entries.get(name)
+                entries = dict(self._entries)
+                entries[name] = entry
+                self._entries = entries
+            print(f"✅ Modèle PKL chargé: {name} ({footprint / 1e6:.1f} Mo)")
+        self._evict_if_needed(keep=digest)
+        return entry
+
+    def _import_export(self, digest: str):
+        """Estimateur reconstruit depuis models/.objects/<digest>.arrays (None si illisible)"""
+        try:
+            model = import_model(export_path(self.models_dir, digest))
+        except Exception as e:
+            print(f"⚠️ Export arrays illisible ({digest[:12]}), retour au pickle: {e}")
+            return None
+        self._counters["mapped_loads"] += 1
+        return model
+
+    def _write_missing_metadata(self, name: str, description: Dict[str, Any], digest: str,
+                                size: int) -> Optional[Dict[str, Any]]:
+        """Fichier déposé sans sidecar : on l'écrit au premier chargement"""
+        try:
+            description = {k: v for k, v in description.items() if k not in ("file_key", "content_hash", "size_bytes")}
+            metadata = {**description, "content_hash": digest, "size_bytes": size}
+            write_metadata(self.models_dir, name, metadata)
+            return read_metadata(self.models_dir, name)
+        except Exception as e:
+            print(f"⚠️ Sidecar non écrit pour {name}: {e}")
+            return None
+
+    def _evict_if_needed(self, keep: Any = None):
+        """Évince les contenus les moins récemment utilisés tant que le budget est dépassé"""
+        if not self.memory_budget:
+            return
+        with self._lock:
+            entries = dict(self._entries)
+            # Un contenu partagé par plusieurs noms n'est compté (et évincé) qu'une fois
+            by_content: Dict[Any, List[RegistryEntry]] = {}
+            for entry in entries.values():
+                if entry.loaded:
+                    by_content.setdefault(entry.content_hash or id(entry.model), []).append(entry)
+            used = sum(group[0].footprint for group in by_content.values())
+            if used <= self.memory_budget:
+                return
+            candidates = sorted(
+                (max(e.last_used for e in group), content)
+                for content, group in by_content.items()
+                if content != keep and all(e.evictable for e in group)
+            )
+            for _, content in candidates:
+                if used <= self.memory_budget:
+                    break
+                group = by_content[content]
+                for entry in group:
+                    entries[entry.name] = replace(entry, model=None, footprint=0)
+                    print(f"♻️ Modèle évincé de la mémoire: {entry.name}")
+                used -= group[0].footprint
+                self._counters["evictions"] += 1
+            self._entries = entries
+
+    def register(self, name: str, model, source: str, path: Optional[str] = None,
+                 digest: Optional[str] = None):
+        """Ajoute ou remplace un modèle déjà en mémoire (sans relire le disque)"""
+        key = self._file_key(path) if path else None
+        entry = RegistryEntry(name, model, source, path, key, digest,
+                              footprint=estimate_model_bytes(model), last_used=next(_usage_clock),
+                              metadata=describe_model(model))
+        self._publish({name: entry})
+        self._evict_if_needed(keep=digest or id(model))
+
+    def load(self, name: str, path: str, source: str):
+        """Publie le fichier d'un modèle sous ce nom et le charge aussitôt
+        (en partageant l'estimateur si son contenu est déjà en mémoire)."""
+        key = self._file_key(path)
+        metadata = self._read_metadata(name, key) if key is not None else None
+        self._publish({name: RegistryEntry(name, None, source, path, key, metadata=metadata)})
+        return self.get(name)
+
+    def remove(self, name: str) -> bool:
+        if name not in self._entries:
+            return False
+        self._publish({name: None})
+        return True
+
+    def get(self, name: str):
+        """Retourne l'estimateur prêt à prédire (chargé à la demande), ou None"""
+        entry = self._entries.get(name)
+        if entry is None:
+            return None
+        if entry.loaded:
+            self._counters["hits"] += 1
+        else:
+            self._counters["misses"] += 1
+            entry = self._load_entry(name)
+            if entry is None or not entry.loaded:
+                return None
+        entry.last_used = next(_usage_clock)
+        return unwrap_model(entry.model)
+
+    def preload(self, names: Optional[List[str]] = None, max_workers: int = 4) -> Dict[str, Dict[str, Any]]:
+        """Charge des modèles en parallèle sur un pool de threads (tous par défaut).
+
+        Retourne, par modèle, s'il est chargé et son temps de chargement. Le
+        préchargement s'arrête une fois le budget mémoire atteint plutôt que
+        d'évincer les modèles qu'il vient de charger. Avec max_workers <= 1, les
+        modèles sont chargés dans le thread appelant (aucun thread créé).
+        """
+        names = self.names() if names is None else names
+
+        def load_one(name):
+            if self.memory_budget and self.stats()["memory_bytes"] >= self.memory_budget:
+                return name, {"loaded": False, "skipped": "budget", "seconds": 0.0}
+            start = time.perf_counter()
+            model = self.get(name)
+            return name, {"loaded": model is not None, "seconds": round(time.perf_counter() - start, 4)}
+
+        if max_workers <= 1:
+            return dict(map(load_one, names))
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return dict(pool.map(load_one, names))
+
+    def get_entry(self, name: str) -> Optional[RegistryEntry]:
+        return self._entries.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    def _listed(self, entry: RegistryEntry) -> bool:
+        return entry.usable and not (entry.path is not None and self._failed.get(entry.path) == entry.file_key)
+
+    def names(self, source: Optional[str] = None) -> List[str]:
+        """Noms utilisables, chargés ou non (hors fichiers reconnus illisibles)"""
+        return [name for name, entry in self._entries.items()
+                if (source is None or entry.source == source) and self._listed(entry)]
+
+    def metadata(self, name: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(name)
+        return entry.metadata if entry is not None else None
+
+    def describe(self, source: Optional[str] = None) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Métadonnées de tous les modèles utilisables, sans en charger aucun"""
+        return {name: entry.metadata for name, entry in self._entries.items()
+                if (source is None or entry.source == source) and self._listed(entry)}
+
+    def count(self, source: Optional[str] = None) -> int:
+        return len(self.names(source))
+
+    def distinct_count(self) -> int:
+        """Nombre d'estimateurs distincts en mémoire (les alias d'un même contenu comptent une fois)"""
+        return len({id(entry.model) for entry in self._entries.values() if entry.loaded})
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs du cache (hits, misses, évictions...) et occupation mémoire"""
+        footprints = {}
+        known = loaded = 0
+        for entry in self._entries.values():
+            known += 1
+            if entry.loaded:
+                loaded += 1
+                footprints[id(entry.model)] = entry.footprint
+        return {
+            **self._counters,
+            "models_known": known,
+            "models_loaded": loaded,
+            "distinct_loaded": len(footprints),
+            "memory_bytes": sum(footprints.values()),
+            "memory_budget": self.memory_budget,
+        }
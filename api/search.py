@@ -0,0 +1,436 @@
+import csv
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from training import SUPPORTED_MODEL_TYPES, TUNABLE_HYPERPARAMS
+
+# Recherche d'hyperparamètres par successive halving : tous les candidats sont
+# évalués sur peu de lignes d'entraînement, seul le meilleur 1/eta passe au palier
+# suivant avec eta fois plus de lignes, jusqu'au jeu d'entraînement complet. Le
+# score est le f1_weighted sur une validation tirée du split d'entraînement ; le
+# split de test ne sert qu'au classement final (mêmes colonnes que
+# data/models_comparison.csv et metrics/all_models_metrics.json).
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+FINISHED_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED, STATUS_CANCELLED)
+
+MAX_CANDIDATES = 500
+# Candidats tirés quand l'espace contient des distributions et qu'aucun nombre n'est demandé
+DEFAULT_RANDOM_CANDIDATES = 27
+VALIDATION_SIZE = 0.2
+RANDOM_STATE = 42
+MAX_FINISHED_SEARCHES = 50
+
+# Colonnes de data/models_comparison.csv
+COMPARISON_COLUMNS = ["model_name", "accuracy", "precision", "recall", "f1_macro", "f1_weighted",
+                      "confusion_matrix", "roc_auc", "auc_score", "hyperparameters", "rank"]
+
+
+class SearchCancelled(Exception):
+    pass
+
+
+# ---------- espace de recherche ----------
+
+def _is_distribution(spec) -> bool:
+    return isinstance(spec, dict)
+
+
+def validate_space(model_type: str, space: Dict[str, Any]):
+    """Lève ValueError si l'espace n'est pas utilisable pour cette famille.
+
+    Chaque hyperparamètre est soit une liste de valeurs (grille), soit une
+    distribution {"low", "high", "log": bool, "type": "int" | "float"}.
+    """
+    if model_type not in SUPPORTED_MODEL_TYPES:
+        raise ValueError("Type de modèle non supporté")
+    if not space:
+        raise ValueError("Espace de recherche vide")
+    allowed = TUNABLE_HYPERPARAMS[model_type]
+    for name, spec in space.items():
+        if name not in allowed:
+            raise ValueError(f"Hyperparamètre {name} non supporté pour {model_type} ({', '.join(allowed)})")
+        if _is_distribution(spec):
+            if "low" not in spec or "high" not in spec or spec["low"] > spec["high"]:
+                raise ValueError(f"{name}: distribution invalide (low <= high requis)")
+            if spec.get("log") and spec["low"] <= 0:
+                raise ValueError(f"{name}: distribution log avec low > 0 requis")
+        elif not isinstance(spec, list) or not spec:
+            raise ValueError(f"{name}: liste de valeurs ou distribution attendue")
+
+
+def _draw(spec: Dict[str, Any], rng: np.random.Generator):
+    low, high = spec["low"], spec["high"]
+    value = math.exp(rng.uniform(math.log(low), math.log(high))) if spec.get("log") else rng.uniform(low, high)
+    if spec.get("type") == "int" or (spec.get("type") is None and isinstance(low, int) and isinstance(high, int)):
+        return int(round(value))
+    return float(value)
+
+
+def _grid_point(space: Dict[str, Any], names: List[str], index: int) -> Dict[str, Any]:
+    """index-ième configuration de la grille, dans l'ordre de itertools.product"""
+    params = {}
+    for n in reversed(names):
+        index, i = divmod(index, len(space[n]))
+        params[n] = space[n][i]
+    return {n: params[n] for n in names}
+
+
+def sample_candidates(space: Dict[str, Any], n_candidates: Optional[int] = None,
+                      seed: int = RANDOM_STATE) -> List[Dict[str, Any]]:
+    """Configurations à évaluer : la grille complète si elle tient dans n_candidates
+    (et MAX_CANDIDATES), sinon un tirage aléatoire sans doublon"""
+    rng = np.random.default_rng(seed)
+    names = sorted(space)
+    if not any(_is_distribution(space[n]) for n in names):
+        # La grille n'est jamais construite : seuls les points tirés sont décodés
+        size = math.prod(len(space[n]) for n in names)
+        target = min(size if n_candidates is None else n_candidates, size, MAX_CANDIDATES)
+        if target == size:
+            return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+        if size <= MAX_CANDIDATES * 20:
+            indices = rng.choice(size, size=target, replace=False)
+        else:
+            # Grande grille : un indice tiré par dimension (tirage uniforme), les doublons
+            # sont rares puisque target <= size / 20
+            chosen = set()
+            while len(chosen) < target:
+                index = 0
+                for n in names:
+                    index = index * len(space[n]) + int(rng.integers(len(space[n])))
+                chosen.add(index)
+            indices = list(chosen)
+        return [_grid_point(space, names, int(i)) for i in sorted(indices)]
+
+    n_candidates = min(n_candidates or DEFAULT_RANDOM_CANDIDATES, MAX_CANDIDATES)
+    candidates, seen = [], set()
+    for _ in range(n_candidates * 20):
+        if len(candidates) == n_candidates:
+            break
+        params = {n: _draw(space[n], rng) if _is_distribution(space[n]) else space[n][rng.integers(len(space[n]))]
+                  for n in names}
+        key = json.dumps(params, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            candidates.append(params)
+    return candidates
+
+
+def halving_schedule(n_candidates: int, max_samples: int, min_samples: int, eta: int) -> List[Tuple[int, int]]:
+    """Paliers (nombre de candidats, lignes d'entraînement) ; le dernier utilise toutes les lignes"""
+    rounds = 0
+    while eta ** (rounds + 1) <= n_candidates and max_samples / eta ** (rounds + 1) >= min_samples:
+        rounds += 1
+    return [(math.ceil(n_candidates / eta ** i), int(max_samples / eta ** (rounds - i)))
+            for i in range(rounds + 1)]
+
+
+# ---------- exécuté dans les processus du pool ----------
+
+def _inner_split(data_path: str):
+    """Split d'entraînement redécoupé en ajustement / validation (stratifié, graine fixe)"""
+    from sklearn.model_selection import train_test_split
+    from training import load_dataset, split_dataset
+
+    X_train, X_test, y_train, y_test = split_dataset(load_dataset(data_path))
+    fit_idx, val_idx = train_test_split(np.arange(len(y_train)), test_size=VALIDATION_SIZE,
+                                        random_state=RANDOM_STATE, stratify=y_train)
+    return X_train, y_train, fit_idx, val_idx
+
+
+def _single_threaded(model):
+    # Un processus du pool = un cœur : pas de threads OpenMP concurrents entre candidats
+    if "n_jobs" in model.get_params():
+        model.set_params(n_jobs=1)
+    return model
+
+
+def evaluate_candidate(model_type: str, params: Dict[str, Any], data_path: str, n_samples: int) -> Dict[str, Any]:
+    """Entraîne un candidat sur n_samples lignes d'ajustement ; retourne son f1_weighted de validation"""
+    from sklearn.metrics import f1_score
+    from sklearn.model_selection import train_test_split
+    from training import create_custom_model
+
+    X_train, y_train, fit_idx, val_idx = _inner_split(data_path)
+    if n_samples < len(fit_idx):
+        fit_idx, _ = train_test_split(fit_idx, train_size=n_samples, random_state=RANDOM_STATE,
+                                      stratify=y_train[fit_idx])
+    model = create_custom_model(model_type, params)
+    if model is None:
+        return {"score": 0.0, "cpu_seconds": 0.0, "error": "Hyperparamètres invalides"}
+    _single_threaded(model)
+    if model_type == "SVM":
+        # La calibration des probabilités (5 ajustements internes) est inutile pour le score
+        model.set_params(probability=False)
+
+    start = time.process_time()
+    try:
+        model.fit(X_train[fit_idx], y_train[fit_idx])
+        score = f1_score(y_train[val_idx], model.predict(X_train[val_idx]), average="weighted")
+    except Exception as e:
+        # Un candidat invalide (ex. valeur hors domaine) est éliminé au premier palier
+        return {"score": 0.0, "cpu_seconds": time.process_time() - start, "error": str(e)}
+    return {"score": float(score), "cpu_seconds": time.process_time() - start}
+
+
+def train_finalist(model_type: str, params: Dict[str, Any], data_path: str,
+                   models_dir: str, save_as: Optional[str]) -> Dict[str, Any]:
+    """Entraîne un finaliste sur tout le split d'entraînement et l'évalue sur le test ;
+    l'enregistre dans models/<save_as>.pkl si demandé"""
+    from sklearn.metrics import roc_auc_score
+    from training import create_custom_model, evaluate_model, load_dataset, split_dataset
+
+    dataset = load_dataset(data_path)
+    X_train, X_test, y_train, y_test = split_dataset(dataset)
+    model = create_custom_model(model_type, params)
+    if model is None:
+        raise ValueError(f"Hyperparamètres invalides: {params}")
+    n_jobs = model.get_params().get("n_jobs")
+    _single_threaded(model)
+
+    start = time.process_time()
+    model.fit(X_train, y_train)
+    metrics = evaluate_model(model, X_test, y_test)
+    proba = model.predict_proba(X_test)
+    metrics["roc_auc"] = float(roc_auc_score(y_test, proba, multi_class="ovr", average="weighted"))
+    metrics["auc_score"] = float(roc_auc_score(y_test, proba, multi_class="ovr", average="macro"))
+    cpu_seconds = time.process_time() - start
+
+    model_path = None
+    if save_as:
+        from jobs import _persist_model
+
+        if "n_jobs" in model.get_params():
+            model.set_params(n_jobs=n_jobs)
+        model_path, _ = _persist_model(model, models_dir, save_as, dataset.feature_names, dataset.fingerprint)
+    return {"metrics": metrics, "cpu_seconds": cpu_seconds, "model_path": model_path}
+
+
+# ---------- orchestration ----------
+
+def write_results(output_dir: str, records: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Écrit le classement au format de metrics/all_models_metrics.json et data/models_comparison.csv"""
+    os.makedirs(output_dir, exist_ok=True)
+    json_path = os.path.join(output_dir, "all_models_metrics.json")
+    csv_path = os.path.join(output_dir, "models_comparison.csv")
+    with open(json_path, 'w') as f:
+        json.dump([{k: r[k] for k in COMPARISON_COLUMNS} for r in records], f, indent=2)
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(COMPARISON_COLUMNS)
+        for r in records:
+            # Même rendu que le CSV livré : listes et dictionnaires en repr Python
+            writer.writerow([str(r[k]) if isinstance(r[k], (list, dict)) else r[k] for k in COMPARISON_COLUMNS])
+    return {"metrics_json": json_path, "comparison_csv": csv_path}
+
+
+class SearchManager:
+    """Recherches d'hyperparamètres exécutées en arrière-plan sur un pool de processus.
+
+    Chaque recherche est pilotée par un thread du processus parent qui soumet les
+    candidats d'un palier au pool, attend le palier complet puis élague. Le
+    callback on_success(search, finalists) est appelé une fois le classement écrit.
+    """
+
+    def __init__(self, max_workers: int = 2, models_dir: str = "models",
+                 data_path: str = "data/kepler_preprocessed.csv", output_dir: str = "metrics/searches"):
+        self.max_workers = max_workers
+        self.models_dir = models_dir
+        self.data_path = data_path
+        self.output_dir = output_dir
+        self._lock = threading.Lock()
+        self._searches: Dict[str, Dict[str, Any]] = {}
+        self._cancelled = set()
+        self._executor = None
+
+    def _ensure_started(self):
+        if self._executor is None:
+            # spawn : pas de fork d'un serveur multi-thread (OpenMP, xgboost)
+            ctx = multiprocessing.get_context("spawn")
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=ctx)
+
+    def submit(self, model_type: str, space: Dict[str, Any], n_candidates: Optional[int] = None,
+               eta: int = 3, min_samples: int = 200, report_top: int = 5, save_top: int = 0,
+               name_prefix: Optional[str] = None, seed: int = RANDOM_STATE,
+               on_success=None) -> Dict[str, Any]:
+        """Valide l'espace, tire les candidats et lance la recherche (ValueError si invalide)"""
+        validate_space(model_type, space)
+        if eta < 2:
+            raise ValueError("eta doit être au moins 2")
+        candidates = sample_candidates(space, n_candidates, seed)
+        search_id = uuid.uuid4().hex
+        search = {
+            "search_id": search_id,
+            "model_type": model_type,
+            "param_space": space,
+            "name_prefix": name_prefix or f"{model_type}_search_{search_id[:8]}",
+            "eta": eta,
+            "min_samples": min_samples,
+            "report_top": max(1, report_top),
+            "save_top": max(0, min(save_top, report_top)),
+            "candidates_count": len(candidates),
+            "status": STATUS_QUEUED,
+            "rungs": [],
+            "submitted_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "cancel_requested": False,
+            "results": None,
+            "files": None,
+            "cpu_seconds": None,
+            "error": None,
+        }
+        with self._lock:
+            self._ensure_started()
+            self._searches[search_id] = search
+            self._prune()
+        threading.Thread(target=self._run, args=(search_id, candidates, on_success),
+                         name=f"search-{search_id[:8]}", daemon=True).start()
+        return self.get(search_id)
+
+    def _check_cancelled(self, search_id: str):
+        if search_id in self._cancelled:
+            raise SearchCancelled()
+
+    def _map(self, fn, calls: List[Tuple]) -> List[Any]:
+        futures = [self._executor.submit(fn, *args) for args in calls]
+        try:
+            return [future.result() for future in futures]
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _run(self, search_id: str, candidates: List[Dict[str, Any]], on_success):
+        search = self._searches[search_id]
+        search.update(status=STATUS_RUNNING, started_at=datetime.now().isoformat())
+        data_path = os.path.abspath(self.data_path)
+        model_type = search["model_type"]
+        try:
+            from training import load_dataset, split_dataset
+
+            train_rows = len(split_dataset(load_dataset(data_path))[2])
+            fit_rows = train_rows - math.ceil(train_rows * VALIDATION_SIZE)
+            schedule = halving_schedule(len(candidates), fit_rows, search["min_samples"], search["eta"])
+
+            # Meilleur palier atteint par chaque candidat : (indice du palier, score, lignes, temps CPU)
+            reached: Dict[int, Tuple[int, float, int, float]] = {}
+            alive = list(range(len(candidates)))
+            failed = set()
+            cpu_seconds = 0.0
+            for rung, (_, n_samples) in enumerate(schedule):
+                self._check_cancelled(search_id)
+                rung_start = time.perf_counter()
+                outcomes = self._map(evaluate_candidate,
+                                     [(model_type, candidates[i], data_path, n_samples) for i in alive])
+                for i, outcome in zip(alive, outcomes):
+                    reached[i] = (rung, outcome["score"], n_samples, outcome["cpu_seconds"])
+                    cpu_seconds += outcome["cpu_seconds"]
+                    if outcome.get("error"):
+                        failed.add(i)
+                alive.sort(key=lambda i: -reached[i][1])
+                search["rungs"].append({"rung": rung, "candidates": len(alive), "samples": n_samples,
+                                        "best_score": reached[alive[0]][1],
+                                        "failed": len(failed & set(alive)),
+                                        "seconds": round(time.perf_counter() - rung_start, 3)})
+                print(f"🔎 Recherche {search_id[:8]} palier {rung}: {len(alive)} candidats sur "
+                      f"{n_samples} lignes, meilleur f1 {reached[alive[0]][1]:.4f}")
+                if rung + 1 < len(schedule):
+                    alive = alive[:schedule[rung + 1][0]]
+
+            # Classement : palier le plus haut atteint, puis score de validation
+            ranked = [i for i in sorted(reached, key=lambda i: (-reached[i][0], -reached[i][1]))
+                      if i not in failed][:search["report_top"]]
+            if not ranked:
+                raise ValueError("Aucun candidat n'a pu être entraîné")
+            self._check_cancelled(search_id)
+            prefix = search["name_prefix"]
+            finals = self._map(train_finalist, [
+                (model_type, candidates[i], data_path, os.path.abspath(self.models_dir),
+                 f"{prefix}_Top{rank}" if rank <= search["save_top"] else None)
+                for rank, i in enumerate(ranked, 1)
+            ])
+
+            records = []
+            for rank, (i, final) in enumerate(zip(ranked, finals), 1):
+                metrics = final["metrics"]
+                cpu_seconds += final["cpu_seconds"]
+                records.append({
+                    "model_name": f"{prefix}_Top{rank}",
+                    **{k: metrics[k] for k in COMPARISON_COLUMNS[1:-2]},
+                    "hyperparameters": candidates[i],
+                    "rank": rank,
+                    "validation_f1_weighted": reached[i][1],
+                    "validation_samples": reached[i][2],
+                    "model_path": final["model_path"],
+                    "metrics": metrics,
+                })
+
+            files = write_results(os.path.join(self.output_dir, search_id), records)
+            # Estimation d'une grille exhaustive : chaque candidat sur toutes les lignes
+            # (temps CPU de son dernier palier extrapolé linéairement)
+            exhaustive = sum(cpu * fit_rows / rows for _, _, rows, cpu in reached.values())
+            if on_success is not None:
+                on_success(search, [r for r in records if r["model_path"]])
+            search.update(
+                status=STATUS_SUCCEEDED,
+                results=[{k: v for k, v in r.items() if k != "metrics"} for r in records],
+                files=files,
+                cpu_seconds={"search": round(cpu_seconds, 3),
+                             "exhaustive_estimate": round(exhaustive, 3),
+                             "ratio": round(cpu_seconds / exhaustive, 4) if exhaustive else None},
+            )
+            print(f"✅ Recherche {search_id[:8]} terminée : {records[0]['hyperparameters']} "
+                  f"(f1 test {records[0]['f1_weighted']:.4f})")
+        except SearchCancelled:
+            search.update(status=STATUS_CANCELLED)
+            print(f"🛑 Recherche {search_id[:8]} annulée")
+        except Exception as e:
+            search.update(status=STATUS_FAILED, error=str(e))
+            print(f"❌ Recherche {search_id[:8]} échouée: {e}")
+        finally:
+            search["finished_at"] = datetime.now().isoformat()
+            self._cancelled.discard(search_id)
+
+    def _prune(self):
+        finished = [sid for sid, s in self._searches.items() if s["status"] in FINISHED_STATUSES]
+        for search_id in finished[:max(0, len(finished) - MAX_FINISHED_SEARCHES)]:
+            del self._searches[search_id]
+
+    def get(self, search_id: str) -> Optional[Dict[str, Any]]:
+        search = self._searches.get(search_id)
+        return dict(search, rungs=list(search["rungs"])) if search is not None else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [self.get(search_id) for search_id in list(self._searches)]
+
+    def cancel(self, search_id: str) -> Optional[Dict[str, Any]]:
+        """Arrête la recherche à la fin du palier en cours"""
+        search = self._searches.get(search_id)
+        if search is None:
+            return None
+        if search["status"] not in FINISHED_STATUSES:
+            search["cancel_requested"] = True
+            self._cancelled.add(search_id)
+        return self.get(search_id)
+
+    def shutdown(self):
+        for search_id in list(self._searches):
+            self._cancelled.add(search_id)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
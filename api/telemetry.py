@@ -0,0 +1,263 @@
+import bisect
+import math
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Métriques au format texte Prometheus (exposition 0.0.4), sans dépendance.
+#
+# Chaque thread écrit dans son propre fragment (dict) : une incrémentation est
+# une lecture + écriture dans un dict que personne d'autre ne modifie, sans
+# verrou ni contention. Une collecte additionne les fragments de tous les threads.
+# Quand un thread se termine, son fragment est versé dans un total des threads
+# terminés : le nombre de fragments suit le nombre de threads vivants.
+# Les compteurs existants (registre, exécuteur, cache...) sont lus au moment de
+# la collecte par des collecteurs : ils ne coûtent rien aux requêtes.
+
+# Starlette ajoute "; charset=utf-8" aux types text/*
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Bornes (secondes) des histogrammes de latence : de 0,5 ms à 10 s
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bornes des durées longues (chargements, phases d'entraînement)
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0)
+# Bornes des tailles de lot (lignes)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 1024, 4096, 16384, 65536)
+
+# Échantillon d'un collecteur : (suffixe du nom, labels, valeur)
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str, labelnames: Sequence[str]):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+
+class Counter(_Metric):
+    """Compteur croissant ; le nom se termine par _total"""
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        shard = self.registry._shard()
+        key = (self.name, labels)
+        shard[key] = shard.get(key, 0.0) + amount
+
+    def samples(self, shards: List[Dict]) -> List[Sample]:
+        totals: Dict[Tuple[str, ...], float] = {}
+        for shard in shards:
+            for (name, labels), value in shard.items():
+                if name == self.name:
+                    totals[labels] = totals.get(labels, 0.0) + value
+        return [("", dict(zip(self.labelnames, labels)), value) for labels, value in sorted(totals.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, labelnames, buckets: Sequence[float]):
+        super().__init__(registry, name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        shard = self.registry._shard()
+        key = (self.name, labels)
+        cell = shard.get(key)
+        if cell is None:
+            # [effectif par borne..., au-delà de la dernière borne, somme, nombre]
+            cell = shard[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    def time(self, *labels: str) -> "_Timer":
+        """Bloc with mesuré : with histogram.time("label"): ..."""
+        return _Timer(self, labels)
+
+    def samples(self, shards: List[Dict]) -> List[Sample]:
+        merged: Dict[Tuple[str, ...], List[float]] = {}
+        for shard in shards:
+            for (name, labels), cell in shard.items():
+                if name != self.name:
+                    continue
+                cell = list(cell)
+                total = merged.get(labels)
+                merged[labels] = cell if total is None else [a + b for a, b in zip(total, cell)]
+        samples = []
+        for labels, cell in sorted(merged.items()):
+            base = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), cell):
+                cumulative += count
+                samples.append(("_bucket", {**base, "le": _format_value(float(bound))}, cumulative))
+            samples.append(("_sum", base, cell[-2]))
+            samples.append(("_count", base, cell[-1]))
+        return samples
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class _ThreadSentinel:
+    """Objet propre à un thread, libéré avec son threading.local à la fin du thread"""
+    __slots__ = ("__weakref__",)
+
+
+def _merge_shard(total: Dict, shard: Dict):
+    for key, value in shard.items():
+        existing = total.get(key)
+        if isinstance(value, list):
+            total[key] = list(value) if existing is None else [a + b for a, b in zip(existing, value)]
+        else:
+            total[key] = value if existing is None else existing + value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shards: List[Dict] = []
+        # Valeurs des threads terminés (même format qu'un fragment)
+        self._retired: Dict = {}
+        self._metrics: Dict[str, _Metric] = {}
+        # nom -> (type, aide, fonction renvoyant des échantillons)
+        self._collectors: Dict[str, Tuple[str, str, Callable[[], Iterable[Sample]]]] = {}
+
+    def _shard(self) -> Dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            # Premier accès de ce thread : seul moment où un verrou est pris
+            shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            self._local.sentinel = sentinel = _ThreadSentinel()
+            weakref.finalize(sentinel, self._retire, shard)
+            return shard
+
+    def _retire(self, shard: Dict):
+        """Fin d'un thread : son fragment rejoint le total des threads terminés"""
+        with self._lock:
+            self._shards = [s for s in self._shards if s is not shard]
+            _merge_shard(self._retired, shard)
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, help_text, labelnames, buckets))
+
+    def collector(self, name: str, kind: str, help_text: str, collect: Callable[[], Iterable[Sample]]):
+        """Métrique lue au moment de la collecte : collect() -> [(suffixe, labels, valeur)]"""
+        self._collectors[name] = (kind, help_text, collect)
+
+    def render(self) -> str:
+        """Toutes les métriques au format texte Prometheus"""
+        with self._lock:
+            shards = [dict(shard) for shard in self._shards]
+            shards.append({key: list(value) if isinstance(value, list) else value
+                           for key, value in self._retired.items()})
+            metrics = list(self._metrics.values())
+        lines = []
+        families = [(m.name, m.kind, m.help, lambda m=m: m.samples(shards)) for m in metrics]
+        families += [(name, kind, help_text, collect)
+                     for name, (kind, help_text, collect) in list(self._collectors.items())]
+        for name, kind, help_text, collect in families:
+            try:
+                samples = list(collect())
+            except Exception as e:
+                print(f"⚠️ Collecte de {name} impossible: {e}")
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Middleware ASGI : nombre de requêtes et latence par route (gabarit du chemin,
+    ex. /api/jobs/{job_id}) et par code de statut"""
+
+    def __init__(self, app, requests: Counter, latency: Histogram):
+        self.app = app
+        self.requests = requests
+        self.latency = latency
+        self._paths: Optional[Dict[Any, str]] = None
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._paths is None or endpoint not in self._paths:
+            routes = getattr(scope.get("app"), "routes", [])
+            self._paths = {getattr(r, "endpoint", None): getattr(r, "path", "") for r in routes}
+        return self._paths.get(endpoint, "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = self._route(scope)
+            self.requests.inc(scope["method"], route, str(status[0]))
+            self.latency.observe(time.perf_counter() - start, route)
+
+
+# Registre de l'application
+metrics = MetricsRegistry()
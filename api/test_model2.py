@@ -1,7 +1,7 @@
 import requests
 import json
 
-url = "http://localhost:8000/api/models"
+url = "http://localhost:8000/api/predict"
 data = {
     "model_name": "XGBoost_top1",
     "features": [0.5, 0.15, 0.3, 1.3, 2, 0.5, 0, 0, 0, 0.1, 
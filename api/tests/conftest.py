@@ -0,0 +1,17 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Les modules de l'API sont à plat dans api/ (lancée depuis ce dossier)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def koi_like_data():
+    """Petit jeu à 20 caractéristiques et 3 classes, comme le dataset Kepler"""
+    from sklearn.datasets import make_classification
+    X, y = make_classification(n_samples=600, n_features=20, n_informative=8, n_classes=3,
+                               random_state=0)
+    return X, y
@@ -0,0 +1,211 @@
+import asyncio
+import io
+import json
+import pickle
+import threading
+import time
+
+import pytest
+
+from executor import InferenceExecutor, InferenceOverloaded
+
+
+def _lane(executor: InferenceExecutor, model_name: str):
+    return executor.stats()["models"].get(model_name, {})
+
+
+def _koi_csv(X) -> io.BytesIO:
+    lines = [",".join(f"f{i}" for i in range(X.shape[1]))] + [",".join(str(v) for v in row) for row in X]
+    return io.BytesIO(("\n".join(lines) + "\n").encode())
+
+
+async def _until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition non atteinte"
+        await asyncio.sleep(0.005)
+
+
+def test_concurrency_is_capped_per_model():
+    executor = InferenceExecutor(max_workers=4, max_concurrency=2, max_queue=10)
+    lock, current, peak = threading.Lock(), [0], [0]
+
+    def work(i):
+        with lock:
+            current[0] += 1
+            peak[0] = max(peak[0], current[0])
+        time.sleep(0.02)
+        with lock:
+            current[0] -= 1
+        return i
+
+    async def scenario():
+        return await asyncio.gather(*(executor.run("a", work, i) for i in range(6)))
+
+    try:
+        outcomes = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert [result for result, _ in outcomes] == list(range(6))
+    assert peak[0] == 2
+    assert all(set(timing) == {"queue_wait_ms", "compute_ms"} for _, timing in outcomes)
+    assert executor.stats()["models"]["a"]["completed"] == 6
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    executor = InferenceExecutor(max_workers=2, max_concurrency=1, max_queue=1)
+    gate = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run("a", gate.wait))
+        await _until(lambda: _lane(executor, "a").get("running") == 1)
+        queued = asyncio.ensure_future(executor.run("a", gate.wait))
+        await _until(lambda: _lane(executor, "a").get("waiting") == 1)
+
+        with pytest.raises(InferenceOverloaded) as overloaded:
+            await executor.run("a", gate.wait)
+        gate.set()
+        await asyncio.gather(running, queued)
+        return overloaded.value
+
+    try:
+        error = asyncio.run(scenario())
+    finally:
+        gate.set()
+        executor.shutdown()
+    assert error.model_name == "a"
+    assert error.retry_after >= 1
+    stats = executor.stats()["models"]["a"]
+    assert (stats["completed"], stats["rejected"], stats["waiting"], stats["running"]) == (2, 1, 0, 0)
+
+
+def test_saturated_model_does_not_block_other_models():
+    executor = InferenceExecutor(max_workers=2, max_concurrency=1, max_queue=0)
+    gate = threading.Event()
+
+    async def scenario():
+        blocked = asyncio.ensure_future(executor.run("a", gate.wait))
+        await _until(lambda: _lane(executor, "a").get("running") == 1)
+        with pytest.raises(InferenceOverloaded):
+            await executor.run("a", sum, [1, 2])
+        result, _ = await executor.run("b", sum, [1, 2])
+        gate.set()
+        await blocked
+        return result
+
+    try:
+        assert asyncio.run(scenario()) == 3
+    finally:
+        gate.set()
+        executor.shutdown()
+
+
+def test_failed_call_releases_its_slot():
+    executor = InferenceExecutor(max_workers=1, max_concurrency=1, max_queue=0)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await executor.run("a", fail)
+        result, _ = await executor.run("a", sum, [2, 3])
+        return result
+
+    try:
+        assert asyncio.run(scenario()) == 5
+    finally:
+        executor.shutdown()
+    stats = executor.stats()["models"]["a"]
+    assert (stats["failed"], stats["completed"], stats["running"]) == (1, 1, 0)
+
+
+# ---------- limites appliquées par l'API ----------
+
+@pytest.fixture(scope="module")
+def api(tmp_path_factory, koi_like_data):
+    """Application avec une place et aucune file par modèle, dans un dossier de travail vide"""
+    from sklearn.linear_model import LogisticRegression
+
+    workdir = tmp_path_factory.mktemp("api")
+    for directory in ("models", "metrics", "data"):
+        (workdir / directory).mkdir()
+    X, y = koi_like_data
+    with open(workdir / "models" / "lr.pkl", "wb") as f:
+        pickle.dump(LogisticRegression(max_iter=1000).fit(X, y), f)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.chdir(workdir)
+        for key, value in {"MODEL_WATCHER": "off", "INFERENCE_MODEL_CONCURRENCY": "1",
+                           "INFERENCE_MODEL_QUEUE": "0", "PREDICT_BATCHING": "0",
+                           "PREDICTION_CACHE": "0", "TRAINING_WORKERS": "1"}.items():
+            mp.setenv(key, value)
+        from fastapi.testclient import TestClient
+        import main
+
+        with TestClient(main.app) as client:
+            yield main, client, X
+
+
+@pytest.fixture
+def saturated(api, monkeypatch):
+    """Une prédiction de lr bloquée dans l'exécuteur : la place du modèle est prise"""
+    main, client, X = api
+    gate = threading.Event()
+    real_infer = main.infer
+
+    def gated_infer(*args):
+        gate.wait(10)
+        return real_infer(*args)
+
+    monkeypatch.setattr(main, "infer", gated_infer)
+    responses = []
+    blocked = threading.Thread(target=lambda: responses.append(
+        client.post("/api/predict", json={"model_name": "lr", "features": X[0].tolist()})))
+    blocked.start()
+    deadline = time.monotonic() + 10
+    while _lane(main.inference_executor, "lr").get("running") != 1:
+        assert time.monotonic() < deadline, "prédiction bloquée non démarrée"
+        time.sleep(0.005)
+    yield client, X
+    gate.set()
+    blocked.join(10)
+    assert responses[0].status_code == 200
+
+
+def test_predict_returns_429_when_model_is_saturated(saturated):
+    client, X = saturated
+    response = client.post("/api/predict", json={"model_name": "lr", "features": X[1].tolist()})
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_predict_batch_returns_429_when_model_is_saturated(saturated):
+    client, X = saturated
+    response = client.post("/api/predict-batch", json={"model_name": "lr", "features": X[:4].tolist()})
+
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+
+
+def test_upload_returns_429_before_streaming_when_model_is_saturated(saturated):
+    client, X = saturated
+    response = client.post("/api/predict-upload", data={"model_name": "lr", "output_format": "ndjson"},
+                           files={"file": ("koi.csv", _koi_csv(X[:10]), "text/csv")})
+
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+
+
+def test_upload_streams_when_model_is_free(api):
+    main, client, X = api
+    response = client.post("/api/predict-upload",
+                           data={"model_name": "lr", "output_format": "ndjson", "chunk_size": "4"},
+                           files={"file": ("koi.csv", _koi_csv(X[:10]), "text/csv")})
+
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines() if line]
+    assert [row["row"] for row in rows] == list(range(2, 12))
+    expected = main.registry.get("lr").predict(X[:10])
+    assert [row["prediction"] for row in rows] == expected.tolist()
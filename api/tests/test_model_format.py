@@ -0,0 +1,132 @@
+import json
+
+import numpy as np
+import pytest
+
+from model_format import ALLOWED_CLASSES, MAGIC, UnsupportedModel, export_model, import_model, read_header
+
+
+def _estimators():
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.svm import SVC
+    from xgboost import XGBClassifier
+
+    return {
+        "random_forest": RandomForestClassifier(n_estimators=20, random_state=0),
+        "xgboost": XGBClassifier(n_estimators=20, max_depth=3, random_state=0),
+        "svm": SVC(probability=True, random_state=0),
+        "svm_decision": SVC(random_state=0),
+        "logistic_regression": LogisticRegression(max_iter=1000),
+        "knn_kd_tree": KNeighborsClassifier(algorithm="kd_tree"),
+        "knn_ball_tree": KNeighborsClassifier(algorithm="ball_tree", metric="manhattan"),
+        "knn_brute": KNeighborsClassifier(algorithm="brute"),
+    }
+
+
+def _forged(tmp_path, root):
+    """Fichier arrays dont l'en-tête est écrit à la main (aucun tableau)"""
+    header = json.dumps({"format_version": 1, "arrays": [], "root": root}).encode("utf-8")
+    path = tmp_path / "forged.arrays"
+    path.write_bytes(MAGIC + len(header).to_bytes(8, "little") + header)
+    return str(path)
+
+
+@pytest.mark.parametrize("kind", sorted(_estimators()))
+def test_round_trip_predicts_like_the_original(tmp_path, koi_like_data, kind):
+    X, y = koi_like_data
+    model = _estimators()[kind].fit(X, y)
+    path = str(tmp_path / f"{kind}.arrays")
+
+    header = export_model(model, path, {"content_hash": "abc"})
+    restored = import_model(path)
+
+    assert type(restored) is type(model)
+    assert read_header(path)["source"] == {"content_hash": "abc"}
+    assert header["data_bytes"] > 0
+    np.testing.assert_array_equal(restored.predict(X), model.predict(X))
+    if hasattr(model, "predict_proba") and getattr(model, "probability", True):
+        np.testing.assert_allclose(restored.predict_proba(X), model.predict_proba(X), rtol=0, atol=1e-12)
+    else:
+        np.testing.assert_allclose(restored.decision_function(X), model.decision_function(X))
+
+
+def test_round_trip_keeps_string_labels(tmp_path, koi_like_data):
+    from sklearn.linear_model import LogisticRegression
+
+    X, y = koi_like_data
+    labels = np.array(["CANDIDATE", "CONFIRMED", "FALSE POSITIVE"])[y]
+    model = LogisticRegression(max_iter=1000).fit(X, labels)
+    path = str(tmp_path / "lr.arrays")
+    export_model(model, path)
+
+    restored = import_model(path)
+    assert list(restored.classes_) == list(model.classes_)
+    np.testing.assert_array_equal(restored.predict(X), model.predict(X))
+
+
+def test_imported_arrays_are_copy_on_write_views(tmp_path, koi_like_data):
+    from sklearn.neighbors import KNeighborsClassifier
+
+    X, y = koi_like_data
+    path = str(tmp_path / "knn.arrays")
+    export_model(KNeighborsClassifier().fit(X, y), path)
+
+    restored = import_model(path)
+    assert restored._fit_X.base is not None
+    restored._fit_X[0, 0] = 1e9  # mapping privé : le fichier n'est pas modifié
+    np.testing.assert_array_equal(import_model(path)._fit_X[0], X[0])
+
+
+def test_export_rejects_classes_outside_the_allowlist(tmp_path, koi_like_data):
+    from sklearn.ensemble import GradientBoostingClassifier
+
+    X, y = koi_like_data
+    model = GradientBoostingClassifier(n_estimators=2).fit(X, y)
+    with pytest.raises(UnsupportedModel):
+        export_model(model, str(tmp_path / "gb.arrays"))
+    assert not (tmp_path / "gb.arrays").exists()
+
+
+@pytest.mark.parametrize("name", [
+    "os:system",
+    "builtins:eval",
+    # Module autorisé mais classe absente de la liste
+    "sklearn.ensemble:RandomForestRegressor",
+    # Attribut imbriqué d'une classe autorisée
+    "sklearn.ensemble:RandomForestClassifier.__init__",
+    "sklearn.ensemble._forest:RandomForestClassifier.__init__.__globals__",
+])
+def test_import_rejects_forged_class_names(tmp_path, name):
+    path = _forged(tmp_path, {"$t": "object", "class": name, "new": False, "args": ["echo pwned"],
+                              "state": None})
+    with pytest.raises(UnsupportedModel):
+        import_model(path)
+
+
+def test_import_rejects_constructor_call_on_allowed_class(tmp_path):
+    # Les classes autorisées ne sont reconstruites que par __new__ (sauf CONSTRUCTIBLE)
+    path = _forged(tmp_path, {"$t": "object", "class": "sklearn.svm._classes:SVC", "new": False,
+                              "args": [], "state": None})
+    with pytest.raises(UnsupportedModel):
+        import_model(path)
+
+
+def test_allowlist_names_resolve_to_the_exact_class():
+    from model_format import _class_name, _resolve
+
+    for name in ALLOWED_CLASSES:
+        try:
+            cls = _resolve(name)
+        except UnsupportedModel:
+            continue  # classe absente de cette version de la bibliothèque
+        assert _class_name(cls) == name
+
+
+def test_import_rejects_other_format_versions(tmp_path):
+    header = json.dumps({"format_version": 99, "arrays": [], "root": None}).encode("utf-8")
+    path = tmp_path / "future.arrays"
+    path.write_bytes(MAGIC + len(header).to_bytes(8, "little") + header)
+    with pytest.raises(UnsupportedModel):
+        import_model(str(path))
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from tree_engine import NATIVE_MIN_ROWS, CompiledForest, compile_model
+
+
+def _random_forest(X, y):
+    from sklearn.ensemble import RandomForestClassifier
+    return RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0).fit(X, y)
+
+
+def _xgboost(X, y, **params):
+    from xgboost import XGBClassifier
+    return XGBClassifier(n_estimators=25, max_depth=4, random_state=0, **params).fit(X, y)
+
+
+def test_random_forest_matches_native(koi_like_data):
+    X, y = koi_like_data
+    model = _random_forest(X, y)
+    compiled = compile_model(model)
+
+    assert isinstance(compiled, CompiledForest)
+    assert compiled.n_trees == 25
+    np.testing.assert_allclose(compiled.compiled_proba(X), model.predict_proba(X), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(compiled.classes_, model.classes_)
+
+
+def test_xgboost_multiclass_matches_native(koi_like_data):
+    X, y = koi_like_data
+    model = _xgboost(X, y)
+    compiled = compile_model(model)
+
+    assert isinstance(compiled, CompiledForest)
+    np.testing.assert_allclose(compiled.compiled_proba(X), model.predict_proba(X), rtol=0, atol=1e-5)
+    np.testing.assert_array_equal(compiled.compiled_proba(X).argmax(axis=1), model.predict(X))
+
+
+def test_xgboost_binary_matches_native(koi_like_data):
+    X, y = koi_like_data
+    binary = (y == 1).astype(int)
+    model = _xgboost(X, binary)
+    compiled = compile_model(model)
+
+    np.testing.assert_allclose(compiled.compiled_proba(X), model.predict_proba(X), rtol=0, atol=1e-5)
+
+
+def test_xgboost_missing_values_follow_default_direction(koi_like_data):
+    X, y = koi_like_data
+    X = X.copy()
+    X[::7, 3] = np.nan
+    X[::5, 11] = np.nan
+    model = _xgboost(X, y)
+    compiled = compile_model(model)
+
+    np.testing.assert_allclose(compiled.compiled_proba(X), model.predict_proba(X), rtol=0, atol=1e-5)
+
+
+@pytest.mark.parametrize("build", [_random_forest, _xgboost])
+def test_predict_proba_is_consistent_across_batch_sizes(koi_like_data, build):
+    X, y = koi_like_data
+    model = build(X, y)
+    compiled = compile_model(model)
+    small = X[:NATIVE_MIN_ROWS[compiled.kind] - 1]
+
+    # Petits lots : parcours compilé ; gros lots : délégués au moteur natif
+    np.testing.assert_allclose(compiled.predict_proba(small), model.predict_proba(small), atol=1e-5)
+    np.testing.assert_allclose(compiled.predict_proba(X), model.predict_proba(X), atol=1e-12)
+    np.testing.assert_array_equal(compiled.predict(X[:1]), model.predict(X[:1]))
+
+
+def test_single_row_matches_native(koi_like_data):
+    X, y = koi_like_data
+    model = _random_forest(X, y)
+    compiled = compile_model(model)
+
+    for row in X[:20]:
+        np.testing.assert_allclose(compiled.compiled_proba(row[None, :]), model.predict_proba(row[None, :]),
+                                   atol=1e-12)
+
+
+def test_wrong_feature_count_is_rejected(koi_like_data):
+    X, y = koi_like_data
+    compiled = compile_model(_random_forest(X, y))
+    with pytest.raises(ValueError):
+        compiled.compiled_proba(X[:, :5])
+
+
+def test_random_forest_rejects_nan_like_sklearn(koi_like_data):
+    X, y = koi_like_data
+    compiled = compile_model(_random_forest(X, y))
+    X = X[:3].copy()
+    X[0, 0] = np.nan
+    with pytest.raises(ValueError):
+        compiled.compiled_proba(X)
+
+
+def test_unsupported_models_are_returned_unchanged(koi_like_data):
+    from sklearn.svm import SVC
+
+    X, y = koi_like_data
+    model = SVC().fit(X, y)
+    assert compile_model(model) is model
+
+
+def test_clone_returns_unfitted_native_estimator(koi_like_data):
+    from sklearn.base import clone
+    from sklearn.ensemble import RandomForestClassifier
+
+    X, y = koi_like_data
+    model = _random_forest(X, y)
+    copy = clone(compile_model(model))
+
+    assert type(copy) is RandomForestClassifier
+    assert copy.get_params() == model.get_params()
+    assert not hasattr(copy, "estimators_")
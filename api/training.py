@@ -0,0 +1,136 @@
+import copy
+from typing import Dict, Any
+
+from dataset import get_dataset
+
+# Les bibliothèques d'estimateurs et sklearn.metrics sont importées à la demande :
+# importer ce module (constantes, clone) ne coûte rien au démarrage de l'API.
+
+TRAINING_DATA_PATH = 'data/kepler_preprocessed.csv'
+SUPPORTED_MODEL_TYPES = ("RandomForest", "XGBoost", "SVM")
+
+# Hyperparamètres acceptés par famille (create-model, recherche) ; ceux qui ne sont
+# pas fournis gardent les valeurs par défaut ci-dessous ou celles de l'estimateur
+TUNABLE_HYPERPARAMS = {
+    "RandomForest": ("n_estimators", "max_depth", "max_features", "min_samples_split", "min_samples_leaf"),
+    "XGBoost": ("n_estimators", "max_depth", "learning_rate", "subsample", "colsample_bytree", "min_child_weight"),
+    "SVM": ("C", "kernel", "gamma"),
+}
+
+
+def build_custom_model(model_type: str, hyperparams: Dict[str, Any]):
+    """Estimateur non entraîné de la famille demandée ; lève ValueError si le type est inconnu"""
+    if model_type == "RandomForest":
+        from sklearn.ensemble import RandomForestClassifier
+        model = RandomForestClassifier(
+            n_estimators=hyperparams.get('n_estimators', 100),
+            max_depth=hyperparams.get('max_depth', None),
+            random_state=42
+        )
+    elif model_type == "XGBoost":
+        from xgboost import XGBClassifier
+        model = XGBClassifier(
+            n_estimators=hyperparams.get('n_estimators', 100),
+            max_depth=hyperparams.get('max_depth', 6),
+            random_state=42
+        )
+    elif model_type == "SVM":
+        from sklearn.svm import SVC
+        model = SVC(
+            C=hyperparams.get('C', 1.0),
+            kernel=hyperparams.get('kernel', 'rbf'),
+            probability=True,
+            random_state=42
+        )
+    else:
+        raise ValueError(f"Type de modèle non supporté: {model_type}")
+    # Hyperparamètres supplémentaires de la famille (les autres clés sont ignorées)
+    model.set_params(**{k: v for k, v in hyperparams.items() if k in TUNABLE_HYPERPARAMS[model_type]})
+    return model
+
+
+def validate_hyperparams(model_type: str, hyperparams: Dict[str, Any]) -> None:
+    """Vérifie les hyperparamètres avant la soumission d'un job ; lève ValueError avec
+    le message de l'estimateur (sklearn les contrôle sans entraîner, XGBoost seulement
+    à l'entraînement : un arbre sur 4 lignes suffit)"""
+    try:
+        model = build_custom_model(model_type, hyperparams)
+        if model_type == "XGBoost":
+            import numpy as np
+            n_estimators = model.get_params()["n_estimators"]
+            if isinstance(n_estimators, bool) or not isinstance(n_estimators, int) or n_estimators < 1:
+                raise ValueError(f"n_estimators doit être un entier >= 1, reçu {n_estimators!r}")
+            model.set_params(n_estimators=1, n_jobs=1)
+            model.fit(np.zeros((4, 2)), np.array([0, 1, 0, 1]))
+        else:
+            model._validate_params()
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(str(e)) from e
+
+
+def create_custom_model(model_type: str, hyperparams: Dict[str, Any]):
+    try:
+        return build_custom_model(model_type, hyperparams)
+    except Exception as e:
+        print(f"❌ Erreur création modèle: {e}")
+        return None
+
+
+def clone_estimator(model):
+    """Copie non entraînée d'un estimateur (mêmes hyperparamètres), sans toucher à l'original"""
+    from sklearn.base import clone
+    try:
+        return clone(model)
+    except Exception:
+        return copy.deepcopy(model)
+
+
+def load_dataset(path: str = TRAINING_DATA_PATH):
+    """Retourne le dataset d'entraînement en cache (CSV parsé une fois, .npy mappés en mémoire)"""
+    return get_dataset(path)
+
+
+def split_dataset(dataset):
+    """Split train/test stratifié (80/20, graine fixe), indices mémorisés par empreinte"""
+    return dataset.split()
+
+
+def load_training_data():
+    try:
+        X_train, X_test, y_train, y_test = split_dataset(load_dataset())
+        return X_train, X_test, y_train, y_test
+    except Exception as e:
+        print(f"❌ Erreur chargement données: {e}")
+        return None, None, None, None
+
+
+def evaluate_model(model, X_test, y_test) -> Dict[str, Any]:
+    """Calcule les métriques de classification sur le jeu de test"""
+    from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
+
+    y_pred = model.predict(X_test)
+
+    accuracy = accuracy_score(y_test, y_pred)
+    report = classification_report(y_test, y_pred, output_dict=True)
+    cm = confusion_matrix(y_test, y_pred)
+
+    return {
+        'accuracy': accuracy,
+        'precision': report['weighted avg']['precision'],
+        'recall': report['weighted avg']['recall'],
+        'f1_weighted': report['weighted avg']['f1-score'],
+        'f1_macro': report['macro avg']['f1-score'],
+        'confusion_matrix': cm.tolist(),
+        'classification_report': report
+    }
+
+
+def train_and_evaluate_model(model, X_train, X_test, y_train, y_test):
+    try:
+        model.fit(X_train, y_train)
+        return evaluate_model(model, X_test, y_test)
+    except Exception as e:
+        print(f"❌ Erreur entraînement: {e}")
+        return None
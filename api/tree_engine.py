@@ -0,0 +1,245 @@
+import json
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Paires (ligne, arbre) parcourues par bloc : l'état de parcours reste dans le cache CPU
+PAIRS_PER_BLOCK = 1 << 15
+
+# À partir de ce nombre de lignes, predict_proba délègue à l'estimateur natif :
+# le parcours vectorisé gagne sur les petits lots (surcoût fixe de sklearn/XGBoost),
+# le code C/C++ natif reprend l'avantage au-delà (voir benchmarks/tree_engine.py)
+NATIVE_MIN_ROWS = {"random_forest": 128, "xgboost": 8}
+
+
+class CompiledForest:
+    """Forêt d'arbres aplatie en tableaux NumPy, évaluée de façon vectorisée.
+
+    Tous les nœuds de tous les arbres sont rangés dans des tableaux globaux
+    (feature, threshold, left, right, valeur de feuille). Une feuille pointe
+    sur elle-même : après max_depth pas, chaque (ligne, arbre) est sur sa
+    feuille, sans test de fin de parcours.
+
+    Expose predict_proba / predict / classes_ comme l'estimateur d'origine
+    (native), auquel les gros lots sont délégués ; sklearn.base.clone renvoie
+    une copie non entraînée de celui-ci.
+    """
+
+    def __init__(self, kind: str, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray,
+                 right: np.ndarray, roots: np.ndarray, max_depth: int, leaf_values: np.ndarray,
+                 classes: np.ndarray, n_features: int, native=None,
+                 default_left: Optional[np.ndarray] = None, tree_group: Optional[np.ndarray] = None,
+                 objective: Optional[str] = None, base_margin: float = 0.0):
+        self.kind = kind                  # "random_forest" ou "xgboost"
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        # Enfants entrelacés [gauche, droite] : un seul accès par pas de parcours
+        self.children = np.column_stack([left, right]).ravel()
+        self.is_leaf = left == np.arange(len(left))
+        self.roots = roots
+        self.max_depth = max_depth
+        self.leaf_values = leaf_values    # RF : (nœuds, K) probabilités ; XGB : (nœuds,) marges
+        self.classes_ = classes
+        self.n_features_in_ = n_features
+        self.default_left = default_left  # XGB : direction des valeurs manquantes
+        self.tree_group = tree_group      # XGB : classe de chaque arbre
+        self.objective = objective
+        self.base_margin = base_margin
+        self.native = native              # estimateur d'origine
+        self.native_min_rows = NATIVE_MIN_ROWS[kind]
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def __sklearn_clone__(self):
+        from sklearn.base import clone
+        return clone(self.native)
+
+    def _leaves(self, X: np.ndarray) -> np.ndarray:
+        """Indice global de la feuille atteinte par chaque (ligne, arbre), forme (lignes, arbres)"""
+        n_rows, n_trees = X.shape[0], self.n_trees
+        flat = X.ravel()
+        # Paires (ligne, arbre) encore en parcours : une paire arrivée sur sa feuille est retirée
+        pos = np.arange(n_rows * n_trees, dtype=np.int32)
+        nodes = np.tile(self.roots, n_rows)
+        offsets = np.repeat(np.arange(n_rows, dtype=np.int32) * np.int32(X.shape[1]), n_trees)
+        leaves = np.empty(n_rows * n_trees, dtype=np.int32)
+        has_nan = self.kind == "xgboost" and np.isnan(flat).any()
+        while pos.size:
+            done = self.is_leaf[nodes]
+            if done.any():
+                leaves[pos[done]] = nodes[done]
+                active = ~done
+                pos, nodes, offsets = pos[active], nodes[active], offsets[active]
+                if not pos.size:
+                    break
+            x = flat[offsets + self.feature[nodes]]
+            if self.kind == "xgboost":
+                # XGBoost : x < seuil à gauche, valeur manquante selon default_left
+                go_right = ~(x < self.threshold[nodes])
+                if has_nan:
+                    go_right &= ~(np.isnan(x) & self.default_left[nodes])
+            else:
+                go_right = x > self.threshold[nodes]
+            nodes = self.children[2 * nodes + go_right]
+        return leaves.reshape(n_rows, n_trees)
+
+    def _proba_block(self, X: np.ndarray) -> np.ndarray:
+        leaves = self._leaves(X)
+        if self.kind == "random_forest":
+            return self.leaf_values[leaves].mean(axis=1)
+
+        # Marge par classe = base + somme des feuilles des arbres de cette classe
+        n_groups = int(self.tree_group.max()) + 1
+        margins = self.leaf_values[leaves] @ np.eye(n_groups)[self.tree_group] + self.base_margin
+        if self.objective == "binary:logistic":
+            p = 1.0 / (1.0 + np.exp(-margins[:, 0]))
+            return np.column_stack([1.0 - p, p])
+        margins -= margins.max(axis=1, keepdims=True)
+        e = np.exp(margins)
+        return e / e.sum(axis=1, keepdims=True)
+
+    def predict_proba(self, X) -> np.ndarray:
+        if self.native is not None and len(X) >= self.native_min_rows:
+            return self.native.predict_proba(X)
+        return self.compiled_proba(X)
+
+    def compiled_proba(self, X) -> np.ndarray:
+        """Probabilités calculées par le parcours vectorisé, quelle que soit la taille du lot"""
+        # Mêmes précisions que les moteurs natifs : sklearn compare X en float32 à un
+        # seuil float64, XGBoost compare en float32
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"{self.n_features_in_} caractéristiques attendues (forme reçue: {X.shape})")
+        if self.kind == "random_forest":
+            if np.isnan(X).any():
+                raise ValueError("Input contains NaN")
+            X = X.astype(np.float64)
+        rows_per_block = max(1, PAIRS_PER_BLOCK // self.n_trees)
+        blocks = [self._proba_block(X[i:i + rows_per_block]) for i in range(0, X.shape[0], rows_per_block)]
+        return np.vstack(blocks) if blocks else np.zeros((0, len(self.classes_)))
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def _depth(left: np.ndarray, right: np.ndarray) -> int:
+    """Profondeur maximale d'un arbre (nombre de tests de la racine à la feuille la plus basse)"""
+    depth = np.zeros(len(left), dtype=np.int64)
+    for node in range(len(left)):  # les enfants ont toujours un indice supérieur au parent
+        if left[node] != -1:
+            depth[left[node]] = depth[right[node]] = depth[node] + 1
+    return int(depth.max())
+
+
+def _link_trees(trees: List[Dict[str, np.ndarray]]):
+    """Concatène des arbres (indices locaux, -1 = feuille) en tableaux globaux auto-bouclés"""
+    offsets = np.cumsum([0] + [len(t["left"]) for t in trees])
+    left, right = [], []
+    for offset, t in zip(offsets, trees):
+        own = np.arange(len(t["left"])) + offset
+        leaf = t["left"] == -1
+        left.append(np.where(leaf, own, t["left"] + offset))
+        right.append(np.where(leaf, own, t["right"] + offset))
+    max_depth = max(_depth(t["left"], t["right"]) for t in trees)
+    return (np.concatenate(left).astype(np.int32), np.concatenate(right).astype(np.int32),
+            offsets[:-1].astype(np.int32), max_depth)
+
+
+def compile_random_forest(model) -> CompiledForest:
+    trees, values = [], []
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        if tree.n_outputs != 1:
+            raise ValueError("Forêts multi-sorties non supportées")
+        trees.append({"left": tree.children_left.astype(np.int64), "right": tree.children_right.astype(np.int64),
+                      "feature": np.maximum(tree.feature, 0), "threshold": tree.threshold})
+        counts = tree.value[:, 0, :]
+        # Comme DecisionTreeClassifier.predict_proba : effectifs normalisés par nœud
+        sums = counts.sum(axis=1, keepdims=True)
+        values.append(counts / np.where(sums == 0, 1.0, sums))
+
+    left, right, roots, max_depth = _link_trees(trees)
+    return CompiledForest(
+        "random_forest",
+        feature=np.concatenate([t["feature"] for t in trees]).astype(np.int32),
+        threshold=np.concatenate([t["threshold"] for t in trees]).astype(np.float64),
+        left=left, right=right, roots=roots, max_depth=max_depth,
+        leaf_values=np.concatenate(values),
+        classes=np.asarray(model.classes_), n_features=int(model.n_features_in_),
+        native=model,
+    )
+
+
+def compile_xgboost(model) -> CompiledForest:
+    booster = model.get_booster()
+    learner = json.loads(booster.save_raw(raw_format="json"))["learner"]
+    objective = learner["objective"]["name"]
+    if objective not in ("binary:logistic", "multi:softprob", "multi:softmax"):
+        raise ValueError(f"Objectif XGBoost non supporté: {objective}")
+    gbm = learner["gradient_booster"]
+    if gbm["name"] != "gbtree":
+        raise ValueError(f"Booster XGBoost non supporté: {gbm['name']}")
+
+    raw_trees = gbm["model"]["trees"]
+    groups = np.asarray(gbm["model"]["tree_info"], dtype=np.int64)
+    # Comme predict_proba : s'arrêter à la meilleure itération en cas d'early stopping
+    best_iteration = booster.attr("best_iteration")
+    if best_iteration is not None:
+        per_iteration = max(1, int(learner["learner_model_param"]["num_class"])) * \
+            int(gbm["model"]["gbtree_model_param"].get("num_parallel_tree", 1))
+        keep = (int(best_iteration) + 1) * per_iteration
+        raw_trees, groups = raw_trees[:keep], groups[:keep]
+
+    trees, leaves = [], []
+    for t in raw_trees:
+        if any(t.get("split_type", [])):
+            raise ValueError("Splits catégoriels XGBoost non supportés")
+        left = np.asarray(t["left_children"], dtype=np.int64)
+        trees.append({
+            "left": left, "right": np.asarray(t["right_children"], dtype=np.int64),
+            "feature": np.asarray(t["split_indices"], dtype=np.int64),
+            "threshold": np.asarray(t["split_conditions"], dtype=np.float32),
+            "default_left": np.asarray(t["default_left"], dtype=bool),
+        })
+        # Une feuille stocke sa valeur dans split_conditions
+        leaves.append(np.where(left == -1, np.asarray(t["split_conditions"], dtype=np.float64), 0.0))
+
+    base_score = float(learner["learner_model_param"]["base_score"])
+    if objective == "binary:logistic":
+        base_margin = float(np.log(base_score / (1.0 - base_score)))
+    else:
+        base_margin = base_score
+
+    left, right, roots, max_depth = _link_trees(trees)
+    return CompiledForest(
+        "xgboost",
+        feature=np.concatenate([t["feature"] for t in trees]).astype(np.int32),
+        threshold=np.concatenate([t["threshold"] for t in trees]),
+        left=left, right=right, roots=roots, max_depth=max_depth,
+        leaf_values=np.concatenate(leaves),
+        classes=np.asarray(model.classes_), n_features=int(model.n_features_in_),
+        native=model,
+        default_left=np.concatenate([t["default_left"] for t in trees]),
+        tree_group=groups, objective=objective, base_margin=base_margin,
+    )
+
+
+def compile_model(model):
+    """Version compilée d'une forêt RandomForest / XGBoost, ou le modèle inchangé.
+
+    Un modèle non supporté (autre famille, objectif XGBoost exotique) est servi
+    par son moteur natif.
+    """
+    name = type(model).__name__
+    try:
+        if name == "RandomForestClassifier":
+            return compile_random_forest(model)
+        if name == "XGBClassifier":
+            return compile_xgboost(model)
+    except Exception as e:
+        print(f"⚠️ Compilation impossible ({name}), moteur natif conservé: {e}")
+    return model
@@ -0,0 +1,203 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from typing import Callable, Dict, Optional, Set, Tuple
+
+# Événements inotify retenus (voir inotify(7)) : fin d'écriture, création (liens
+# physiques), renommages (os.replace) et suppressions
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+WATCH_MASK = IN_CREATE | IN_DELETE | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+# Changements par dossier surveillé : noms de fichiers, ou None = tout relire
+Changes = Dict[str, Optional[Set[str]]]
+
+
+class _Inotify:
+    """Accès minimal à inotify via la libc (Linux)"""
+
+    def __init__(self, paths: Dict[str, str]):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self.labels: Dict[int, str] = {}
+        for label, path in paths.items():
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch {path}")
+            self.labels[wd] = label
+
+    def read(self, timeout: float, changes: Changes) -> int:
+        """Ajoute à changes les événements arrivés avant timeout ; retourne leur nombre"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return 0
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return 0
+        count, offset = 0, 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+            count += 1
+            if mask & IN_Q_OVERFLOW:
+                # File du noyau saturée : des événements ont été perdus
+                for label in self.labels.values():
+                    changes[label] = None
+            elif mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                label = self.labels.get(wd)
+                if label is not None:
+                    changes[label] = None
+            elif wd in self.labels and name:
+                names = changes.setdefault(self.labels[wd], set())
+                if names is not None:
+                    names.add(name)
+        return count
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _Poller:
+    """Repli sans inotify : compare (mtime, taille) des fichiers à chaque passage"""
+
+    def __init__(self, paths: Dict[str, str], interval: float):
+        self.paths = paths
+        self.interval = interval
+        self.snapshots = {label: self._snapshot(path) for label, path in paths.items()}
+
+    @staticmethod
+    def _snapshot(path: str) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.is_file():
+                        st = entry.stat()
+                        snapshot[entry.name] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            pass
+        return snapshot
+
+    def read(self, timeout: float, changes: Changes) -> int:
+        time.sleep(min(timeout, self.interval))
+        count = 0
+        for label, path in self.paths.items():
+            before, after = self.snapshots[label], self._snapshot(path)
+            changed = {name for name in before.keys() | after.keys() if before.get(name) != after.get(name)}
+            self.snapshots[label] = after
+            if changed:
+                count += len(changed)
+                names = changes.setdefault(label, set())
+                if names is not None:
+                    names.update(changed)
+        return count
+
+    def close(self):
+        pass
+
+
+class DirectoryWatcher:
+    """Surveille des dossiers dans un thread et appelle on_change(changes) par lots.
+
+    Les événements sont regroupés jusqu'à debounce secondes sans nouvel événement
+    (au plus max_delay secondes) : une écriture en plusieurs étapes ne produit
+    qu'un lot, traité une fois le fichier complet. inotify est utilisé quand il
+    est disponible, sinon les dossiers sont relus toutes les poll_interval secondes.
+    """
+
+    def __init__(self, paths: Dict[str, str], on_change: Callable[[Changes], None],
+                 debounce: float = 0.5, max_delay: float = 5.0, poll_interval: float = 2.0,
+                 backend: str = "auto"):
+        self.paths = paths
+        self.on_change = on_change
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.requested_backend = backend
+        self.backend = None
+        self._source = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._stats = {"events": 0, "batches": 0, "errors": 0, "last_batch_at": None}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        for path in self.paths.values():
+            os.makedirs(path, exist_ok=True)
+        self._source = None
+        if self.requested_backend in ("auto", "inotify"):
+            try:
+                self._source, self.backend = _Inotify(self.paths), "inotify"
+            except (OSError, AttributeError) as e:
+                print(f"⚠️ inotify indisponible ({e}), surveillance par scrutation")
+        if self._source is None:
+            self._source, self.backend = _Poller(self.paths, self.poll_interval), "polling"
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="directory-watcher", daemon=True)
+        self._thread.start()
+        print(f"👀 Surveillance de {', '.join(self.paths.values())} ({self.backend})")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+
+    def _run(self):
+        pending: Changes = {}
+        first_event = last_event = None
+        while not self._stop.is_set():
+            timeout = 1.0 if not pending else max(0.0, min(last_event + self.debounce,
+                                                           first_event + self.max_delay) - time.monotonic())
+            try:
+                count = self._source.read(timeout, pending)
+            except Exception as e:
+                print(f"❌ Erreur de surveillance: {e}")
+                self._stats["errors"] += 1
+                time.sleep(1.0)
+                continue
+            now = time.monotonic()
+            if count:
+                self._stats["events"] += count
+                first_event = first_event or now
+                last_event = now
+            if pending and (now - last_event >= self.debounce or now - first_event >= self.max_delay):
+                batch, pending, first_event, last_event = pending, {}, None, None
+                try:
+                    self.on_change(batch)
+                except Exception as e:
+                    print(f"❌ Erreur lors de l'application des changements: {e}")
+                    self._stats["errors"] += 1
+                self._stats["batches"] += 1
+                self._stats["last_batch_at"] = time.time()
+
+    def stats(self) -> Dict[str, object]:
+        return {"backend": self.backend, "running": self.running, "debounce_seconds": self.debounce,
+                **self._stats}
@@ -112,22 +112,20 @@ export async function POST(request: Request) {
 
 export async function GET() {
   try {
-    // Read existing custom models
-    const metricsFile = path.join(process.cwd(), "api", "metrics", "custom_models_metrics.json")
-    
-    if (fs.existsSync(metricsFile)) {
-      const content = fs.readFileSync(metricsFile, "utf-8")
-      const models = JSON.parse(content)
-      
-      return NextResponse.json({
-        success: true,
-        models: models
-      })
+    // Les modèles personnalisés sont stockés par FastAPI (SQLite)
+    const response = await fetch("http://localhost:8000/api/custom-models", { cache: "no-store" })
+    const result = await response.json()
+
+    if (!response.ok) {
+      return NextResponse.json(
+        { success: false, error: result.detail || "Error reading models", models: [] },
+        { status: response.status }
+      )
     }
 
     return NextResponse.json({
       success: true,
-      models: []
+      models: result.models
     })
 
   } catch (error) {
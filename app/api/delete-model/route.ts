@@ -1,6 +1,4 @@
 import { NextResponse } from "next/server"
-import fs from "fs"
-import path from "path"
 
 export async function DELETE(request: Request) {
   try {
@@ -16,31 +14,19 @@ export async function DELETE(request: Request) {
 
     console.log("🗑️ Deleting model:", modelName)
 
-    // Read existing custom models
-    const metricsFile = path.join(process.cwd(), "api", "metrics", "custom_models_metrics.json")
-    
-    if (!fs.existsSync(metricsFile)) {
-      return NextResponse.json(
-        { success: false, error: "No custom models found" },
-        { status: 404 }
-      )
-    }
+    // FastAPI supprime le fichier .pkl, l'entrée du registre et les métriques en base
+    const response = await fetch(
+      `http://localhost:8000/api/models/${encodeURIComponent(modelName)}`,
+      { method: "DELETE" }
+    )
+    const result = await response.json()
 
-    const content = fs.readFileSync(metricsFile, "utf-8")
-    const allModels = JSON.parse(content)
-    
-    // Filter out the model to delete
-    const filteredModels = allModels.filter((model: any) => model.name !== modelName)
-    
-    if (filteredModels.length === allModels.length) {
+    if (!response.ok) {
       return NextResponse.json(
-        { success: false, error: "Model not found" },
-        { status: 404 }
+        { success: false, error: result.detail || "Error deleting the model" },
+        { status: response.status }
       )
     }
-
-    // Save the updated list
-    fs.writeFileSync(metricsFile, JSON.stringify(filteredModels, null, 2))
     
     console.log("✅ Model deleted:", modelName)
 
@@ -4,57 +4,32 @@ import path from "path"
 
 export async function GET() {
   try {
-    const metricsFile = path.join(process.cwd(), "api", "metrics", "custom_models_metrics.json")
-    const modelsDir = path.join(process.cwd(), "api", "models")
-    
-    console.log("📊 Recherche métriques dans:", metricsFile)
-    console.log("📁 Dossier modèles:", modelsDir)
-
-    // ✅ VÉRIFIER SI LE FICHIER JSON EXISTE
-    if (!fs.existsSync(metricsFile)) {
-      console.log("ℹ️ Fichier de métriques non trouvé")
-      return NextResponse.json({
-        success: true,
-        metrics: []
-      })
-    }
+    // Les métriques sont stockées par FastAPI (SQLite) ; "available" indique si le .pkl existe encore
+    const response = await fetch("http://localhost:8000/api/custom-models", { cache: "no-store" })
+    const result = await response.json()
 
-    // ✅ LIRE LE FICHIER JSON
-    const content = fs.readFileSync(metricsFile, "utf-8")
-    
-    if (!content.trim()) {
-      console.log("ℹ️ Fichier de métriques vide")
+    if (!response.ok) {
+      console.error("❌ Erreur FastAPI métriques:", result.detail)
       return NextResponse.json({
         success: true,
-        metrics: []
+        metrics: [],
+        error: result.detail || "Erreur lors du chargement des métriques"
       })
     }
 
-    // ✅ PARSER LE JSON
-    const allMetrics = JSON.parse(content)
+    const allMetrics = result.models
     console.log("📋 Métriques brutes chargées:", allMetrics.length, "entrées")
 
-    // ✅ FILTRER POUR GARDER SEULEMENT LES MODÈLES AVEC FICHIER .PKL EXISTANT
+    // ✅ GARDER SEULEMENT LES MODÈLES DONT LE FICHIER .PKL EXISTE (index du registre FastAPI)
     const validMetrics = allMetrics.filter((model: any) => {
-      const modelFileName = model.model_file || `${model.name || model.model_name}.pkl`
-      const modelPath = path.join(modelsDir, modelFileName)
-      const pklExists = fs.existsSync(modelPath)
-      
-      if (!pklExists) {
-        console.log(`❌ Fichier manquant: ${modelFileName} pour le modèle ${model.name || model.model_name}`)
+      if (!model.available) {
+        console.log(`❌ Fichier manquant pour le modèle ${model.name || model.model_name}`)
       }
-      
-      return pklExists
+      return model.available
     })
 
     console.log("✅ Métriques valides après filtrage:", validMetrics.length, "modèles")
 
-    // ✅ METTRE À JOUR LE FICHIER JSON SI NÉCESSAIRE
-    if (validMetrics.length !== allMetrics.length) {
-      console.log("🔄 Mise à jour du fichier JSON - suppression des modèles manquants")
-      fs.writeFileSync(metricsFile, JSON.stringify(validMetrics, null, 2))
-    }
-
     return NextResponse.json({
       success: true,
       metrics: validMetrics,
@@ -86,65 +86,88 @@ export async function POST(request: Request) {
       batchData.push(values)
     }
 
-    // Traiter chaque ligne pour faire les prédictions
     const results = []
     const errors = []
 
+    // Préparer la matrice N×20 ; une ligne incomplète est signalée seule
+    // au lieu de faire rejeter tout le lot par FastAPI
+    const featuresMatrix: number[][] = []
+    const rowNumbers: number[] = []
     for (let i = 0; i < batchData.length; i++) {
-      try {
-        const values = batchData[i]
-        const features = values.slice(0, 20).map(val => {
-          const num = Number(val)
-          return isNaN(num) ? 0 : num
+      const values = batchData[i]
+      if (values.length < 20) {
+        errors.push({
+          row: i + 2,
+          error: `Ligne incomplète: ${values.length} valeurs (20 attendues)`
         })
+        continue
+      }
+      featuresMatrix.push(values.slice(0, 20).map(val => {
+        const num = Number(val)
+        return isNaN(num) ? 0 : num
+      }))
+      rowNumbers.push(i + 2) // +2 car ligne 1 = headers, ligne 2 = première donnée
+    }
 
-        // Faire la prédiction pour cette ligne via FastAPI
-        const predictionResponse = await fetch("http://localhost:8000/api/predict", {
+    // Prédire toutes les lignes complètes en un seul appel FastAPI
+    if (featuresMatrix.length > 0) {
+      try {
+        const predictionResponse = await fetch("http://localhost:8000/api/predict-batch", {
           method: "POST",
           headers: { 
             "Content-Type": "application/json",
           },
           body: JSON.stringify({
             model_name: model,
-            features: features,
+            features: featuresMatrix,
           }),
         })
 
         if (predictionResponse.ok) {
-          const predictionResult = await predictionResponse.json()
-          
-          // FORMAT DES RÉSULTATS COMME STREAMLIT
-          const resultRow: any = {
-            row: i + 2, // +2 car ligne 1 = headers, ligne 2 = première donnée
-            features: features,
-            prediction: predictionResult.prediction,
-            prediction_label: predictionResult.prediction_label,
-            probabilities: predictionResult.probabilities,
-            success: true
+          const batchResult = await predictionResponse.json()
+          // Les probabilités arrivent par colonnes : probabilities[classe][ligne]
+          const probabilityColumns: number[][] = batchResult.probabilities || []
+
+          for (let i = 0; i < featuresMatrix.length; i++) {
+            const probabilities = probabilityColumns.map(column => column[i])
+
+            // FORMAT DES RÉSULTATS COMME STREAMLIT
+            const resultRow: any = {
+              row: rowNumbers[i],
+              features: featuresMatrix[i],
+              prediction: batchResult.predictions[i],
+              prediction_label: batchResult.prediction_labels[i],
+              probabilities: probabilities,
+              success: true
+            }
+
+            // Ajouter les probabilités par classe comme dans Streamlit
+            if (probabilities.length > 0) {
+              resultRow.confidence_false_positive = probabilities[0]
+              resultRow.confidence_candidate = probabilities[1] 
+              resultRow.confidence_exoplanet = probabilities[2]
+              resultRow.max_confidence = Math.max(...probabilities)
+              resultRow.most_likely_class = batchResult.prediction_labels[i]
+            }
+
+            results.push(resultRow)
           }
-
-          // Ajouter les probabilités par classe comme dans Streamlit
-          if (predictionResult.probabilities) {
-            resultRow.confidence_false_positive = predictionResult.probabilities[0]
-            resultRow.confidence_candidate = predictionResult.probabilities[1] 
-            resultRow.confidence_exoplanet = predictionResult.probabilities[2]
-            resultRow.max_confidence = Math.max(...predictionResult.probabilities)
-            resultRow.most_likely_class = predictionResult.prediction_label
+        } else {
+          for (let i = 0; i < featuresMatrix.length; i++) {
+            errors.push({
+              row: rowNumbers[i],
+              error: `Erreur prédiction: ${predictionResponse.status}`
+            })
           }
+        }
 
-          results.push(resultRow)
-        } else {
+      } catch (error) {
+        for (let i = 0; i < featuresMatrix.length; i++) {
           errors.push({
-            row: i + 2,
-            error: `Erreur prédiction: ${predictionResponse.status}`
+            row: rowNumbers[i],
+            error: `Erreur lot: ${error}`
           })
         }
-
-      } catch (error) {
-        errors.push({
-          row: i + 2,
-          error: `Erreur ligne: ${error}`
-        })
       }
     }
 
@@ -1,29 +1,28 @@
 import { NextResponse } from "next/server"
-import fs from "fs"
-import path from "path"
 
 export async function GET() {
   try {
-    const metricsFile = path.join(process.cwd(), "api", "metrics", "retrained_models_metrics.json")
-    
-    console.log("📁 Recherche métriques retrained:", metricsFile)
+    // Les métriques sont stockées par FastAPI (SQLite) : plus de fichier JSON à lire ici
+    const response = await fetch("http://localhost:8000/api/retrained-models", { cache: "no-store" })
+    const result = await response.json()
 
-    if (fs.existsSync(metricsFile)) {
-      const content = fs.readFileSync(metricsFile, "utf-8")
-      const models = JSON.parse(content)
-      
-      console.log("✅ Modèles retrained chargés:", models.length)
-      
-      return NextResponse.json({
-        success: true,
-        models: models
-      })
+    if (!response.ok) {
+      console.error("❌ Erreur FastAPI modèles retrained:", result.detail)
+      return NextResponse.json(
+        { 
+          success: false, 
+          error: result.detail || "Erreur lecture modèles retrained",
+          models: [] 
+        },
+        { status: response.status }
+      )
     }
 
-    console.log("ℹ️ Aucun fichier de métriques retrained trouvé")
+    console.log("✅ Modèles retrained chargés:", result.models.length)
+    
     return NextResponse.json({
       success: true,
-      models: []
+      models: result.models
     })
 
   } catch (error) {
@@ -37,4 +36,4 @@ export async function GET() {
       { status: 500 }
     )
   }
-}
\ No newline at end of file
+}